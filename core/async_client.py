@@ -0,0 +1,111 @@
+"""
+asyncio front for SmartAPI: independent reads and order actions run
+concurrently instead of one blocking call after another.
+
+Calls run on a bounded worker pool (`concurrency`, default AO_ASYNC_CONC=8)
+and go through the same account-wide token buckets (core.ratelimit) and
+retry/breaker policy (core.retry) as every synchronous caller, so issuing
+dozens at once queues on the limits rather than tripping them. With the
+session broker up each worker thread gets its own broker connection;
+otherwise one pooled SmartConnect session is shared by all workers.
+
+  async with AsyncSmart() as api:
+      books, pos = await asyncio.gather(api.orderBook(), api.position())
+      ltps = await api.gather([api.ltpData("NSE", ts, tok) for ts, tok in legs])
+"""
+from __future__ import annotations
+import asyncio, os, threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+
+from core.paper_broker import PaperBroker
+from core.ratelimit import limited
+from core.retry import resilient
+from core.session_broker import SOCK, BrokerClient
+
+CONCURRENCY = int(os.getenv("AO_ASYNC_CONC", "8"))
+_login_lock = threading.Lock()
+
+class AsyncSmart:
+    def __init__(self, sc: Any = None, concurrency: int = CONCURRENCY):
+        """sc: a SmartConnect-like object to share; None (or a BrokerClient) = one broker
+        connection per worker when the broker is up, else own login."""
+        if isinstance(sc, BrokerClient): sc = None
+        self.concurrency = concurrency
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ao-async")
+        self._tl, self._clients = threading.local(), []
+        self._broker = sc is None and os.getenv("SESSION_BROKER", "1") != "0" and SOCK.exists()
+        self._sc = None if sc is None else self._wrap(sc)
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def _wrap(sc: Any) -> Any:
+        # broker connections limit and retry server-side; paper orders must not spend the account's budget;
+        # a client already wrapped (autopilot's, shared_api()'s) keeps its one layer of each
+        return sc if isinstance(sc, PaperBroker) else resilient(limited(sc))
+
+    def _client(self) -> Any:
+        """SmartConnect-like object for the calling worker thread."""
+        if self._broker:
+            c = getattr(self._tl, "sc", None)
+            if c is None:
+                try: c = self._tl.sc = BrokerClient(); self._clients.append(c)
+                except OSError: self._broker = False   # broker went away: fall back to a login
+            if c is not None: return c
+        if self._sc is None:
+            with _login_lock:
+                if self._sc is None:
+                    from core.smart_session import SmartSession
+                    s = SmartSession(); s.login()
+                    self._sc = self._wrap(s.sc)
+        return self._sc
+
+    def _invoke(self, ep: str, a: tuple, kw: dict) -> Any:
+        return getattr(self._client(), ep)(*a, **kw)
+
+    async def call(self, ep: str, *a, **kw) -> Any:
+        """Any SmartConnect method by name, on a worker, under the concurrency bound."""
+        if self._sem is None: self._sem = asyncio.Semaphore(self.concurrency)
+        async with self._sem:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, partial(self._invoke, ep, a, kw))
+
+    async def gather(self, aws: Iterable[Awaitable], return_exceptions: bool = True) -> List[Any]:
+        """asyncio.gather that by default hands back exceptions in place of results."""
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    # --- the endpoints the engine fans out ---
+    async def ltpData(self, exchange: str, tradingsymbol: str, symboltoken: str) -> Dict[str, Any]:
+        return await self.call("ltpData", exchange, tradingsymbol, symboltoken)
+
+    async def getMarketData(self, mode: str, exchangeTokens: Dict[str, List[str]]) -> Dict[str, Any]:
+        return await self.call("getMarketData", mode, exchangeTokens)
+
+    async def getCandleData(self, historicDataParams: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call("getCandleData", historicDataParams)
+
+    async def orderBook(self) -> Dict[str, Any]:
+        return await self.call("orderBook")
+
+    async def position(self) -> Dict[str, Any]:
+        return await self.call("position")
+
+    async def placeOrder(self, orderparams: Dict[str, Any]) -> Any:
+        return await self.call("placeOrder", orderparams)
+
+    async def modifyOrder(self, orderparams: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call("modifyOrder", orderparams)
+
+    async def cancelOrder(self, order_id: str, variety: str) -> Dict[str, Any]:
+        return await self.call("cancelOrder", order_id, variety)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for c in self._clients: c.close()
+
+    async def __aenter__(self) -> "AsyncSmart":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,71 @@
+from __future__ import annotations
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from core.orders import build_market_order
+from core.token_map import STRIKE_SCALE, TM, TokenMap
+
+class AtmTemplates:
+    """
+    Ready-to-send placeOrder payloads for ATM and ATM+-1..width CE/PE on the
+    active (next listed) expiry, keyed by (opt, offset). arm(spot) is a bounds
+    check until spot leaves the current strike bucket -- halfway to the
+    neighbouring listed strikes, so the bucket follows the real strike step --
+    and then rebuilds the whole set from the ladder. get() is a dict lookup.
+    """
+    def __init__(self, under: str, exch: str = "NFO", width: int = 2, lots: int = 1,
+                 txn: str = "BUY", product: str = "INTRADAY", tm: TokenMap = TM):
+        self.under, self.exch, self.width, self.lots = under.upper(), exch.upper(), width, lots
+        self.txn, self.product, self.tm = txn, product, tm
+        self.orders: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self.lo = self.hi = 0.0           # current bucket [lo, hi) in spot units
+        self.atm: Optional[float] = None  # ATM strike in spot units
+        self.step: Optional[float] = None # listed strike spacing around ATM
+        self.expiry: Optional[date] = None
+        self.rearms = 0
+
+    def _expired(self) -> bool:
+        return self.expiry is None or self.expiry < date.today()
+
+    def arm(self, spot: float) -> bool:
+        """Re-arm if spot left the bucket (or the expiry rolled); True when rebuilt."""
+        if self.lo <= spot < self.hi and not self._expired(): return False
+        if self._expired():
+            self.expiry = self.tm.next_expiry(self.under)
+            if self.expiry is None: return False
+        exp = self.expiry.isoformat()
+        orders, bounds = {}, None
+        for opt in ("CE", "PE"):
+            atm = self.tm.nearest(self.under, exp, spot, opt, self.exch)
+            if atm is None: continue
+            # at least one neighbour each side, for the bucket bounds
+            win = self.tm.atm_window(self.under, exp, spot, opt, n=max(self.width, 1), exch=self.exch)
+            j = next(i for i, c in enumerate(win) if c.token == atm.token)
+            for i, c in enumerate(win):
+                if abs(i - j) <= self.width:
+                    orders[(opt, i - j)] = build_market_order(tradingsymbol=c.tradingsymbol, token=c.token, exch=c.exch_seg,
+                                                              txn=self.txn, qty=(c.lotsize or 1) * self.lots, product=self.product)
+            if bounds is None:
+                ks = [c.strike / STRIKE_SCALE for c in win]   # ladder units -> spot units
+                lo = (ks[j-1] + ks[j]) / 2 if j > 0 else float("-inf")
+                hi = (ks[j] + ks[j+1]) / 2 if j + 1 < len(ks) else float("inf")
+                nb = [ks[i] for i in (j-1, j+1) if 0 <= i < len(ks)]
+                bounds = (lo, hi, ks[j], min(abs(s - ks[j]) for s in nb) if nb else None)
+        if bounds is None: return False
+        self.lo, self.hi, self.atm, self.step = bounds
+        self.orders = orders   # swap in one assignment; readers never see a half-built set
+        self.rearms += 1
+        return True
+
+    def get(self, opt: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """Copy of the armed payload for opt ("CE"/"PE") at ATM+offset; None if not armed."""
+        o = self.orders.get((opt, offset))
+        return dict(o) if o else None
+
+_armed: Dict[Tuple[str, str], AtmTemplates] = {}
+
+def templates(under: str, exch: str = "NFO", **kw) -> AtmTemplates:
+    """Process-wide AtmTemplates per (underlying, exchange)."""
+    key = (under.upper(), exch.upper())
+    if key not in _armed: _armed[key] = AtmTemplates(under, exch, **kw)
+    return _armed[key]
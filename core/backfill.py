@@ -0,0 +1,123 @@
+"""
+Resumable historical candle backfill.
+
+A job is a set of (exchange, token) x interval x date range. It is split into
+broker-legal getCandleData chunks (CHUNK_DAYS per interval), and the chunks
+run concurrently through core.async_client -- so on the account-wide
+getCandleData buckets (core.ratelimit), behind live callers, with core.retry's
+policy -- and land in the local candle store (core.candle_store), marked as
+covered there so its gap-aware fetch() won't ask for them again.
+
+Every finished chunk is checkpointed (data/backfill.state.json by default), so
+an interrupted or partly failed run picks up where it stopped: done chunks are
+skipped, failed ones retried.
+
+  python -m core.backfill --tokens NSE:99926000,NSE:99926009 --fno \\
+      --interval ONE_MINUTE --from 2026-06-01 --to 2026-09-30
+  -> {"chunks": 2710, "calls": 2710, "candles": ..., "failed": 0, "secs": ..., "candles_per_s": ...}
+"""
+from __future__ import annotations
+import argparse, asyncio, csv, json, os, sys, time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.async_client import CONCURRENCY, AsyncSmart
+from core.candle_store import CHUNK_DAYS, STORE, CandleStore, settled
+
+ROOT  = Path(__file__).resolve().parents[1]
+STATE = Path(os.getenv("AO_BACKFILL_STATE") or ROOT / "data" / "backfill.state.json")
+
+@dataclass(frozen=True)
+class Chunk:
+    exchange: str
+    token: str
+    interval: str
+    start: date
+    end: date
+
+    @property
+    def key(self) -> str:
+        return f"{self.exchange}:{self.token}:{self.interval}:{self.start}:{self.end}"
+
+    def params(self) -> Dict[str, str]:
+        return {"exchange": self.exchange, "symboltoken": self.token, "interval": self.interval,
+                "fromdate": f"{self.start} 09:15", "todate": f"{self.end} 15:30"}
+
+def chunks(keys: Iterable[Tuple[str, str]], interval: str, start: date, end: date) -> List[Chunk]:
+    """Broker-legal windows covering start..end for every (exchange, token)."""
+    n, out = CHUNK_DAYS[interval], []
+    for ex, tok in keys:
+        d = start
+        while d <= end:
+            e = min(d + timedelta(days=n - 1), end)
+            out.append(Chunk(ex.upper(), str(tok), interval, d, e))
+            d = e + timedelta(days=1)
+    return out
+
+def fno_universe(data: Path = ROOT / "data") -> List[Tuple[str, str]]:
+    """NSE cash tokens of every stock with NFO futures (from the instruments split CSVs)."""
+    with open(data / "instruments_NFO.csv", newline="") as f:
+        names = {r["name"] for r in csv.DictReader(f) if r.get("instrumenttype") == "FUTSTK"}
+    with open(data / "instruments_NSE.csv", newline="") as f:
+        return sorted(("NSE", r["symboltoken"]) for r in csv.DictReader(f)
+                      if r.get("symbol", "").endswith("-EQ") and r["symbol"][:-3] in names)
+
+class Backfill:
+    def __init__(self, sc: Any = None, store: CandleStore = STORE, state: Path = STATE, concurrency: int = CONCURRENCY):
+        self.sc, self.store, self.state, self.concurrency = sc, store, state, concurrency
+        st = json.loads(state.read_text()) if state.exists() else {}
+        self.done: Dict[str, int] = st.get("done", {})        # chunk key -> candles
+        self.failed: Dict[str, str] = st.get("failed", {})    # chunk key -> last error
+        self.stats = {"chunks": 0, "calls": 0, "candles": 0, "failed": 0, "skipped": 0}
+
+    def checkpoint(self):
+        self.state.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"done": self.done, "failed": self.failed}, separators=(",", ":")))
+        os.replace(tmp, self.state)
+
+    async def _one(self, aio: AsyncSmart, c: Chunk):
+        self.stats["calls"] += 1
+        try:
+            r = await aio.getCandleData(c.params())
+            if not (r or {}).get("status"): raise LookupError(f"getCandleData: {(r or {}).get('message') or r}")
+            p = c.params()
+            n = self.store.write(c.exchange, c.token, c.interval, r.get("data") or [],
+                                 cover=(p["fromdate"], min(p["todate"], settled(c.interval).strftime("%Y-%m-%d %H:%M"))))
+        except Exception as e:
+            self.failed[c.key] = f"{type(e).__name__}: {e}"; self.stats["failed"] += 1
+        else:
+            self.done[c.key] = n; self.failed.pop(c.key, None); self.stats["candles"] += n
+        self.checkpoint()
+
+    async def arun(self, todo: List[Chunk]):
+        async with AsyncSmart(self.sc, self.concurrency) as aio:
+            await aio.gather([self._one(aio, c) for c in todo])
+
+    def run(self, work: List[Chunk]) -> Dict[str, Any]:
+        todo = [c for c in work if c.key not in self.done]
+        self.stats.update(chunks=len(work), skipped=len(work) - len(todo))
+        t0 = time.perf_counter()
+        if todo: asyncio.run(self.arun(todo))
+        secs = time.perf_counter() - t0
+        return {**self.stats, "secs": round(secs, 2), "candles_per_s": round(self.stats["candles"] / secs, 1) if secs else 0.0}
+
+def _keys(spec: str) -> List[Tuple[str, str]]:
+    return [tuple(k.split(":", 1)) if ":" in k else ("NSE", k) for k in (s.strip() for s in spec.split(",")) if k]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Resumable getCandleData backfill into data/candles")
+    ap.add_argument("--tokens", default="", help="EXCH:TOKEN,... (bare tokens are NSE)")
+    ap.add_argument("--fno", action="store_true", help="add every F&O stock (NSE cash token)")
+    ap.add_argument("--interval", default="ONE_MINUTE", choices=sorted(CHUNK_DAYS))
+    ap.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    ap.add_argument("--to", dest="end", type=date.fromisoformat, default=date.today())
+    ap.add_argument("--conc", type=int, default=CONCURRENCY)
+    ap.add_argument("--state", type=Path, default=STATE)
+    a = ap.parse_args()
+    keys = list(dict.fromkeys(_keys(a.tokens) + (fno_universe() if a.fno else [])))
+    if not keys: sys.exit("nothing to backfill: give --tokens and/or --fno")
+    bf = Backfill(state=a.state, concurrency=a.conc)
+    print(json.dumps(bf.run(chunks(keys, a.interval, a.start, a.end))))
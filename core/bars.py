@@ -0,0 +1,155 @@
+"""
+Incremental tick-to-bar aggregation: live ticks (core.market_data) fold into
+1/3/5/15-minute OHLCV+OI bars per token, and each bar is appended to the
+candle store (core.candle_store) the moment it closes -- so trend_check, its
+ADX and breakout_atr read local bars instead of calling getCandleData.
+
+Bars are aligned on the exchange timestamp (epoch-floored, which lands on
+the 09:15 IST session grid for every interval here) and close when the first
+tick of a later bar arrives, or on flush() once the interval plus GRACE
+seconds has passed on the wall clock (quiet tokens). Volume is the delta of
+the feed's cumulative day volume (QUOTE/SNAP_QUOTE modes; 0 in LTP mode),
+OI the last value seen. A tick older than its token's open bar counts its
+volume there and is otherwise dropped; so is one for a bar flush() already
+closed (no open bar yet), which would otherwise overwrite the stored bar.
+
+  from core.bars import BarBuilder
+  bb = BarBuilder()
+  market_data().subscribe(bb.on_tick)           # core.quote_table --publish does this
+  bb.flush()                                     # every second or so
+  bars("NSE", "99926000", "FIVE_MINUTE", 30)     # closed bars, any process (from disk)
+  breakout_inputs("NSE", "99926000")             # atr/prev_high/prev_low/... for strategies.breakout_atr
+
+  python -m core.bars NSE:99926000 --interval FIVE_MINUTE -n 20
+"""
+from __future__ import annotations
+import argparse, json, os, threading, time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from core.candle_store import STORE, CandleStore, Row, stamp
+
+INTERVALS = {"ONE_MINUTE": 60, "THREE_MINUTE": 180, "FIVE_MINUTE": 300, "FIFTEEN_MINUTE": 900}
+GRACE = float(os.getenv("AO_BAR_GRACE", "2"))   # seconds past a bar's end before flush() closes it
+KEEP  = 512                                     # closed bars kept in memory per token/interval
+
+@dataclass
+class Bar:
+    exchange: str
+    token: str
+    interval: str
+    start: float                 # epoch seconds
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int = 0
+    oi: int = 0
+    ticks: int = 1
+
+    def row(self) -> Row:
+        return [stamp(self.start), self.open, self.high, self.low, self.close, self.volume, self.oi]
+
+class BarBuilder:
+    def __init__(self, intervals: Iterable[str] = tuple(INTERVALS), store: Optional[CandleStore] = STORE,
+                 on_bar: Optional[Callable[[Bar], None]] = None, grace: float = GRACE):
+        self.secs = {iv.upper(): INTERVALS[iv.upper()] for iv in intervals}
+        self.store, self.on_bar, self.grace = store, on_bar, grace
+        self.lock = threading.Lock()
+        self.open: Dict[Tuple[str, str, str], Bar] = {}
+        self.cum: Dict[Tuple[str, str], int] = {}                # last cumulative day volume per token
+        self.closed: Dict[Tuple[str, str, str], Deque[Bar]] = {}
+        self.last: Dict[Tuple[str, str, str], float] = {}         # start of the latest closed bar
+        self.stats = {"ticks": 0, "bars": 0, "late": 0, "store_errors": 0}
+
+    def on_tick(self, t):
+        """core.market_data subscriber."""
+        if t.ltp <= 0 or not t.ts: return
+        k, px, done = (t.exchange, t.token), t.ltp, []
+        with self.lock:
+            self.stats["ticks"] += 1
+            prev = self.cum.get(k)
+            dv = 0 if prev is None or not t.volume else t.volume - prev if t.volume >= prev else t.volume   # new day resets
+            if t.volume: self.cum[k] = t.volume
+            for iv, s in self.secs.items():
+                bk, start = k + (iv,), t.ts // s * s
+                b = self.open.get(bk)
+                if b is None and start <= self.last.get(bk, -1):
+                    self.stats["late"] += 1
+                    continue
+                if b is not None and start < b.start:
+                    b.volume += dv; self.stats["late"] += 1
+                    continue
+                if b is not None and start > b.start:
+                    done.append(b); self.last[bk] = b.start; b = None
+                if b is None:
+                    self.open[bk] = Bar(t.exchange, t.token, iv, start, px, px, px, px, dv, t.oi)
+                    continue
+                b.high, b.low, b.close = max(b.high, px), min(b.low, px), px
+                b.volume += dv; b.ticks += 1
+                if t.oi: b.oi = t.oi
+        for b in done: self._close(b)
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """Close bars whose interval (plus grace) is over; returns how many closed."""
+        now = time.time() if now is None else now
+        with self.lock:
+            done = [b for b in self.open.values() if b.start + self.secs[b.interval] + self.grace <= now]
+            for b in done:
+                k = (b.exchange, b.token, b.interval)
+                del self.open[k]; self.last[k] = b.start
+        for b in done: self._close(b)
+        return len(done)
+
+    def _close(self, b: Bar):
+        k = (b.exchange, b.token, b.interval)
+        with self.lock:
+            q = self.closed.get(k)
+            if q is None: q = self.closed[k] = deque(maxlen=KEEP)
+            q.append(b); self.stats["bars"] += 1
+        if self.store is not None:
+            try: self.store.append(b.exchange, b.token, b.interval, b.row())
+            except OSError: self.stats["store_errors"] += 1
+        if self.on_bar is not None: self.on_bar(b)
+
+    def bars(self, exch: str, token: str, interval: str, n: int = 0, partial: bool = False) -> List[Bar]:
+        """Closed bars held in memory, oldest first (plus the forming one with partial=True)."""
+        k = (exch.upper(), str(token), interval.upper())
+        with self.lock:
+            out = list(self.closed.get(k, ()))
+            if partial and k in self.open: out.append(self.open[k])
+        return out[-n:] if n else out
+
+def bars(exch: str, token: str, interval: str = "FIVE_MINUTE", n: int = 100, store: CandleStore = STORE) -> List[Row]:
+    """The latest n closed bars on disk, SmartAPI-shaped rows (+ oi); no API call."""
+    return store.tail(exch, token, interval, n)
+
+def atr(rows: List[Row], period: int = 14) -> float:
+    """Simple-average true range over the last `period` bars (0 without enough of them)."""
+    if len(rows) < period + 1: return 0.0
+    tr = [max(r[2] - r[3], abs(r[2] - p[4]), abs(r[3] - p[4])) for p, r in zip(rows[-period - 1:], rows[-period:])]
+    return sum(tr) / period
+
+def breakout_inputs(exch: str, token: str, interval: str = "FIVE_MINUTE", period: int = 14,
+                    store: CandleStore = STORE) -> Dict[str, Any]:
+    """strategies.breakout_atr's market_data from local bars: {} when fewer than period+2 are on disk.
+
+    prev_high/prev_low span the `period` bars before the latest one; price and
+    volume are the latest bar's close and volume, avg_volume the mean over
+    those `period` bars."""
+    rows = bars(exch, token, interval, period + 2, store)
+    if len(rows) < period + 2: return {}
+    last, prior = rows[-1], rows[-period - 1:-1]
+    return {"atr": atr(rows[:-1], period), "prev_high": max(r[2] for r in prior), "prev_low": min(r[3] for r in prior),
+            "price": last[4], "volume": last[5], "avg_volume": sum(r[5] for r in prior) / period,
+            "bar_time": last[0], "interval": interval}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local bars built from the feed")
+    ap.add_argument("key", metavar="EXCH:TOKEN")
+    ap.add_argument("--interval", default="FIVE_MINUTE", choices=sorted(INTERVALS))
+    ap.add_argument("-n", type=int, default=20)
+    a = ap.parse_args()
+    ex, _, tok = a.key.partition(":")
+    print(json.dumps({"bars": bars(ex, tok, a.interval, a.n), "breakout": breakout_inputs(ex, tok, a.interval)}))
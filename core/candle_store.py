@@ -0,0 +1,331 @@
+"""
+Local candle store: getCandleData rows and bars built from the feed
+(core.bars) kept on disk in a compact columnar format, one file per
+exchange/token/interval/day partition under data/candles/.
+
+  data/candles/NSE/99926000/ONE_MINUTE/2026-07-01.col
+
+A partition (little-endian) is a 32-byte header -- magic "AOC1", version,
+columns, rows, coverage spans -- then the coverage spans as [from, to) epoch
+second pairs, then one contiguous 8-byte column per field:
+  ts i64 | open, high, low, close f64 | volume, oi i64
+so columns() can mmap a day and hand out zero-copy memoryviews.
+
+Coverage records which parts of the day have been fetched or built from the
+feed, empty stretches (holidays, no trades) included. fetch() works out the
+gaps of a range within the market windows (core.mode.market_window_ist),
+asks getCandleData for those only -- consecutive whole sessions in one call,
+up to CHUNK_DAYS -- and serves the range from disk.
+
+Writes merge into the partition (same timestamp: the newer row wins) and
+replace it atomically, so a partial write never leaves a torn file; an flock
+on the directory's .lock serialises writers across processes. Closed bars
+from append() go to a <day>.app side file first (one fixed-size record per
+bar, read together with the partition) and are folded in every
+APPEND_COMPACT bars, on the next write(), or when columns() maps the day.
+Day partitions left as CSV by earlier versions are still read, and
+rewritten in this format on their next write.
+
+  from core.candle_store import STORE
+  STORE.fetch(sc, "NSE", "99926000", "FIVE_MINUTE", "2026-07-01 09:15", "2026-07-31 15:30")  # only the gaps hit the API
+  STORE.read("NSE", "99926000", "ONE_MINUTE", "2026-07-01", "2026-07-31")   # SmartAPI-shaped rows (+ oi)
+  STORE.tail("NSE", "99926000", "FIVE_MINUTE", 40)                          # the latest 40
+  STORE.columns("NSE", "99926000", "ONE_MINUTE", "2026-07-01").close        # float64 memoryview
+
+  python -m core.candle_store NSE:99926000 --interval FIVE_MINUTE --from "2026-07-01 09:15" --to "2026-07-31 15:30"
+"""
+from __future__ import annotations
+import argparse, asyncio, csv, fcntl, json, mmap, os, struct, threading
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+DIR  = Path(os.getenv("AO_CANDLES") or ROOT / "data" / "candles")
+HEAD = ["time", "open", "high", "low", "close", "volume", "oi"]
+TYPES = "qddddqq"                             # array typecodes of the columns, in HEAD order
+MAGIC, VERSION = b"AOC1", 1
+HDR  = struct.Struct("<4sHHII")               # magic, version, columns, rows, coverage spans
+HDR_SIZE = 32
+APP  = struct.Struct("<qddddqqqq")            # an appended bar: the record, then its coverage [from, to)
+APPEND_COMPACT = 64                           # appended bars before the partition is rewritten
+IST  = timezone(timedelta(hours=5, minutes=30))
+OPEN, CLOSE = time(9, 15), time(15, 30)
+SECS = {"ONE_MINUTE": 60, "THREE_MINUTE": 180, "FIVE_MINUTE": 300, "TEN_MINUTE": 600, "FIFTEEN_MINUTE": 900,
+        "THIRTY_MINUTE": 1800, "ONE_HOUR": 3600, "ONE_DAY": 86400}
+# days of history one getCandleData request may span, per interval
+CHUNK_DAYS = {"ONE_MINUTE": 30, "THREE_MINUTE": 60, "FIVE_MINUTE": 100, "TEN_MINUTE": 100, "FIFTEEN_MINUTE": 200,
+              "THIRTY_MINUTE": 200, "ONE_HOUR": 400, "ONE_DAY": 2000}
+
+Row  = List                 # [iso time, open, high, low, close, volume, oi]
+Rec  = Tuple                # (epoch ts, open, high, low, close, volume, oi)
+Span = Tuple[int, int]      # [from, to) epoch seconds
+
+class Columns(NamedTuple):
+    rows: int
+    coverage: List[Span]
+    ts: memoryview
+    open: memoryview
+    high: memoryview
+    low: memoryview
+    close: memoryview
+    volume: memoryview
+    oi: memoryview
+
+def stamp(epoch: float) -> str:
+    """getCandleData's time format: 2026-07-01T09:15:00+05:30."""
+    return datetime.fromtimestamp(epoch, IST).isoformat()
+
+def ist(t) -> datetime:
+    """Naive IST datetime from a datetime, date, epoch or "YYYY-mm-dd[ HH:MM]" / ISO string."""
+    if isinstance(t, (int, float)): t = datetime.fromtimestamp(t, IST)
+    elif isinstance(t, date) and not isinstance(t, datetime): t = datetime.combine(t, time())
+    elif not isinstance(t, datetime): t = datetime.fromisoformat(str(t))
+    return t.astimezone(IST).replace(tzinfo=None) if t.tzinfo else t
+
+def epoch(t) -> int:
+    return int(ist(t).replace(tzinfo=IST).timestamp())
+
+def _day(d) -> date:
+    return d.date() if isinstance(d, datetime) else d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+def _rec(r: Sequence) -> Rec:
+    return (epoch(r[0]), *map(float, r[1:5]), int(float(r[5])), int(float(r[6])) if len(r) > 6 else 0)
+
+def _row(r: Rec) -> Row:
+    return [stamp(r[0]), *r[1:]]
+
+def _union(spans: Iterable[Span]) -> List[Span]:
+    out: List[Span] = []
+    for a, b in sorted(spans):
+        if out and a <= out[-1][1]: out[-1] = (out[-1][0], max(out[-1][1], b))
+        else: out.append((a, b))
+    return out
+
+def _subtract(spans: List[Span], lo: int, hi: int) -> List[Span]:
+    """Parts of [lo, hi) not covered by spans."""
+    out = []
+    for a, b in spans:
+        if b <= lo or a >= hi: continue
+        if a > lo: out.append((lo, a))
+        lo = max(lo, b)
+    if lo < hi: out.append((lo, hi))
+    return out
+
+def settled(interval: str, now: Optional[datetime] = None) -> datetime:
+    """Start of the bar still forming at `now` (naive IST): candles before it are final."""
+    now = now or ist(datetime.now(IST))
+    o = datetime.combine(now.date(), OPEN)
+    if now <= o or now >= datetime.combine(now.date(), CLOSE): return now
+    step = timedelta(seconds=SECS[interval])
+    return o + (now - o) // step * step
+
+def _next_session(d: date) -> date:
+    d += timedelta(days=1)
+    while d.weekday() >= 5: d += timedelta(days=1)
+    return d
+
+class CandleStore:
+    def __init__(self, root: Path = DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.stats = {"fetch_calls": 0, "fetch_failed": 0, "candles_fetched": 0, "last_error": ""}
+
+    def path(self, exch: str, token: str, interval: str, day) -> Path:
+        return self.root / exch.upper() / str(token) / interval.upper() / f"{_day(day).isoformat()}.col"
+
+    # --- partitions ---
+    @contextmanager
+    def _locked(self, p: Path):
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock, open(p.parent / ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try: yield
+            finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self, p: Path) -> Tuple[List[Span], Dict[int, Rec]]:
+        # the side file first: compaction replaces the partition before unlinking it
+        try: b = p.with_suffix(".app").read_bytes()
+        except FileNotFoundError: b = b""
+        extra = list(APP.iter_unpack(b[:len(b) - len(b) % APP.size]))
+        cov, recs = self._load_col(p)
+        recs.update((a[0], a[:7]) for a in extra)
+        return cov + [a[7:] for a in extra], recs
+
+    def _load_col(self, p: Path) -> Tuple[List[Span], Dict[int, Rec]]:
+        if p.exists():
+            b = p.read_bytes()
+            magic, ver, ncol, n, ncov = HDR.unpack_from(b, 0)
+            if magic != MAGIC or ver != VERSION or ncol != len(TYPES): raise ValueError(f"{p}: not a v{VERSION} candle partition")
+            q = array("q", b[HDR_SIZE:HDR_SIZE + 16 * ncov])
+            off, cols = HDR_SIZE + 16 * ncov, []
+            for t in TYPES: cols.append(array(t, b[off:off + 8 * n])); off += 8 * n
+            return list(zip(q[::2], q[1::2])), {r[0]: r for r in zip(*cols)}
+        legacy = p.with_suffix(".csv")
+        if legacy.exists():
+            with open(legacy, newline="") as f:
+                rd = csv.reader(f); next(rd, None)
+                return [], {r[0]: r for r in map(_rec, (r for r in rd if len(r) >= 6))}
+        return [], {}
+
+    def _save(self, p: Path, cov: List[Span], recs: Dict[int, Rec]):
+        rows, cov = [recs[k] for k in sorted(recs)], _union(cov)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f"{p.stem}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(HDR.pack(MAGIC, VERSION, len(TYPES), len(rows), len(cov)).ljust(HDR_SIZE, b"\0"))
+            f.write(array("q", [x for s in cov for x in s]).tobytes())
+            for i, t in enumerate(TYPES): f.write(array(t, [r[i] for r in rows]).tobytes())
+        os.replace(tmp, p)
+        p.with_suffix(".app").unlink(missing_ok=True)
+        p.with_suffix(".csv").unlink(missing_ok=True)
+
+    def _compact(self, p: Path):
+        self._save(p, *self._load(p))
+
+    def _records(self, exch: str, token: str, interval: str, start, end) -> List[Rec]:
+        out, d, end = [], _day(start), _day(end)
+        while d <= end:
+            recs = self._load(self.path(exch, token, interval, d))[1]
+            out += [recs[k] for k in sorted(recs)]
+            d += timedelta(days=1)
+        return out
+
+    # --- writes ---
+    def write(self, exch: str, token: str, interval: str, rows: Iterable[Sequence], cover=None) -> int:
+        """Merge rows into their day partitions, marking cover=(from, to) as fetched; returns rows written."""
+        by_day: Dict[date, List[Rec]] = {}
+        for r in rows or []:
+            rec = _rec(r); by_day.setdefault(ist(rec[0]).date(), []).append(rec)
+        spans: Dict[date, List[Span]] = {}
+        if cover:
+            lo, hi = epoch(cover[0]), epoch(cover[1])
+            d = ist(lo).date()
+            while lo < hi:
+                nxt = epoch(d + timedelta(days=1))
+                if d.weekday() < 5 or d in by_day: spans.setdefault(d, []).append((lo, min(hi, nxt)))
+                lo, d = nxt, d + timedelta(days=1)
+        for d in by_day.keys() | spans.keys():
+            p = self.path(exch, token, interval, d)
+            with self._locked(p):
+                cov, recs = self._load(p)
+                recs.update((r[0], r) for r in by_day.get(d, ()))
+                self._save(p, cov + spans.get(d, []), recs)
+        return sum(map(len, by_day.values()))
+
+    def append(self, exch: str, token: str, interval: str, row: Sequence):
+        """One closed bar (core.bars): stored and its interval marked covered.
+
+        One record appended to the day's side file; the partition itself is
+        rewritten only every APPEND_COMPACT bars."""
+        rec = _rec(row)
+        p = self.path(exch, token, interval, ist(rec[0]).date())
+        with self._locked(p):
+            fd = os.open(p.with_suffix(".app"), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                n = os.fstat(fd).st_size // APP.size
+                os.write(fd, APP.pack(*rec, rec[0], rec[0] + SECS[interval.upper()]))
+            finally:
+                os.close(fd)
+            if n + 1 >= APPEND_COMPACT: self._compact(p)
+
+    # --- reads ---
+    def read(self, exch: str, token: str, interval: str, start, end) -> List[Row]:
+        """Rows for the days start..end (inclusive), oldest first; days not on disk are skipped."""
+        return list(map(_row, self._records(exch, token, interval, start, end)))
+
+    def tail(self, exch: str, token: str, interval: str, n: int, end=None, max_days: int = 10) -> List[Row]:
+        """The latest n rows up to day `end` (today), looking back at most max_days calendar days."""
+        out, d = [], _day(end or date.today())
+        for _ in range(max_days):
+            recs = self._load(self.path(exch, token, interval, d))[1]
+            out = [recs[k] for k in sorted(recs)] + out
+            if len(out) >= n: break
+            d -= timedelta(days=1)
+        return list(map(_row, out[-n:])) if n else []
+
+    def columns(self, exch: str, token: str, interval: str, day) -> Optional[Columns]:
+        """One day mapped read-only: zero-copy column views (None if the day isn't stored in this format)."""
+        p = self.path(exch, token, interval, day)
+        if p.with_suffix(".app").exists():
+            with self._locked(p):
+                if p.with_suffix(".app").exists(): self._compact(p)
+        if not p.exists(): return None
+        with open(p, "rb") as f: m = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+        magic, ver, ncol, n, ncov = HDR.unpack_from(m, 0)
+        if magic != MAGIC or ver != VERSION or ncol != len(TYPES): raise ValueError(f"{p}: not a v{VERSION} candle partition")
+        mv, off = memoryview(m), HDR_SIZE + 16 * ncov
+        q = mv[HDR_SIZE:off].cast("q")
+        cols = [mv[off + 8 * n * i: off + 8 * n * (i + 1)].cast(t) for i, t in enumerate(TYPES)]
+        return Columns(n, list(zip(q[::2], q[1::2])), *cols)
+
+    def days(self, exch: str, token: str, interval: str) -> Set[date]:
+        p = self.root / exch.upper() / str(token) / interval.upper()
+        return {date.fromisoformat(f.stem) for f in [*p.glob("*.col"), *p.glob("*.app"), *p.glob("*.csv")]} if p.exists() else set()
+
+    # --- gap-aware fetch ---
+    def gaps(self, exch: str, token: str, interval: str, start, end, now=None) -> List[Tuple[datetime, datetime]]:
+        """Uncovered parts of start..end inside market windows, as naive IST (from, to) pairs."""
+        from core.mode import market_window_ist
+        now = ist(now) if now is not None else ist(datetime.now(IST))
+        start, end = ist(start), min(ist(end), now)
+        out, d = [], start.date()
+        while d <= end.date():
+            hi, lo = min(end, datetime.combine(d, CLOSE)), max(start, datetime.combine(d, OPEN))
+            if d == now.date(): hi = min(hi, settled(interval, now))
+            if d.weekday() < 5 and hi > lo:
+                lo, hi = map(ist, market_window_ist(hi, int((hi - lo).total_seconds() // 60)))
+                cov = _union(self._load(self.path(exch, token, interval, d))[0])
+                out += [(ist(a), ist(b)) for a, b in _subtract(cov, epoch(lo), epoch(hi))]
+            d += timedelta(days=1)
+        return out
+
+    def plan(self, exch: str, token: str, interval: str, start, end, now=None) -> List[Tuple[datetime, datetime]]:
+        """gaps() as getCandleData calls: back-to-back whole sessions merged, up to CHUNK_DAYS each."""
+        calls: List[Tuple[datetime, datetime]] = []
+        for a, b in self.gaps(exch, token, interval, start, end, now):
+            if (calls and calls[-1][1].time() == CLOSE and a.time() == OPEN and a.date() == _next_session(calls[-1][1].date())
+                    and (b.date() - calls[-1][0].date()).days < CHUNK_DAYS[interval.upper()]):
+                calls[-1] = (calls[-1][0], b)
+            else:
+                calls.append((a, b))
+        return calls
+
+    async def _fetch(self, sc: Any, exch: str, token: str, interval: str, calls: List[Tuple[datetime, datetime]]):
+        from core.async_client import AsyncSmart
+        fmt = "%Y-%m-%d %H:%M"
+        async with AsyncSmart(sc) as aio:
+            rs = await aio.gather([aio.getCandleData({"exchange": exch, "symboltoken": token, "interval": interval,
+                                                      "fromdate": a.strftime(fmt), "todate": b.strftime(fmt)}) for a, b in calls])
+        for (a, b), r in zip(calls, rs):
+            self.stats["fetch_calls"] += 1
+            if isinstance(r, Exception) or not (r or {}).get("status"):
+                self.stats["fetch_failed"] += 1                    # left uncovered: the next fetch retries it
+                self.stats["last_error"] = f"{type(r).__name__}: {r}" if isinstance(r, Exception) else str((r or {}).get("message") or r)
+                continue
+            self.stats["candles_fetched"] += self.write(exch, token, interval, r.get("data") or [], cover=(a, b))
+
+    def fetch(self, sc: Any, exch: str, token: str, interval: str, start, end, now=None) -> List[Row]:
+        """Rows for start..end: the missing sub-ranges from getCandleData (sc: as core.async_client), the rest from disk."""
+        interval = interval.upper()
+        calls = self.plan(exch, token, interval, start, end, now)
+        if calls: asyncio.run(self._fetch(sc, exch.upper(), str(token), interval, calls))
+        lo, hi = epoch(start), epoch(end)
+        lo -= (lo - epoch(ist(lo).date())) % SECS[interval]          # the bar holding `start`
+        return [_row(r) for r in self._records(exch, token, interval, start, end) if lo <= r[0] <= hi]
+
+STORE = CandleStore()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Gap-aware getCandleData fetch into the local candle store")
+    ap.add_argument("key", metavar="EXCH:TOKEN")
+    ap.add_argument("--interval", default="FIVE_MINUTE", choices=sorted(SECS))
+    ap.add_argument("--from", dest="start", required=True, help='"YYYY-mm-dd HH:MM" IST')
+    ap.add_argument("--to", dest="end", default=datetime.now(IST).strftime("%Y-%m-%d %H:%M"))
+    a = ap.parse_args()
+    ex, _, tok = a.key.partition(":")
+    plan = STORE.plan(ex, tok, a.interval, a.start, a.end)
+    rows = STORE.fetch(None, ex, tok, a.interval, a.start, a.end)
+    print(json.dumps({"candles": len(rows), "gaps": [[str(x), str(y)] for x, y in plan], **STORE.stats}))
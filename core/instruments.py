@@ -0,0 +1,195 @@
+from __future__ import annotations
+import codecs, csv, json, os, re, resource, sys, time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, Optional
+from urllib.request import urlopen, Request
+
+from core.token_map import HEAD, Snapshot, Universe, compile_snapshot, parse_row
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+URL  = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+
+SPLIT = ["exchange","instrumenttype","name","segment","symbol","symboltoken"]
+CHUNK = 1 << 16
+
+def normalize(row: Dict[str, Any]) -> Dict[str, str]:
+    # Accept a variety of keys from different dumps
+    return {
+        "token": str(row.get("token") or row.get("symboltoken") or row.get("instrument_token") or "").strip(),
+        "tradingsymbol": str(row.get("symbol") or row.get("tradingsymbol") or "").upper().strip(),
+        "name": str(row.get("name") or row.get("underlying") or row.get("underlyingsymbol") or "").upper().strip(),
+        "exch_seg": str(row.get("exch_seg") or row.get("exchange") or "NFO").upper().strip(),
+        "instrumenttype": str(row.get("instrumenttype") or row.get("instrument_type") or row.get("optiontype") or "").upper().strip(),
+        "expiry": str(row.get("expiry") or row.get("expirydate") or row.get("expdate") or "").strip(),
+        "strike": str(row.get("strike") or row.get("strikeprice") or "").strip(),
+        "lotsize": str(row.get("lotsize") or row.get("lot_size") or row.get("lots") or "").strip(),
+    }
+
+def split_row(row: Dict[str, Any]) -> Dict[str, str]:
+    # per-exchange CSVs keep the broker's own casing (resolve_index_token / find_token read these)
+    ex = str(row.get("exch_seg") or row.get("exchange") or "").strip()
+    return {
+        "exchange": ex,
+        "instrumenttype": str(row.get("instrumenttype") or row.get("instrument_type") or "").strip(),
+        "name": str(row.get("name") or row.get("symbolname") or "").strip(),
+        "segment": ex,
+        "symbol": str(row.get("symbol") or row.get("tradingsymbol") or row.get("symbolname") or "").strip(),
+        "symboltoken": str(row.get("token") or row.get("symboltoken") or "").strip(),
+    }
+
+def iter_records(fp: IO[bytes], chunk: int = CHUNK) -> Iterator[Dict[str, Any]]:
+    """Yield objects from a JSON array (bare or wrapped as {"data": [...]}) holding ~one chunk in memory."""
+    dec, jd = codecs.getincrementaldecoder("utf-8")("ignore"), json.JSONDecoder()
+    buf, i, eof = "", 0, False
+    def more() -> bool:
+        nonlocal buf, i, eof
+        if eof: return False
+        b = fp.read(chunk)
+        eof = not b
+        buf = buf[i:] + dec.decode(b, final=eof); i = 0
+        return not eof or bool(buf)
+    # locate the array start
+    while True:
+        m = re.search(r'^\s*\[|"data"\s*:\s*\[', buf)
+        if m: i = m.end(); break
+        if not more() or len(buf) > 8*chunk:
+            raise ValueError("scrip master: no JSON array found")
+    while True:
+        while True:
+            while i < len(buf) and buf[i] in " \t\r\n,": i += 1
+            if i < len(buf) or not more(): break
+        if i >= len(buf): raise ValueError("scrip master: truncated JSON")
+        if buf[i] == "]": return
+        try:
+            obj, j = jd.raw_decode(buf, i)
+        except json.JSONDecodeError:
+            if not more(): raise
+            continue
+        i = j
+        if isinstance(obj, dict): yield obj
+
+class _Tee:
+    """Read-through wrapper that mirrors the raw download into a cache file."""
+    def __init__(self, fp: IO[bytes], out: IO[bytes]): self.fp, self.out = fp, out
+    def read(self, n: int = -1) -> bytes:
+        b = self.fp.read(n)
+        if b: self.out.write(b)
+        return b
+
+def open_source(src: Optional[str] = None, timeout: int = 90) -> IO[bytes]:
+    src = src or URL
+    if re.match(r"^https?://", src):
+        return urlopen(Request(src, headers={"User-Agent": "Mozilla/5.0"}), timeout=timeout)
+    return open(src, "rb")
+
+def _previous(out: Path, u: Optional[Universe] = None) -> Optional[Snapshot]:
+    # diff against the snapshot the last ingest compiled (the subset one under
+    # TM_UNIVERSE), and only if it really describes the current CSV
+    for p in ([u.snap_path(out)] if u else []) + [out.with_suffix(".snap")]:
+        try:
+            prev = Snapshot(p)
+            if prev.src_mtime_ns == out.stat().st_mtime_ns: return prev
+        except (OSError, ValueError):
+            pass
+    return None
+
+def ingest(src: Optional[str] = None, out: Path = DATA / "instruments.csv", cache: Optional[Path] = None,
+           splits: bool = True, prune_expired: bool = True) -> Dict[str, Any]:
+    """
+    Stream the scrip master once: normalize + de-dupe, drop expired
+    contracts, write the canonical instruments CSV and the per-exchange
+    splits, then rebuild the snapshot. Everything lands via tmp files and is
+    swapped in together at the end. A delta against the previous snapshot
+    (added / removed / lot-size changes) is written next to the CSV so a
+    running TokenMap can apply it in place. Under TM_UNIVERSE only the
+    subset snapshot is compiled, and the next delta is taken against it
+    (rows outside the subset are not "added"); the full one is built on
+    first miss.
+    """
+    t0 = time.perf_counter()
+    d = out.parent; d.mkdir(parents=True, exist_ok=True)
+    tag = f".{os.getpid()}.tmp"
+    targets = {"main": out}
+    if splits:
+        targets.update({k: d / f"instruments_{k}.csv" for k in ("NSE","NFO","INDICES","NSE_INDICES")})
+    tmps = {k: p.with_name(p.name + tag) for k, p in targets.items()}
+    files = {k: p.open("w", newline="") for k, p in tmps.items()}
+    stats = {"rows_in": 0, "rows_out": 0, "dupes": 0, "expired": 0, "splits": {k: 0 for k in targets if k != "main"}}
+    u = Universe.from_env()
+    prev, today = _previous(out, u), time.strftime("%Y-%m-%d")
+    # a subset baseline: rows it never held are not news (the old CSV is still in place here)
+    sub = u.keep(out) if prev and u and prev.path == u.snap_path(out) else None
+    delta: Dict[str, Any] = {"base": prev.src_mtime_ns if prev else 0, "added": [], "removed": [], "lot": {}}
+    try:
+        w = csv.writer(files["main"]); w.writerow(HEAD)
+        sw = {}
+        for k in stats["splits"]:
+            sw[k] = csv.DictWriter(files[k], fieldnames=SPLIT); sw[k].writeheader()
+        seen = set()
+        fp = open_source(src)
+        cf = None
+        if cache:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cf = cache.with_name(cache.name + tag).open("wb"); fp = _Tee(fp, cf)
+        try:
+            for r in iter_records(fp):
+                stats["rows_in"] += 1
+                n = normalize(r)
+                key = (n["token"], n["tradingsymbol"])
+                if not n["token"] or not n["tradingsymbol"]: continue
+                if key in seen: stats["dupes"] += 1; continue
+                c = parse_row(n)
+                if prune_expired and c and c.expiry and c.expiry < today: stats["expired"] += 1; continue
+                seen.add(key); w.writerow([n[h] for h in HEAD]); stats["rows_out"] += 1
+                if prev and c and (sub is None or sub(c)):
+                    i = prev.find_ts(c.tradingsymbol)
+                    pc = prev.contract(i) if i >= 0 else None
+                    if pc == c: pass
+                    elif pc and replace(pc, lotsize=c.lotsize) == c: delta["lot"][c.tradingsymbol] = c.lotsize
+                    else: delta["added"].append([n[h] for h in HEAD])
+                if not splits: continue
+                ex, it = n["exch_seg"], n["instrumenttype"]
+                dest = []
+                if ex == "NSE" and it != "INDEX": dest.append("NSE")
+                if ex == "NFO": dest.append("NFO")
+                if it == "INDEX": dest += ["INDICES", "NSE_INDICES"]
+                if dest:
+                    sr = split_row(r)
+                    for k in dest: sw[k].writerow(sr); stats["splits"][k] += 1
+        finally:
+            if cf: cf.close()
+        for f in files.values(): f.close()
+        if stats["rows_out"] == 0:
+            raise RuntimeError("scrip master produced no rows")
+        dpath = out.with_suffix(".delta.json")
+        if prev:
+            for i in range(prev.n):
+                ts = prev.ts_bytes(i).decode()
+                if (str(prev.tok[i]), ts) not in seen: delta["removed"].append(ts)
+            # rename keeps the tmp mtime, so the target stamp is known before the swap
+            delta["target"] = tmps["main"].stat().st_mtime_ns
+            dpath.write_text(json.dumps(delta))
+            stats["delta"] = {k: len(delta[k]) for k in ("added", "removed", "lot")}
+        else:
+            dpath.unlink(missing_ok=True)
+        for k, p in tmps.items(): p.replace(targets[k])
+        if cf: cache.with_name(cache.name + tag).replace(cache)
+    finally:
+        for f in files.values(): f.close()
+        for p in tmps.values(): p.unlink(missing_ok=True)
+        if cache: cache.with_name(cache.name + tag).unlink(missing_ok=True)
+    compile_snapshot(out, u.snap_path(out), u.keep(out)) if u else compile_snapshot(out, out.with_suffix(".snap"))
+    stats["wall_s"] = round(time.perf_counter() - t0, 3)
+    stats["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    return stats
+
+if __name__ == "__main__":
+    # python -m core.instruments [--src file_or_url] [--out data/instruments.csv] [--cache file] [--no-splits]
+    import argparse
+    ap = argparse.ArgumentParser(description="Stream the Angel One scrip master into data/instruments*.csv")
+    ap.add_argument("--src"); ap.add_argument("--out", type=Path, default=DATA / "instruments.csv")
+    ap.add_argument("--cache", type=Path); ap.add_argument("--no-splits", action="store_true")
+    a = ap.parse_args()
+    print(json.dumps(ingest(a.src, a.out, a.cache, not a.no_splits)))
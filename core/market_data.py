@@ -0,0 +1,238 @@
+"""
+Streaming market data: one SmartWebSocketV2 connection per process, a
+latest-tick cache per token and in-process push to subscribers -- instead of
+every poller asking ltpData on its own.
+
+Tokens are watched in LTP, QUOTE or SNAP_QUOTE mode (a wider mode carries the
+narrower fields). The service owns its reconnect loop: every (re)connect logs
+in with fresh feed credentials (the session broker's tokens when it is up,
+else a SmartSession login) and re-subscribes everything watched so far;
+backoff doubles from 0.5 s up to 30 s and resets once a connection opens.
+
+  from core.market_data import market_data
+  md = market_data().start()
+  md.watch("NFO", ["43854"], mode="QUOTE")
+  md.subscribe(lambda t: print(t.token, t.ltp))     # every tick, on the feed thread
+  md.ltp("NFO", "43854", max_age=5)                  # cached, None when stale/unknown
+  md.wait("NFO", "43854", timeout=1.0)               # next tick (or None)
+
+Feed prices arrive in paise and are converted to rupees (CDS quotes, scaled
+differently by the exchange, are not handled).
+"""
+from __future__ import annotations
+import os, socket, threading, time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+URL = os.getenv("AO_FEED_URL", "wss://smartapisocket.angelone.in/smart-stream")
+MODES = {"LTP": 1, "QUOTE": 2, "SNAP_QUOTE": 3}
+EXCH_TYPE = {"NSE": 1, "NFO": 2, "BSE": 3, "BFO": 4, "MCX": 5, "NCX": 7, "CDS": 13}
+EXCH_NAME = {v: k for k, v in EXCH_TYPE.items()}
+HISTORY = 256                       # recent (ts, ltp) kept per token for ltp_at()
+
+Creds = Tuple[str, str, str, str]   # (auth token, api key, client code, feed token): SmartWebSocketV2's order
+
+@dataclass
+class Tick:
+    exchange: str
+    token: str
+    ltp: float
+    ts: float                       # exchange timestamp, epoch seconds
+    mode: int = 1
+    seq: int = 0
+    volume: int = 0
+    oi: int = 0
+    bid: float = 0.0
+    ask: float = 0.0
+    open: float = 0.0
+    high: float = 0.0
+    low: float = 0.0
+    close: float = 0.0
+    recv: float = 0.0               # local receive time (time.time())
+
+    @classmethod
+    def of(cls, d: Dict[str, Any]) -> "Tick":
+        """From SmartWebSocketV2's parsed packet."""
+        p = lambda k: d.get(k, 0) / 100.0
+        bids, asks = d.get("best_5_buy_data") or [], d.get("best_5_sell_data") or []
+        return cls(exchange=EXCH_NAME.get(d["exchange_type"], str(d["exchange_type"])), token=d["token"],
+                   ltp=p("last_traded_price"), ts=d.get("exchange_timestamp", 0) / 1e3, mode=d["subscription_mode"],
+                   seq=d.get("sequence_number", 0), volume=d.get("volume_trade_for_the_day", 0), oi=d.get("open_interest", 0),
+                   bid=bids[0]["price"] / 100.0 if bids else 0.0, ask=asks[0]["price"] / 100.0 if asks else 0.0,
+                   open=p("open_price_of_the_day"), high=p("high_price_of_the_day"), low=p("low_price_of_the_day"),
+                   close=p("closed_price"), recv=time.time())
+
+def default_creds() -> Creds:
+    """Feed credentials from the session broker when it is up, else a fresh login."""
+    from core.smart_session import API_KEY, CLIENT_ID
+    from core.session_broker import SOCK, BrokerClient
+    if os.getenv("SESSION_BROKER", "1") != "0" and SOCK.exists():
+        try:
+            t = BrokerClient().tokens()
+            return t["jwt"], API_KEY, t["client"], t["feed"]
+        except OSError:
+            pass
+    from core.smart_session import SmartSession
+    s = SmartSession(); s.login()
+    return s.jwt, API_KEY, CLIENT_ID, s.feed
+
+def creds_of(sc: Any) -> Callable[[], Creds]:
+    """Feed credentials of an already logged-in SmartConnect."""
+    return lambda: ("Bearer " + sc.access_token, sc.api_key, sc.userId, sc.feed_token)
+
+class MarketData:
+    def __init__(self, creds: Callable[[], Creds] = default_creds, url: str = URL):
+        self.creds, self.url = creds, url
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.watched: Dict[int, Dict[int, Set[str]]] = {}        # mode -> exchange type -> tokens
+        self.last: Dict[Tuple[str, str], Tick] = {}
+        self.hist: Dict[Tuple[str, str], Deque[Tuple[float, float]]] = {}
+        self.subscribers: List[Callable[[Tick], None]] = []
+        self.ws = None
+        self.stop_ev = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {"ticks": 0, "connects": 0, "disconnects": 0, "subscriber_errors": 0, "last_error": ""}
+
+    # --- in-process subscribers ---
+    def subscribe(self, fn: Callable[[Tick], None]) -> Callable[[Tick], None]:
+        self.subscribers.append(fn)
+        return fn
+
+    def unsubscribe(self, fn: Callable[[Tick], None]):
+        if fn in self.subscribers: self.subscribers.remove(fn)
+
+    # --- feed subscriptions ---
+    def watch(self, exch: str, tokens: Iterable[str], mode: str = "LTP") -> "MarketData":
+        m, et = MODES[mode.upper()], EXCH_TYPE[exch.upper()]
+        new = [str(t) for t in tokens]
+        with self.lock:
+            have = self.watched.setdefault(m, {}).setdefault(et, set())
+            new = [t for t in dict.fromkeys(new) if t not in have]
+            have.update(new)
+            ws = self.ws
+        if new and ws is not None:
+            try: ws.subscribe("ao-md", m, [{"exchangeType": et, "tokens": new}])
+            except Exception as e: self.stats["last_error"] = f"subscribe: {e}"   # re-sent on the next connect
+        return self
+
+    def unwatch(self, exch: str, tokens: Iterable[str], mode: str = "LTP"):
+        m, et = MODES[mode.upper()], EXCH_TYPE[exch.upper()]
+        gone = [str(t) for t in tokens]
+        with self.lock:
+            self.watched.get(m, {}).get(et, set()).difference_update(gone)
+            ws = self.ws
+        if gone and ws is not None:
+            try: ws.unsubscribe("ao-md", m, [{"exchangeType": et, "tokens": gone}])
+            except Exception: pass
+
+    # --- reads ---
+    def tick(self, exch: str, token: str) -> Optional[Tick]:
+        return self.last.get((exch.upper(), str(token)))
+
+    def ltp(self, exch: str, token: str, max_age: Optional[float] = None) -> Optional[float]:
+        t = self.tick(exch, token)
+        if t is None or (max_age is not None and time.time() - t.recv > max_age): return None
+        return t.ltp
+
+    def ltp_at(self, exch: str, token: str, secs_ago: float) -> Optional[float]:
+        """Last price printed at least secs_ago before the latest tick (None without enough history)."""
+        h = self.hist.get((exch.upper(), str(token)))
+        if not h: return None
+        cut = h[-1][0] - secs_ago
+        for ts, px in reversed(h):
+            if ts <= cut: return px
+        return None
+
+    def wait(self, exch: str, token: str, timeout: float) -> Optional[Tick]:
+        """Block until the next tick of that token (None on timeout)."""
+        k = (exch.upper(), str(token))
+        with self.cond:
+            seen = self.last.get(k)
+            self.cond.wait_for(lambda: self.last.get(k) is not seen or self.stop_ev.is_set(), timeout)
+            t = self.last.get(k)
+        return t if t is not seen else None
+
+    # --- feed thread ---
+    def _on_data(self, wsapp, d: Dict[str, Any]):
+        self.push(Tick.of(d))
+
+    def push(self, t: Tick):
+        """One tick into the cache and out to subscribers (the feed thread; core.tick_journal replays)."""
+        k = (t.exchange, t.token)
+        with self.cond:
+            self.last[k] = t
+            h = self.hist.get(k)
+            if h is None: h = self.hist[k] = deque(maxlen=HISTORY)
+            h.append((t.ts, t.ltp))
+            self.stats["ticks"] += 1
+            self.cond.notify_all()
+        for fn in self.subscribers:
+            try: fn(t)
+            except Exception as e:
+                self.stats["subscriber_errors"] += 1; self.stats["last_error"] = f"subscriber: {e}"
+
+    def _on_open(self, ws):
+        self.stats["connects"] += 1
+        with self.lock:
+            self.ws = ws
+            plan = [(m, [{"exchangeType": et, "tokens": sorted(toks)} for et, toks in ets.items() if toks])
+                    for m, ets in self.watched.items()]
+        for m, lst in plan:
+            if lst: ws.subscribe("ao-md", m, lst)
+
+    def _connect_once(self):
+        from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+        ws = SmartWebSocketV2(*self.creds(), max_retry_attempt=0)   # reconnects are ours, not the SDK's
+        ws.ROOT_URI, ws.input_request_dict = self.url, {}          # per-connection subscription record
+        opened = []
+        ws.on_open = lambda wsapp: (opened.append(1), self._on_open(ws))
+        ws.on_data = self._on_data
+        ws.on_error = lambda *a: self.stats.__setitem__("last_error", " ".join(map(str, a)))
+        ws.on_close = lambda *a: None
+        ws.connect()                                               # blocks until the socket closes
+        return bool(opened)
+
+    def _run(self):
+        delay = 0.5
+        while not self.stop_ev.is_set():
+            try:
+                if self._connect_once(): delay = 0.5
+            except Exception as e:
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            with self.lock: self.ws = None
+            if self.stop_ev.is_set(): break
+            self.stats["disconnects"] += 1
+            self.stop_ev.wait(delay); delay = min(delay * 2, 30.0)
+
+    def start(self) -> "MarketData":
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_ev.clear()
+            self.thread = threading.Thread(target=self._run, name="ao-market-data", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_ev.set()
+        with self.cond: self.cond.notify_all()
+        ws = self.ws
+        if ws is not None:
+            # the feed thread tears the connection down itself once its select() sees EOF;
+            # close_connection() from here would close the fd under that select() and hang it
+            try: ws.wsapp.sock.sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError): pass
+        if self.thread is not None: self.thread.join(timeout)
+
+    def connected(self) -> bool:
+        return self.ws is not None
+
+_md: Optional[MarketData] = None
+_mk = threading.Lock()
+
+def market_data(**kw) -> MarketData:
+    """Process-wide MarketData (kw only apply when it is first created)."""
+    global _md
+    with _mk:
+        if _md is None: _md = MarketData(**kw)
+        return _md
@@ -20,3 +20,26 @@ def mode():
 
 def live_ready():
     return mode()=="LIVE" and is_market_open()
+
+def market_window_ist(now, minutes_back: int):
+    """
+    Clamp from/to to the latest valid market window:
+    09:15 to 15:30 IST for cash/indices. `now` is a naive IST datetime.
+    """
+    d = now.date()
+    start_day = datetime.datetime.combine(d, datetime.time(9, 15))
+    end_day   = datetime.datetime.combine(d, datetime.time(15, 30))
+    if now < start_day:
+        # before open -> use previous session (simple: previous calendar day)
+        prev = now - datetime.timedelta(days=1)
+        d = prev.date()
+        start_day = datetime.datetime.combine(d, datetime.time(9, 15))
+        end_day   = datetime.datetime.combine(d, datetime.time(15, 30))
+    elif now > end_day:
+        # after close -> cap to 15:30
+        pass
+    # default: within session; cap end to min(now, 15:30)
+    end_ts = min(now, end_day)
+    start_ts = max(start_day, end_ts - datetime.timedelta(minutes=minutes_back))
+    # SmartAPI expects "YYYY-mm-dd HH:MM"
+    return start_ts.strftime("%Y-%m-%d %H:%M"), end_ts.strftime("%Y-%m-%d %H:%M")
@@ -0,0 +1,327 @@
+"""
+In-process paper broker: a SmartConnect stand-in for DRY runs that exercises
+the real order path (placeOrder / modifyOrder / cancelOrder / orderBook /
+position / ltpData) against a tick stream instead of the exchange.
+
+Fill model, per tick of the order's token:
+  MARKET          fills at the last price +- slippage (AO_PAPER_SLIPPAGE_BPS)
+  LIMIT           BUY fills once ltp <= price (at the better of the two), SELL once ltp >= price
+  STOPLOSS_LIMIT  "trigger pending" until ltp crosses triggerprice (SELL: <=, BUY: >=),
+                  then rests as a LIMIT at price
+  STOPLOSS_MARKET as above, then fills as a MARKET
+Fills are whole-quantity; prices are rounded to the 0.05 tick.
+
+Ticks come from on_tick() (a live feed or a replay via feed()), and from every
+price read that goes through the broker: ltpData/getMarketData are answered
+by `md` -- the real session, read-only -- and each answer is also a tick. Other
+read-only endpoints (getCandleData, searchScrip, ...) are forwarded to md; no
+order-side call ever is.
+
+  from core.paper_broker import paper_broker, STATE
+  sc = paper_broker(md=real_session, state=STATE)   # process-wide, keeps its book across relogins
+  sc.save()                              # DRY scripts share the book through data/paper_state.json
+                                         # (merged under an flock; order ids carry the pid)
+  oid = sc.placeOrder(order)             # same shapes as SmartConnect
+  python -m core.paper_broker --bench 20000
+"""
+from __future__ import annotations
+import fcntl, itertools, json, os, sys, threading, time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.retry import IDEMPOTENT
+
+ROOT  = Path(__file__).resolve().parents[1]
+STATE = Path(os.getenv("AO_PAPER_STATE") or ROOT / "data" / "paper_state.json")
+SLIPPAGE_BPS = float(os.getenv("AO_PAPER_SLIPPAGE_BPS", "5"))
+TICK = 0.05
+DONE = ("complete", "cancelled", "rejected")
+LOCAL = {"ltpData", "getMarketData", "orderBook", "tradeBook", "position"}
+
+def _now() -> str:
+    return datetime.now().strftime("%d-%b-%Y %H:%M:%S")
+
+def _round(p: float) -> float:
+    return round(round(p / TICK) * TICK, 2)
+
+def _ok(data: Any) -> Dict[str, Any]:
+    return {"status": True, "message": "SUCCESS", "errorcode": "", "data": data}
+
+def _fail(msg: str, code: str = "AB1000") -> Dict[str, Any]:
+    return {"status": False, "message": msg, "errorcode": code, "data": None}
+
+class PaperBroker:
+    def __init__(self, md: Any = None, slippage_bps: float = SLIPPAGE_BPS, state: Optional[Path] = None):
+        self.md, self.slip = md, slippage_bps / 1e4
+        self.state = state
+        self.lock = threading.RLock()
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.resting: Dict[str, Dict[str, Dict[str, Any]]] = {}      # token -> orderid -> open/pending order
+        self.trades: List[Dict[str, Any]] = []
+        self.pos: Dict[Tuple[str, str, str], Dict[str, Any]] = {}    # (exchange, token, product) -> netting row
+        self.last: Dict[str, float] = {}                             # token -> ltp
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []  # called with each fill (trade row)
+        self._dirty: set = set()                                     # orderids changed since the last save()
+        self._seq = itertools.count(1)
+        self._pfx = f"{datetime.now():%y%m%d}{os.getpid():07d}"      # unique across processes sharing a state file
+        if state and state.exists(): self.load(state)
+
+    # --- ticks ---
+    def on_tick(self, exch: str, token: str, ltp: float, ts: Optional[float] = None):
+        """One price print; fills/triggers whatever rests on that token."""
+        token = str(token)
+        with self.lock:
+            self.last[token] = float(ltp)
+            book = self.resting.get(token)
+            if not book: return
+            for o in list(book.values()): self._match(o, float(ltp))
+
+    def feed(self, ticks: Iterable[Tuple]):
+        """Replay (exch, token, ltp[, ts]) tuples."""
+        for t in ticks: self.on_tick(*t[:4])
+
+    def _price(self, exch: str, token: str, ts: str = "") -> Optional[float]:
+        p = self.last.get(token)
+        if p is None and self.md is not None:
+            try:
+                r = self.md.ltpData(exch, ts, token)
+                p = float(r["data"]["ltp"]); self.last[token] = p
+            except Exception:
+                return None
+        return p
+
+    # --- matching ---
+    def _fill(self, o: Dict[str, Any], px: float):
+        q = int(o["quantity"])
+        o.update(status="complete", orderstatus="complete", filledshares=str(q), unfilledshares="0",
+                 averageprice=_round(px), updatetime=_now())
+        self.resting.get(o["symboltoken"], {}).pop(o["orderid"], None)
+        self._dirty.add(o["orderid"])
+        self.trades.append({"orderid": o["orderid"], "tradingsymbol": o["tradingsymbol"], "symboltoken": o["symboltoken"],
+                            "exchange": o["exchange"], "transactiontype": o["transactiontype"], "producttype": o["producttype"],
+                            "fillprice": o["averageprice"], "fillsize": str(q), "filltime": o["updatetime"]})
+        self._book(self.trades[-1])
+        for fn in self.listeners: fn(self.trades[-1])
+
+    def _book(self, t: Dict[str, Any]):
+        """Net one trade row into its position."""
+        k = (t["exchange"], t["symboltoken"], t["producttype"])
+        r = self.pos.setdefault(k, {"exchange": k[0], "symboltoken": k[1], "producttype": k[2], "tradingsymbol": t["tradingsymbol"],
+                                    "buyqty": 0, "sellqty": 0, "buyamount": 0.0, "sellamount": 0.0})
+        side = "buy" if t["transactiontype"] == "BUY" else "sell"
+        r[f"{side}qty"] += int(t["fillsize"]); r[f"{side}amount"] += int(t["fillsize"]) * t["fillprice"]
+
+    def _match(self, o: Dict[str, Any], ltp: float):
+        buy, typ = o["transactiontype"] == "BUY", o["ordertype"]
+        if o["status"] == "trigger pending":
+            if (ltp >= o["triggerprice"]) if buy else (ltp <= o["triggerprice"]):
+                o.update(status="open", orderstatus="open", updatetime=_now())
+                self._dirty.add(o["orderid"])
+            else:
+                return
+        if typ in ("MARKET", "STOPLOSS_MARKET"):
+            self._fill(o, ltp * (1 + self.slip) if buy else ltp * (1 - self.slip))
+        elif buy and ltp <= o["price"]:
+            self._fill(o, min(o["price"], ltp))
+        elif not buy and ltp >= o["price"]:
+            self._fill(o, max(o["price"], ltp))
+
+    # --- SmartConnect order side ---
+    def _new(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        oid = f"{self._pfx}{next(self._seq):05d}"
+        typ = str(p.get("ordertype") or "MARKET").upper()
+        o = {"variety": p.get("variety") or "NORMAL", "ordertype": typ, "producttype": p.get("producttype") or "INTRADAY",
+             "duration": p.get("duration") or "DAY", "price": float(p.get("price") or 0), "triggerprice": float(p.get("triggerprice") or 0),
+             "quantity": str(p.get("quantity") or ""), "tradingsymbol": p.get("tradingsymbol") or "", "symboltoken": str(p.get("symboltoken") or ""),
+             "exchange": p.get("exchange") or "", "transactiontype": str(p.get("transactiontype") or "").upper(), "orderid": oid,
+             "uniqueorderid": f"paper-{oid}", "status": "open", "orderstatus": "open", "filledshares": "0",
+             "unfilledshares": str(p.get("quantity") or ""), "averageprice": 0.0, "text": "", "updatetime": _now()}
+        miss = [k for k in ("tradingsymbol", "symboltoken", "exchange", "transactiontype") if not o[k]]
+        try: qty_ok = int(o["quantity"]) > 0
+        except ValueError: qty_ok = False
+        why = (f"missing {miss[0]}" if miss else "invalid quantity" if not qty_ok
+               else "triggerprice required" if typ.startswith("STOPLOSS") and not o["triggerprice"]
+               else "price required" if typ in ("LIMIT", "STOPLOSS_LIMIT") and not o["price"]
+               else "" if typ in ("MARKET", "LIMIT", "STOPLOSS_LIMIT", "STOPLOSS_MARKET") else f"unknown ordertype {typ}")
+        if why:
+            o.update(status="rejected", orderstatus="rejected", text=why)
+        elif typ.startswith("STOPLOSS"):
+            o.update(status="trigger pending", orderstatus="trigger pending")
+        return o
+
+    def _place(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            o = self._new(p)
+            self.orders[o["orderid"]] = o; self._dirty.add(o["orderid"])
+            if o["status"] not in DONE:
+                self.resting.setdefault(o["symboltoken"], {})[o["orderid"]] = o
+                px = self._price(o["exchange"], o["symboltoken"], o["tradingsymbol"])
+                if px is not None: self._match(o, px)
+            return o
+
+    def placeOrder(self, orderparams: Dict[str, Any]) -> Optional[str]:
+        return self._place(orderparams)["orderid"]
+
+    def placeOrderFullResponse(self, orderparams: Dict[str, Any]) -> Dict[str, Any]:
+        o = self._place(orderparams)
+        return _ok({"script": o["tradingsymbol"], "orderid": o["orderid"], "uniqueorderid": o["uniqueorderid"]})
+
+    def modifyOrder(self, orderparams: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            o = self.orders.get(str(orderparams.get("orderid") or ""))
+            if o is None: return _fail("Order not found", "AB4006")
+            if o["status"] in DONE: return _fail(f"Order is {o['status']}", "AB4007")
+            for k in ("price", "triggerprice"):
+                if orderparams.get(k) is not None: o[k] = float(orderparams[k])
+            if orderparams.get("quantity"): o["quantity"] = o["unfilledshares"] = str(orderparams["quantity"])
+            if orderparams.get("ordertype"): o["ordertype"] = str(orderparams["ordertype"]).upper()
+            o["updatetime"] = _now(); self._dirty.add(o["orderid"])
+            px = self.last.get(o["symboltoken"])
+            if px is not None: self._match(o, px)
+            return _ok({"orderid": o["orderid"], "uniqueorderid": o["uniqueorderid"]})
+
+    def cancelOrder(self, order_id: str, variety: str = "NORMAL") -> Dict[str, Any]:
+        with self.lock:
+            o = self.orders.get(str(order_id))
+            if o is None: return _fail("Order not found", "AB4006")
+            if o["status"] in DONE: return _fail(f"Order is {o['status']}", "AB4007")
+            o.update(status="cancelled", orderstatus="cancelled", updatetime=_now())
+            self._dirty.add(o["orderid"])
+            self.resting.get(o["symboltoken"], {}).pop(o["orderid"], None)
+            return _ok({"orderid": o["orderid"], "uniqueorderid": o["uniqueorderid"]})
+
+    def orderBook(self) -> Dict[str, Any]:
+        with self.lock:
+            return _ok([dict(o) for o in self.orders.values()] or None)
+
+    def tradeBook(self) -> Dict[str, Any]:
+        with self.lock:
+            return _ok([dict(t) for t in self.trades] or None)
+
+    def position(self) -> Dict[str, Any]:
+        out = []
+        with self.lock:
+            for r in self.pos.values():
+                net = r["buyqty"] - r["sellqty"]
+                ltp = self.last.get(r["symboltoken"], 0.0)
+                pnl = r["sellamount"] - r["buyamount"] + net * ltp
+                out.append({"exchange": r["exchange"], "symboltoken": r["symboltoken"], "producttype": r["producttype"],
+                            "tradingsymbol": r["tradingsymbol"], "netqty": str(net), "buyqty": str(r["buyqty"]), "sellqty": str(r["sellqty"]),
+                            "buyavgprice": f"{r['buyamount'] / r['buyqty']:.2f}" if r["buyqty"] else "0.00",
+                            "sellavgprice": f"{r['sellamount'] / r['sellqty']:.2f}" if r["sellqty"] else "0.00",
+                            "ltp": f"{ltp:.2f}", "pnl": f"{pnl:.2f}"})
+        return _ok(out or None)
+
+    def seed(self, exch: str, tradingsymbol: str, token: str, qty: int, price: float, product: str = "INTRADAY"):
+        """Book an existing position (entered elsewhere) as an already-filled order."""
+        with self.lock:
+            o = self._new({"exchange": exch, "tradingsymbol": tradingsymbol, "symboltoken": token, "quantity": abs(qty),
+                           "transactiontype": "BUY" if qty > 0 else "SELL", "ordertype": "MARKET", "producttype": product})
+            o["text"] = "seeded"; self.orders[o["orderid"]] = o; self._dirty.add(o["orderid"])
+            self._fill(o, price)
+
+    # --- market data: answered by md, recorded as ticks ---
+    def ltpData(self, exchange: str, tradingsymbol: str, symboltoken: str) -> Dict[str, Any]:
+        if self.md is None:
+            p = self.last.get(str(symboltoken))
+            if p is None: return _fail("No price for token (paper broker has no market data)", "AB4020")
+            return _ok({"exchange": exchange, "tradingsymbol": tradingsymbol, "symboltoken": str(symboltoken), "ltp": p})
+        r = self.md.ltpData(exchange, tradingsymbol, symboltoken)
+        try: self.on_tick(exchange, symboltoken, float(r["data"]["ltp"]))
+        except (KeyError, TypeError, ValueError): pass
+        return r
+
+    def getMarketData(self, mode: str, exchangeTokens: Dict[str, List[str]]) -> Dict[str, Any]:
+        if self.md is None:
+            rows = [{"exchange": ex, "symbolToken": str(t), "tradingSymbol": "", "ltp": self.last[str(t)]}
+                    for ex, toks in exchangeTokens.items() for t in toks if str(t) in self.last]
+            return _ok({"fetched": rows, "unfetched": []})
+        r = self.md.getMarketData(mode, exchangeTokens)
+        for d in ((r or {}).get("data") or {}).get("fetched") or []:
+            try: self.on_tick(d.get("exchange"), d.get("symbolToken"), float(d["ltp"]))
+            except (KeyError, TypeError, ValueError): pass
+        return r
+
+    def __getattr__(self, name: str):
+        # read-only endpoints go to the real session; nothing else ever does
+        if name in IDEMPOTENT and name not in LOCAL and self.__dict__.get("md") is not None:
+            return getattr(self.md, name)
+        raise AttributeError(name)
+
+    # --- persistence, so separate DRY processes share one paper book ---
+    def save(self, path: Optional[Path] = None):
+        """Merge this process's changes into the state file and adopt the merged book.
+
+        Under an flock on <state>.lock the file is re-read; orders this process
+        changed since its last save replace the ones on disk (except that a
+        finished order on disk is never reopened), everything else is taken
+        from disk. Positions are rebuilt from the merged trades."""
+        path = path or self.state
+        if path is None: return
+        with open(path.with_name(path.name + ".lock"), "a") as lk:
+            fcntl.flock(lk, fcntl.LOCK_EX)
+            try:
+                disk = json.loads(path.read_text()) if path.exists() else {}
+                with self.lock:
+                    st = self._merge(disk)
+                    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                    tmp.write_text(json.dumps(st, separators=(",", ":"))); tmp.replace(path)
+                    self._adopt(st)
+            finally:
+                fcntl.flock(lk, fcntl.LOCK_UN)
+
+    def _merge(self, disk: Dict[str, Any]) -> Dict[str, Any]:
+        orders = dict(disk.get("orders") or {})
+        for oid in self._dirty:
+            o, d = self.orders.get(oid), orders.get(oid)
+            if o is not None and not (d and d["status"] in DONE): orders[oid] = o
+        fills = {t["orderid"]: t for t in disk.get("trades") or ()}
+        for t in self.trades: fills.setdefault(t["orderid"], t)
+        trades = [t for oid, t in fills.items() if orders.get(oid, {}).get("status") == "complete"]
+        return {"orders": orders, "trades": trades, "last": {**(disk.get("last") or {}), **self.last}}
+
+    def _adopt(self, st: Dict[str, Any]):
+        with self.lock:
+            self.orders, self.trades, self.last = st["orders"], st["trades"], st["last"]
+            self.pos, self.resting, self._dirty = {}, {}, set()
+            for t in self.trades: self._book(t)
+            for o in self.orders.values():
+                if o["status"] not in DONE: self.resting.setdefault(o["symboltoken"], {})[o["orderid"]] = o
+            seqs = [int(k[len(self._pfx):]) for k in self.orders if k.startswith(self._pfx)]
+            self._seq = itertools.count(max(seqs, default=0) + 1)
+
+    def load(self, path: Path):
+        self._adopt(json.loads(path.read_text()))
+
+_paper: Optional[PaperBroker] = None
+
+def paper_broker(md: Any = None, state: Optional[Path] = None) -> PaperBroker:
+    """Process-wide PaperBroker; a later call can attach a fresh md (e.g. after relogin)."""
+    global _paper
+    if _paper is None: _paper = PaperBroker(md, state=state)
+    elif md is not None: _paper.md = md
+    return _paper
+
+def bench(n: int = 20000) -> Dict[str, float]:
+    pb = PaperBroker()
+    toks = [str(40000 + i) for i in range(50)]
+    for i, t in enumerate(toks): pb.on_tick("NFO", t, 100.0 + i)
+    kinds = [("MARKET", 0, 0), ("LIMIT", 99.0, 0), ("STOPLOSS_LIMIT", 95.0, 96.0)]
+    t0 = time.perf_counter()
+    for i in range(n):
+        typ, px, trg = kinds[i % 3]; tok = toks[i % 50]
+        pb.placeOrder({"tradingsymbol": f"X{tok}", "symboltoken": tok, "exchange": "NFO", "transactiontype": "BUY" if typ != "STOPLOSS_LIMIT" else "SELL",
+                       "ordertype": typ, "price": px, "triggerprice": trg, "quantity": 75, "producttype": "INTRADAY"})
+    place = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(2000): pb.on_tick("NFO", toks[i % 50], 90.0 + (i % 20))
+    ticks = time.perf_counter() - t0
+    st: Dict[str, int] = {}
+    for o in pb.orders.values(): st[o["status"]] = st.get(o["status"], 0) + 1
+    return {"orders": n, "orders_per_s": round(n / place), "ticks_per_s": round(2000 / ticks), "status": st}
+
+if __name__ == "__main__":
+    # python -m core.paper_broker [--bench N]
+    n = int(sys.argv[sys.argv.index("--bench") + 1]) if "--bench" in sys.argv else 20000
+    print(json.dumps(bench(n), indent=2))
@@ -0,0 +1,149 @@
+"""
+Positions and funds, fetched once and served from memory.
+
+Broker rows are normalized once per fetch into Pos (net qty, averages, ltp,
+pnl under one name each, whatever key variant the row used) and rmsLimit into
+Funds. Both expire on a TTL (AO_POS_TTL, default 3 s; AO_FUNDS_TTL, 30 s) and
+are dropped at once by anything that changes them: an order placed, modified
+or cancelled through ao_safe or the session broker, a paper fill, or an
+order-update message (on_order_update). A fetch racing an invalidation is not
+cached, so a reader never gets a book from before the event that dropped it.
+
+  from core.positions import book
+  b = book(sc)                     # process-wide per SmartConnect-like object
+  b.open()                         # [Pos] with netqty != 0
+  b.pnl()                          # sum of row pnl, None if the rows carry none
+  b.balance()                      # funds for core.risk.position_size_for_option
+  b.invalidate()
+"""
+from __future__ import annotations
+import os, threading, time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+POS_TTL   = float(os.getenv("AO_POS_TTL", "3"))
+FUNDS_TTL = float(os.getenv("AO_FUNDS_TTL", "30"))
+ENDPOINTS = ("position", "rmsLimit")
+
+QTY_KEYS = ("netqty", "netQty", "net_quantity", "netquantity", "netQuantity")
+PNL_KEYS = ("pnl", "netpnl", "netPnL", "NetPnL", "pnlmtm", "unrealized", "unrealised", "unrealizedPnL", "unrealizedpnl")
+
+def _num(row: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[float]:
+    for k in keys:
+        if k in row:
+            try: return float(str(row[k]).strip())
+            except (TypeError, ValueError): pass
+    return None
+
+@dataclass(frozen=True)
+class Pos:
+    exchange: str
+    token: str
+    tradingsymbol: str
+    product: str
+    netqty: int
+    buyavg: float
+    sellavg: float
+    ltp: float
+    pnl: Optional[float]
+
+    @classmethod
+    def of(cls, r: Dict[str, Any]) -> "Pos":
+        return cls(exchange=r.get("exchange") or r.get("exch") or "", token=str(r.get("symboltoken") or r.get("symbol_token") or r.get("token") or ""),
+                   tradingsymbol=r.get("tradingsymbol") or r.get("symbolname") or r.get("tsym") or r.get("symbol") or "",
+                   product=str(r.get("producttype") or r.get("product") or "").upper(), netqty=int(_num(r, QTY_KEYS) or 0),
+                   buyavg=_num(r, ("buyavgprice", "avgnetprice")) or 0.0, sellavg=_num(r, ("sellavgprice",)) or 0.0,
+                   ltp=_num(r, ("ltp",)) or 0.0, pnl=_num(r, PNL_KEYS))
+
+@dataclass(frozen=True)
+class Funds:
+    net: float
+    available_cash: float
+    utilised: float
+    m2m_unrealized: float
+    m2m_realized: float
+
+    @classmethod
+    def of(cls, d: Dict[str, Any]) -> "Funds":
+        f = lambda *k: _num(d, k) or 0.0
+        return cls(net=f("net"), available_cash=f("availablecash"), utilised=f("utiliseddebits"),
+                   m2m_unrealized=f("m2munrealized"), m2m_realized=f("m2mrealized"))
+
+def _rows(resp: Any) -> List[Dict[str, Any]]:
+    data = resp.get("data") if isinstance(resp, dict) else resp
+    if isinstance(data, dict): data = data.get("net") or data.get("positiondata") or []
+    return [r for r in data or [] if isinstance(r, dict)]
+
+class Book:
+    def __init__(self, sc: Any = None, pos_ttl: float = POS_TTL, funds_ttl: float = FUNDS_TTL,
+                 fetch: Optional[Callable[[str], Any]] = None):
+        if sc is None and fetch is None: raise ValueError("Book: no SmartConnect-like object (or fetch) to read from")
+        self.fetch = fetch or (lambda ep: getattr(sc, ep)())
+        self.ttl = {"position": pos_ttl, "rmsLimit": funds_ttl}
+        self.lock = threading.Lock()
+        self.gen = 0                                          # bumped by every invalidation
+        self.cache: Dict[str, Tuple[float, Any, Any]] = {}    # endpoint -> (expires, raw response, normalized)
+        self.stats = {"fetches": 0, "hits": 0, "invalidations": 0}
+        listeners = getattr(sc, "listeners", None)            # PaperBroker: called on every fill
+        if isinstance(listeners, list): listeners.append(lambda *_: self.invalidate())
+
+    def _get(self, ep: str, fresh: bool = False) -> Tuple[Any, Any]:
+        with self.lock:
+            hit = self.cache.get(ep)
+            if hit and not fresh and hit[0] > time.monotonic():
+                self.stats["hits"] += 1
+                return hit[1], hit[2]
+            gen = self.gen
+        raw = self.fetch(ep)
+        norm = [Pos.of(r) for r in _rows(raw)] if ep == "position" else Funds.of((raw or {}).get("data") or {})
+        with self.lock:
+            self.stats["fetches"] += 1
+            if gen == self.gen: self.cache[ep] = (time.monotonic() + self.ttl[ep], raw, norm)
+        return raw, norm
+
+    def raw(self, ep: str, fresh: bool = False) -> Any:
+        """The broker's own response for position / rmsLimit, cached like the rest."""
+        return self._get(ep, fresh)[0]
+
+    def positions(self, fresh: bool = False) -> List[Pos]:
+        return self._get("position", fresh)[1]
+
+    def open(self, fresh: bool = False) -> List[Pos]:
+        return [p for p in self.positions(fresh) if p.netqty]
+
+    def pnl(self, fresh: bool = False) -> Optional[float]:
+        vals = [p.pnl for p in self.positions(fresh) if p.pnl is not None]
+        return float(sum(vals)) if vals else None
+
+    def funds(self, fresh: bool = False) -> Funds:
+        return self._get("rmsLimit", fresh)[1]
+
+    def balance(self, fresh: bool = False) -> float:
+        f = self.funds(fresh)
+        return f.net or f.available_cash
+
+    def invalidate(self):
+        with self.lock:
+            self.gen += 1; self.cache.clear()
+            self.stats["invalidations"] += 1
+
+    def on_order_update(self, msg: Any = None):
+        """Order-update feed callback: any order event may have moved positions or margin."""
+        self.invalidate()
+
+_books: Dict[int, Tuple[Any, Book]] = {}
+_mk = threading.Lock()
+
+def book(sc: Any, **kw) -> Book:
+    """Process-wide Book per SmartConnect-like object."""
+    with _mk:
+        hit = _books.get(id(sc))
+        if hit is None or hit[0] is not sc:
+            hit = _books[id(sc)] = (sc, Book(sc, **kw))
+        return hit[1]
+
+def invalidate(sc: Any = None):
+    """Drop the cached book of `sc` (every book when None); never creates one."""
+    with _mk:
+        hits = [h for h in _books.values() if sc is None or h[0] is sc]
+    for _, b in hits: b.invalidate()
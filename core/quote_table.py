@@ -0,0 +1,291 @@
+"""
+Shared-memory latest-quote table: one feed process writes, every bot process
+on the box reads, with no locks and no IPC on the read path.
+
+Layout of the mapped file (AO_QUOTE_TABLE, default /dev/shm/ao_quotes),
+little-endian:
+  header  64 bytes   magic "AOQT", version, slots, slot size, writer pid, created
+  slot    96 bytes   seq u64 | exchange type u8, pad | token 24s |
+                     ltp, bid, ask f64 | volume, oi i64 | exchange ts, written at f64
+Slots are an open-addressed hash table on crc32(exchange, token), claimed by
+the writer and never moved, so a reader caches its slot index per token --
+per writer generation (the header's pid/created): a restarted publisher
+restamps the header and readers remap and drop their cache, and a hit whose
+slot holds another key is probed again.
+
+Each slot is a seqlock: the writer makes seq odd, writes the fields, makes it
+even again; a reader retries while seq is odd or changed under it. Only one
+writer may hold the table (flock on <table>.lock). A table of the wrong size
+is never truncated under mapped readers (SIGBUS): the writer builds a new
+file, renames it into place and stamps the old header retired.
+
+  python -m core.quote_table --publish NSE:99926000,NFO:43854   # feed -> table (+ core.bars, core.tick_journal)
+  from core.quote_table import reader
+  t = reader()                          # None when no publisher has created the table
+  t.ltp("NFO", "43854", max_age=5)      # a few microseconds
+  t.want("NFO", "43854")                # ask the publisher to add a token
+  python -m core.quote_table --bench
+"""
+from __future__ import annotations
+import argparse, fcntl, json, mmap, os, struct, sys, threading, time, zlib
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from core.market_data import EXCH_NAME, EXCH_TYPE
+
+ROOT  = Path(__file__).resolve().parents[1]
+PATH  = Path(os.getenv("AO_QUOTE_TABLE") or ("/dev/shm/ao_quotes" if Path("/dev/shm").is_dir() else ROOT / "data" / "quotes.shm"))
+WANT  = Path(os.getenv("AO_QUOTE_WANT") or ROOT / "data" / "quote_table.want")
+SLOTS = int(os.getenv("AO_QUOTE_SLOTS", "4096"))
+MAGIC, VERSION = b"AOQT", 1
+
+HDR  = struct.Struct("<4sIIIId")              # magic, version, slots, slot size, writer pid, created
+HDR_SIZE = 64
+GEN  = struct.Struct("<Id")                    # writer pid, created: the generation readers key their cache on
+GEN_AT = 16
+SEQ  = struct.Struct("<Q")
+BODY = struct.Struct("<B7x24sdddqqdd")         # exch type, token, ltp, bid, ask, volume, oi, ts, written
+SLOT = SEQ.size + BODY.size                    # 96
+
+class Quote(NamedTuple):
+    exchange: str
+    token: str
+    ltp: float
+    bid: float
+    ask: float
+    volume: int
+    oi: int
+    ts: float                                  # exchange timestamp, epoch seconds
+    written: float                             # when the publisher wrote it (time.time())
+
+class TableFull(RuntimeError):
+    pass
+
+def _key(exch: str, token: str) -> Tuple[int, bytes]:
+    return EXCH_TYPE[exch.upper()], str(token).encode()[:24]
+
+class QuoteTable:
+    def __init__(self, path: Path = PATH, slots: int = SLOTS, writer: bool = False):
+        self.path, self.writer = path, writer
+        self.index: Dict[Tuple[int, bytes], int] = {}
+        self.asked: Set[Tuple[str, str]] = set()
+        self.lk: Optional[int] = None
+        if writer:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.lk = os.open(path.with_name(path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try: fcntl.flock(self.lk, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError: os.close(self.lk); raise RuntimeError(f"{path} already has a writer") from None
+            size = HDR_SIZE + slots * SLOT
+            try: fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError: fd = -1
+            old = fd >= 0 and os.pread(fd, 4, 0) == MAGIC
+            keep = old and os.fstat(fd).st_size == size
+            if keep:
+                self.m = mmap.mmap(fd, size)
+            else:                                  # fresh, zeroed slots in a new file
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                nfd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+                try: os.ftruncate(nfd, size); self.m = mmap.mmap(nfd, size)
+                finally: os.close(nfd)
+            HDR.pack_into(self.m, 0, MAGIC, VERSION, slots, SLOT, os.getpid(), time.time())
+            self.slots = slots
+            if keep: self._reindex()
+            else:
+                os.replace(tmp, path)
+                if old: os.pwrite(fd, GEN.pack(0, 0.0), GEN_AT)   # retired: readers of the old file remap
+            if fd >= 0: os.close(fd)
+        else:
+            self._map()
+
+    def _map(self):
+        fd = os.open(self.path, os.O_RDONLY)
+        try: m = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+        finally: os.close(fd)
+        magic, ver, slots, size, pid, created = HDR.unpack_from(m, 0)
+        if magic != MAGIC or ver != VERSION or size != SLOT: raise ValueError(f"{self.path}: not a v{VERSION} quote table")
+        self.index, self.m, self.slots, self.gen = {}, m, slots, (pid, created)
+
+    def _reindex(self):
+        for i in range(self.slots):
+            et, tok = BODY.unpack_from(self.m, HDR_SIZE + i * SLOT + SEQ.size)[:2]
+            if et: self.index[(et, tok.rstrip(b"\0"))] = i
+
+    # --- read side ---
+    def _read(self, i: int) -> Optional[tuple]:
+        off, m = HDR_SIZE + i * SLOT, self.m
+        for _ in range(1000):
+            s1 = SEQ.unpack_from(m, off)[0]
+            if s1 & 1: continue
+            rec = BODY.unpack_from(m, off + SEQ.size)
+            if SEQ.unpack_from(m, off)[0] == s1: return rec
+        return None                                # writer stuck mid-update (died): treat as missing
+
+    def _find(self, k: Tuple[int, bytes], claim: bool = False) -> Optional[int]:
+        i = self.index.get(k)
+        if i is not None: return i
+        h = zlib.crc32(b"%d:" % k[0] + k[1]) % self.slots
+        for n in range(self.slots):
+            j = (h + n) % self.slots
+            rec = self._read(j)
+            if rec is None: continue
+            if rec[0] == 0:                        # empty: the token isn't in the table (yet)
+                if not claim: return None
+                self.index[k] = j
+                return j
+            if rec[0] == k[0] and rec[1].rstrip(b"\0") == k[1]:
+                self.index[k] = j
+                return j
+        if claim: raise TableFull(f"{self.path}: all {self.slots} slots in use")
+        return None
+
+    def get(self, exch: str, token: str) -> Optional[Quote]:
+        if not self.writer and GEN.unpack_from(self.m, GEN_AT) != self.gen:
+            try: self._map()                       # publisher restarted
+            except (OSError, ValueError): return None
+        k = _key(exch, token)
+        for _ in range(2):
+            cached = k in self.index
+            i = self._find(k)
+            rec = None if i is None else self._read(i)
+            if rec and rec[0] == k[0] and rec[1].rstrip(b"\0") == k[1]:
+                return Quote(EXCH_NAME.get(rec[0], str(rec[0])), rec[1].rstrip(b"\0").decode(), *rec[2:])
+            if not cached: return None
+            self.index.pop(k, None)                # the cached slot holds something else now: probe again
+        return None
+
+    def ltp(self, exch: str, token: str, max_age: Optional[float] = None) -> Optional[float]:
+        q = self.get(exch, token)
+        if q is None or (max_age is not None and time.time() - q.written > max_age): return None
+        return q.ltp
+
+    # --- write side (the one publisher) ---
+    def put(self, exch: str, token: str, ltp: float, bid: float = 0.0, ask: float = 0.0, volume: int = 0,
+            oi: int = 0, ts: float = 0.0):
+        k = _key(exch, token)
+        off, m = HDR_SIZE + self._find(k, claim=True) * SLOT, self.m
+        seq = SEQ.unpack_from(m, off)[0]
+        SEQ.pack_into(m, off, seq + 1)
+        BODY.pack_into(m, off + SEQ.size, k[0], k[1], ltp, bid, ask, volume, oi, ts, time.time())
+        SEQ.pack_into(m, off, seq + 2)
+
+    def on_tick(self, t):
+        """core.market_data subscriber."""
+        self.put(t.exchange, t.token, t.ltp, t.bid, t.ask, t.volume, t.oi, t.ts)
+
+    # --- token requests from readers (a small flock'd file; the publisher polls it) ---
+    def want(self, exch: str, token: str):
+        if (exch.upper(), str(token)) in self.asked: return
+        self.asked.add((exch.upper(), str(token)))
+        line = f"{exch.upper()}:{token}"
+        WANT.parent.mkdir(parents=True, exist_ok=True)
+        with open(WANT, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            if line not in f.read().split(): f.write(line + "\n")
+
+    def close(self):
+        self.m.close()
+        if self.lk is not None: os.close(self.lk)
+
+def wanted() -> Set[Tuple[str, str]]:
+    try:
+        with open(WANT) as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            return {tuple(l.split(":", 1)) for l in f.read().split() if ":" in l}
+    except FileNotFoundError:
+        return set()
+
+_rd: Optional[QuoteTable] = None
+_mk = threading.Lock()
+
+def reader(path: Path = PATH) -> Optional[QuoteTable]:
+    """Process-wide read handle; None while no publisher has created the table."""
+    global _rd
+    with _mk:
+        if _rd is None:
+            try: _rd = QuoteTable(path)
+            except (FileNotFoundError, ValueError): return None
+        return _rd
+
+def publish(keys: Set[Tuple[str, str]], mode: str = "SNAP_QUOTE", path: Path = PATH, bars: bool = True,
+            journal: bool = True):
+    """Feed -> table until interrupted; picks up reader want() requests every second.
+
+    With bars, the same ticks also build core.bars bars, appended to the candle
+    store as they close (idle tokens' bars are flushed in the 1 s loop); with
+    journal, every tick is recorded by core.tick_journal."""
+    from core.market_data import MarketData
+    tab, md = QuoteTable(path, writer=True), MarketData()
+    rec = None
+    if journal:
+        from core.tick_journal import Recorder
+        rec = Recorder().start(); md.subscribe(rec.on_tick)
+    md.subscribe(tab.on_tick)
+    bb = None
+    if bars:
+        from core.bars import BarBuilder
+        bb = BarBuilder(); md.subscribe(bb.on_tick)
+    for ex, tok in keys: md.watch(ex, [tok], mode)
+    md.start()
+    print(json.dumps({"event": "quote_table_up", "path": str(path), "slots": tab.slots, "tokens": len(keys)}), flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+            for ex, tok in wanted() - keys: md.watch(ex, [tok], mode); keys.add((ex, tok))
+            if bb is not None: bb.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        md.stop()
+        if bb is not None: bb.flush()
+        if rec is not None: rec.stop()
+        print(json.dumps({"event": "quote_table_down", **md.stats, **({"bars": bb.stats} if bb else {}),
+                          **({"journal": rec.stats} if rec else {})}), flush=True)
+
+def bench(n: int = 200000, tokens: int = 500) -> Dict[str, float]:
+    """Write and read cost, plus torn reads seen by a second process reading during the writes."""
+    import multiprocessing as mp
+    path = Path(f"/tmp/ao_quotes_bench_{os.getpid()}")
+    w = QuoteTable(path, slots=SLOTS, writer=True)
+    toks = [str(40000 + i) for i in range(tokens)]
+    for t in toks: w.put("NFO", t, 100.0, 99.95, 100.05)
+    t0 = time.perf_counter()
+    for i in range(n):
+        px = 100.0 + i % 1000 * 0.05
+        w.put("NFO", toks[i % tokens], px, px - 0.05, px + 0.05, i, i)
+    put_us = (time.perf_counter() - t0) / n * 1e6
+    r = QuoteTable(path)
+    t0 = time.perf_counter()
+    for i in range(n): r.ltp("NFO", toks[i % tokens])
+    get_us = (time.perf_counter() - t0) / n * 1e6
+
+    def torn(path, toks, out):
+        rd, bad, reads, end = QuoteTable(path), 0, 0, time.time() + 1.0
+        while time.time() < end:
+            for t in toks[:50]:
+                q = rd.get("NFO", t); reads += 1
+                if q and (abs(q.bid - (q.ltp - 0.05)) > 1e-9 or q.volume != q.oi): bad += 1
+        out.put((reads, bad))
+    out = mp.Queue(); p = mp.Process(target=torn, args=(path, toks, out)); p.start()
+    end, i = time.time() + 1.0, 0
+    while time.time() < end:
+        px = 100.0 + i % 1000 * 0.05; w.put("NFO", toks[i % 50], px, px - 0.05, px + 0.05, i, i); i += 1
+    reads, bad = out.get(); p.join()
+    r.close(); w.close(); path.unlink(); path.with_name(path.name + ".lock").unlink()
+    return {"put_us": round(put_us, 2), "get_us": round(get_us, 2), "concurrent_writes": i, "concurrent_reads": reads, "torn_reads": bad}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Shared-memory latest-quote table")
+    ap.add_argument("--publish", metavar="EXCH:TOKEN,...", help="run the feed and write the table")
+    ap.add_argument("--mode", default="SNAP_QUOTE", choices=("LTP", "QUOTE", "SNAP_QUOTE"))
+    ap.add_argument("--no-bars", dest="bars", action="store_false", help="don't build core.bars bars from the feed")
+    ap.add_argument("--no-journal", dest="journal", action="store_false", help="don't record ticks (core.tick_journal)")
+    ap.add_argument("--bench", action="store_true")
+    a = ap.parse_args()
+    if a.bench: print(json.dumps(bench()))
+    elif a.publish is not None:
+        publish({tuple(k.split(":", 1)) for k in a.publish.split(",") if ":" in k} | wanted(), a.mode, bars=a.bars, journal=a.journal)
+    else:
+        t = reader()
+        if t is None: sys.exit(f"no quote table at {PATH}")
+        print(json.dumps([t.get(ex, tok)._asdict() for ex, tok in sorted(wanted()) if t.get(ex, tok)]))
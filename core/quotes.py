@@ -0,0 +1,125 @@
+"""
+Micro-batching quote service over getMarketData.
+
+Concurrent single-token requests (ltp(), get()) are collected for a short
+window (AO_QUOTE_WINDOW_MS, default 5 ms) and sent as one getMarketData call
+per mode -- tokens of all exchanges in one exchangeTokens map, up to 50 per
+call -- and each waiting caller gets its own row back. The first caller of a
+window is the one that sends it, so there is no background thread; a token
+asked for twice in one window is fetched once.
+
+ltp() answers from the shared-memory quote table (core.quote_table) when a
+publisher keeps that token fresh, and asks the publisher for it otherwise.
+
+  from core.quotes import quotes
+  q = quotes(sc)
+  q.ltp("NFO", "43854")                          # blocks ~window + one round trip
+  q.get_many([("NSE", "26000"), ("NFO", "43854")], mode="OHLC")
+  q.stats()                                      # batch-size distribution
+"""
+from __future__ import annotations
+import os, threading, time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Tuple
+
+from core.paper_broker import PaperBroker
+from core.quote_table import reader
+from core.ratelimit import limited
+from core.retry import resilient
+from core.session_broker import BrokerClient
+
+WINDOW_MS = float(os.getenv("AO_QUOTE_WINDOW_MS", "5"))
+MAX_BATCH = 50                      # getMarketData accepts up to 50 tokens per request
+MODES = ("LTP", "OHLC", "FULL")    # getMarketData modes; rows of a wider mode carry the narrower fields
+TABLE_MAX_AGE = float(os.getenv("AO_QUOTE_MAX_AGE", "5"))   # older quote-table prices go to REST
+
+Key = Tuple[str, str]               # (exchange, token)
+
+class QuoteService:
+    def __init__(self, sc: Any, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        # broker connections limit and retry server-side; a paper broker's md does its own
+        self.sc = sc if isinstance(sc, (BrokerClient, PaperBroker)) else resilient(limited(sc))
+        self.window, self.max_batch = window_ms / 1e3, max_batch
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Dict[Key, List[Future]]] = {}   # mode -> key -> waiters
+        self.sizes: Counter = Counter()                         # tokens per getMarketData call -> calls
+        self.requests = self.table_hits = 0
+
+    def _submit(self, mode: str, key: Key) -> Tuple[Future, bool]:
+        """Queue one request; True when this caller opened the window (and must flush it)."""
+        fut: Future = Future()
+        with self.lock:
+            self.requests += 1
+            batch, lead = self.pending.get(mode), False
+            if batch is None: batch, lead = self.pending.setdefault(mode, {}), True
+            batch.setdefault(key, []).append(fut)
+        return fut, lead
+
+    def _flush(self, mode: str):
+        time.sleep(self.window)
+        with self.lock:
+            batch = self.pending.pop(mode, {})
+        keys = list(batch)
+        for i in range(0, len(keys), self.max_batch):
+            chunk = keys[i:i + self.max_batch]
+            toks: Dict[str, List[str]] = {}
+            for ex, tok in chunk: toks.setdefault(ex, []).append(tok)
+            self.sizes[len(chunk)] += 1
+            try:
+                r = self.sc.getMarketData(mode, toks)
+                if not (r or {}).get("status"): raise LookupError(f"getMarketData: {(r or {}).get('message') or r}")
+                rows = {(d.get("exchange"), str(d.get("symbolToken"))): d for d in (r.get("data") or {}).get("fetched") or []}
+            except Exception as e:
+                for k in chunk:
+                    for f in batch[k]: f.set_exception(e)
+                continue
+            for k in chunk:
+                row = rows.get(k)
+                for f in batch[k]:
+                    if row is None: f.set_exception(LookupError(f"{k[0]}:{k[1]} not fetched"))
+                    else: f.set_result(row)
+
+    def get(self, exch: str, token: str, mode: str = "LTP", timeout: float = 10.0) -> Dict[str, Any]:
+        """The getMarketData row for one token (keys as the API returns them: ltp, tradingSymbol, ...)."""
+        fut, lead = self._submit(mode, (exch.upper(), str(token)))
+        if lead: self._flush(mode)
+        return fut.result(timeout)
+
+    def ltp(self, exch: str, token: str, timeout: float = 10.0) -> float:
+        t = reader()
+        if t is not None:
+            px = t.ltp(exch, token, max_age=TABLE_MAX_AGE)
+            if px is not None:
+                self.table_hits += 1
+                return px
+            t.want(exch, token)
+        return float(self.get(exch, token, "LTP", timeout)["ltp"])
+
+    def get_many(self, keys: Iterable[Key], mode: str = "LTP", timeout: float = 10.0) -> Dict[Key, Dict[str, Any]]:
+        """Rows for many tokens at once; tokens the API didn't return are left out."""
+        subs = [((ex.upper(), str(tok)),) + self._submit(mode, (ex.upper(), str(tok))) for ex, tok in keys]
+        if any(lead for _, _, lead in subs): self._flush(mode)
+        out = {}
+        for k, fut, _ in subs:
+            try: out[k] = fut.result(timeout)
+            except LookupError: pass
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = sorted(self.sizes.elements())
+        calls = len(sizes)
+        return {"requests": self.requests, "table_hits": self.table_hits, "calls": calls, "calls_saved": self.requests - calls,
+                "batch_p50": sizes[calls // 2] if calls else 0, "batch_max": sizes[-1] if calls else 0,
+                "batch_sizes": dict(sorted(self.sizes.items()))}
+
+_svc: Dict[int, Tuple[Any, QuoteService]] = {}
+_mk = threading.Lock()
+
+def quotes(sc: Any, **kw) -> QuoteService:
+    """Process-wide QuoteService per SmartConnect-like object."""
+    with _mk:
+        hit = _svc.get(id(sc))
+        if hit is None or hit[0] is not sc:
+            hit = _svc[id(sc)] = (sc, QuoteService(sc, **kw))
+        return hit[1]
@@ -0,0 +1,152 @@
+"""
+Proactive token-bucket limiter for SmartAPI calls, shared by every process on
+the box through one flock'd state file (data/ratelimit.state).
+
+Each endpoint has Angel One's published per-second (and, where published,
+per-minute) limits; on top of that one account-wide bucket (AO_RL_GLOBAL/s)
+carries the priority lanes:
+  hi  -- placeOrder / modifyOrder / cancelOrder: may drain the global bucket
+  lo  -- everything else (ltpData, getCandleData polling, books): must leave
+         AO_RL_RESERVE tokens and yields while any hi caller is queued
+Time spent queued is recorded per endpoint (python -m core.ratelimit shows it).
+
+  from core.ratelimit import acquire, limited
+  acquire("ltpData")               # blocks until a token is available
+  sc = limited(SmartConnect(...))  # same, around every known endpoint call
+"""
+from __future__ import annotations
+import fcntl, json, os, sys, threading, time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+ROOT  = Path(__file__).resolve().parents[1]
+STATE = Path(os.getenv("AO_RL_STATE") or ROOT / "data" / "ratelimit.state")
+
+# endpoint -> (per second, per minute or 0)
+LIMITS: Dict[str, Tuple[float, float]] = {
+    "placeOrder": (20, 500), "placeOrderFullResponse": (20, 500), "modifyOrder": (20, 500), "cancelOrder": (20, 500),
+    "ltpData": (10, 500), "getMarketData": (10, 500), "getCandleData": (3, 180), "getOIData": (3, 180),
+    "individual_order_details": (10, 0), "orderBook": (1, 0), "tradeBook": (1, 0), "position": (1, 0),
+    "holding": (1, 0), "allholding": (1, 0), "rmsLimit": (2, 0), "searchScrip": (1, 0), "generateSession": (1, 0),
+}
+HIGH = {"placeOrder", "placeOrderFullResponse", "modifyOrder", "cancelOrder"}
+GLOBAL  = float(os.getenv("AO_RL_GLOBAL", "25"))
+RESERVE = float(os.getenv("AO_RL_RESERVE", "3"))
+LEASE   = 2.0      # a queued hi caller that stops refreshing this long is ignored
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+_local = threading.Lock()
+_fds: Dict[Path, int] = {}
+_waits: Dict[str, Deque[float]] = {}
+
+@contextmanager
+def _locked(path: Path = STATE):
+    with _local:
+        fd = _fds.get(path)
+        if fd is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = _fds[path] = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(fd, 1 << 20, 0)
+            try: st = json.loads(raw) if raw else {}
+            except ValueError: st = {}
+            yield st
+            out = json.dumps(st, separators=(",", ":")).encode()
+            os.pwrite(fd, out, 0); os.ftruncate(fd, len(out))
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+def _refill(b: list, rate: float, cap: float, now: float) -> list:
+    # b = [tokens, last refill]; new buckets start full
+    if not b: return [cap, now]
+    return [min(cap, b[0] + (now - b[1]) * rate), now]
+
+def _buckets(ep: str) -> list:
+    """[(key, rate/s, capacity)] that one call to ep draws from."""
+    out = [("*", GLOBAL, GLOBAL)]
+    ps, pm = LIMITS.get(ep, (0, 0))
+    if ps: out.append((f"{ep}/s", ps, ps))
+    if pm: out.append((f"{ep}/m", pm / 60.0, pm))
+    return out
+
+def acquire(ep: str, lane: Optional[str] = None, timeout: Optional[float] = None, state: Path = STATE) -> float:
+    """Block until ep may be called; returns seconds spent queued."""
+    if os.getenv("AO_RL", "1") == "0": return 0.0
+    lane = lane or ("hi" if ep in HIGH else "lo")
+    me = f"{os.getpid()}.{threading.get_ident()}"
+    t0 = time.time()
+    while True:
+        with _locked(state) as st:
+            now = time.time()
+            bk, hi = st.setdefault("b", {}), st.setdefault("hi", {})
+            for k in [k for k, until in hi.items() if until < now]: del hi[k]
+            need = _buckets(ep)
+            for k, rate, cap in need: bk[k] = _refill(bk.get(k), rate, cap, now)
+            floor = 1.0 if lane == "hi" else 1.0 + RESERVE
+            blocked = lane != "hi" and any(k != me for k in hi)
+            short = [(k, rate, (floor if k == "*" else 1.0) - bk[k][0]) for k, rate, _ in need
+                     if bk[k][0] < (floor if k == "*" else 1.0)]
+            if not short and not blocked:
+                for k, _, _ in need: bk[k][0] -= 1.0
+                hi.pop(me, None)
+                waited = now - t0
+                m = st.setdefault("m", {}).setdefault(ep, [0, 0, 0.0, 0.0])   # calls, queued, wait_ms sum, max
+                m[0] += 1; m[1] += waited > 0.001; m[2] += waited * 1e3; m[3] = max(m[3], waited * 1e3)
+                _waits.setdefault(ep, deque(maxlen=1000)).append(waited * 1e3)
+                return waited
+            if lane == "hi": hi[me] = now + LEASE
+            nap = max((d / r for _, r, d in short), default=0.005)
+        if timeout is not None and now - t0 + nap > timeout:
+            with _locked(state) as st: st.get("hi", {}).pop(me, None)
+            raise RateLimitTimeout(f"{ep}: no token within {timeout}s")
+        time.sleep(min(max(nap, 0.001), 0.05))
+
+class Limited:
+    """Wraps a SmartConnect-like object; calls to endpoints in LIMITS acquire first."""
+    def __init__(self, sc: Any, state: Path = STATE):
+        self._sc, self._state = sc, state
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._sc, name)
+        if name not in LIMITS or not callable(attr): return attr
+        def call(*a, **kw):
+            acquire(name, state=self._state)
+            return attr(*a, **kw)
+        return call
+
+def _wraps(sc: Any, cls: type) -> bool:
+    # anywhere in a wrapper chain (Resilient(Limited(...)) included): wrapping twice spends two tokens per call
+    while sc is not None:
+        if isinstance(sc, cls): return True
+        sc = getattr(sc, "__dict__", {}).get("_sc")
+    return False
+
+def limited(sc: Any) -> Any:
+    """sc behind the token buckets; as is when it already is."""
+    return sc if sc is None or _wraps(sc, Limited) else Limited(sc)
+
+def stats(state: Path = STATE) -> Dict[str, Any]:
+    """Per-endpoint queue-wait metrics: all processes (state file) + this process's percentiles."""
+    with _locked(state) as st:
+        m = dict(st.get("m", {}))
+    out = {}
+    for ep, (n, queued, tot, mx) in m.items():
+        row = {"calls": n, "queued": queued, "wait_ms_avg": round(tot / n, 3) if n else 0.0, "wait_ms_max": round(mx, 3)}
+        xs = sorted(_waits.get(ep, ()))
+        if xs: row.update(p50_ms=round(xs[len(xs)//2], 3), p95_ms=round(xs[min(len(xs)-1, int(0.95*len(xs)))], 3))
+        out[ep] = row
+    return out
+
+def reset_stats(state: Path = STATE):
+    with _locked(state) as st: st.pop("m", None)
+    _waits.clear()
+
+if __name__ == "__main__":
+    # python -m core.ratelimit [--reset]
+    if "--reset" in sys.argv: reset_stats()
+    print(json.dumps(stats(), indent=2, sort_keys=True))
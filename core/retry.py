@@ -0,0 +1,187 @@
+"""
+One retry policy for every SmartAPI call site.
+
+  classify(e)  -> "rate" | "transient" | "fatal"
+    rate       Angel One's access-rate rejections (the request was refused,
+               nothing happened) -- retried for every endpoint
+    transient  network errors, timeouts, 5xx / unparseable bodies -- retried
+               for idempotent reads only; for orders the outcome is unknown,
+               so they are raised rather than risk a duplicate
+    fatal      token/input/order rejections and anything unrecognised
+
+Each endpoint has a circuit breaker: FAIL_MAX consecutive transient failures
+open it, calls then fail fast with CircuitOpen for RESET seconds, after which
+one probe call decides between closing and re-opening.
+
+Reads in HEDGE get one duplicate request when the first hasn't answered by the
+endpoint's observed p95 latency; whichever succeeds first wins.
+
+  from core.retry import call, resilient
+  call("orderBook", sc.orderBook)
+  sc = resilient(limited(sc))      # same, around every SmartConnect method
+"""
+from __future__ import annotations
+import os, random, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+RATE, TRANSIENT, FATAL = "rate", "transient", "fatal"
+RL = (
+    "Access denied because of exceeding access rate",
+    "Too many requests",
+    "Request rate limit exceeded",
+)
+IDEMPOTENT = {"ltpData", "quote", "getMarketData", "orderBook", "tradeBook", "position", "holding", "allholding",
+              "rmsLimit", "getCandleData", "getOIData", "individual_order_details", "searchScrip", "getProfile",
+              "gttDetails", "gttLists", "getMarginApi", "estimateCharges", "optionGreek", "putCallRatio"}
+HEDGE = {"ltpData", "quote", "getMarketData", "orderBook", "position"}
+FAIL_MAX  = int(os.getenv("AO_CB_FAILS", "5"))
+RESET     = float(os.getenv("AO_CB_RESET", "15"))
+HEDGE_MIN = float(os.getenv("AO_HEDGE_MIN_MS", "25")) / 1e3   # never hedge sooner than this
+SAMPLES   = 20                                               # latencies needed before hedging
+
+class CircuitOpen(RuntimeError):
+    pass
+
+def classify(e: BaseException) -> str:
+    m = str(e).lower()
+    if any(x.lower() in m for x in RL): return RATE
+    if isinstance(e, TimeoutError) and type(e).__name__ == "RateLimitTimeout": return RATE
+    if isinstance(e, (OSError, TimeoutError)): return TRANSIENT        # requests' errors are OSErrors too
+    code = getattr(e, "code", None)
+    if type(e).__name__ in ("NetworkException", "DataException"): return TRANSIENT if code is None or code >= 500 else FATAL
+    if type(e).__name__ == "GeneralException" and (code or 500) >= 500: return TRANSIENT
+    return FATAL
+
+class Breaker:
+    """closed -> open after fail_max transient failures -> half-open probe after reset seconds."""
+    def __init__(self, fail_max: int = FAIL_MAX, reset: float = RESET):
+        self.fail_max, self.reset = fail_max, reset
+        self.fails, self.opened, self.probing = 0, 0.0, False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.fails < self.fail_max: return "closed"
+        return "half-open" if time.monotonic() - self.opened >= self.reset else "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            st = self.state
+            if st == "closed": return True
+            if st == "half-open" and not self.probing:
+                self.probing = True; return True
+            return False
+
+    def ok(self):
+        with self.lock: self.fails, self.probing = 0, False
+
+    def fail(self):
+        with self.lock:
+            self.fails += 1; self.probing = False
+            if self.fails >= self.fail_max: self.opened = time.monotonic()
+
+_breakers: Dict[str, Breaker] = {}
+_lat: Dict[str, Deque[float]] = {}
+_counts: Dict[str, Dict[str, int]] = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_mk = threading.Lock()
+
+def breaker(ep: str) -> Breaker:
+    with _mk:
+        if ep not in _breakers: _breakers[ep] = Breaker()
+        return _breakers[ep]
+
+def _count(ep: str, k: str):
+    c = _counts.setdefault(ep, {})
+    c[k] = c.get(k, 0) + 1
+
+def p95(ep: str) -> Optional[float]:
+    xs = _lat.get(ep)
+    if not xs or len(xs) < SAMPLES: return None
+    s = sorted(xs)
+    return s[min(len(s)-1, int(0.95*len(s)))]
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _mk:
+        if _pool is None: _pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        return _pool
+
+def _hedged(ep: str, fn: Callable, a: tuple, kw: dict) -> Any:
+    after = p95(ep)
+    if after is None: return fn(*a, **kw)
+    ex = _executor()
+    first = ex.submit(fn, *a, **kw)
+    done, _ = wait([first], timeout=max(after, HEDGE_MIN))
+    if done: return first.result()
+    _count(ep, "hedged")
+    pending = {first, ex.submit(fn, *a, **kw)}
+    err = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                if f is not first: _count(ep, "hedge_won")
+                return f.result()
+            err = f.exception()
+    raise err
+
+def call(ep: str, fn: Callable, *a, tries: int = 6, base: float = 0.6, cap: float = 5.0,
+         idempotent: Optional[bool] = None, hedge: bool = True, **kw) -> Any:
+    """fn(*a, **kw) under ep's breaker, with classified retries and (for HEDGE reads) a hedge past p95."""
+    if getattr(fn, "remote", False): return fn(*a, **kw)   # session broker applies this policy itself
+    idem = ep in IDEMPOTENT if idempotent is None else idempotent
+    cb = breaker(ep)
+    for i in range(tries):
+        if not cb.allow():
+            _count(ep, "fast_fail")
+            raise CircuitOpen(f"{ep}: circuit open after {cb.fails} failures; retry in {cb.reset:g}s")
+        t = time.perf_counter()
+        try:
+            r = _hedged(ep, fn, a, kw) if hedge and ep in HEDGE else fn(*a, **kw)
+        except Exception as e:
+            kind = classify(e)
+            _count(ep, kind)
+            if kind == TRANSIENT: cb.fail()
+            else: cb.ok()                    # the service answered
+            if kind == FATAL or (kind == TRANSIENT and not idem) or i == tries - 1: raise
+            time.sleep(min(cap, base * (2 ** i)) + random.uniform(0, 0.4))
+            continue
+        cb.ok()
+        _lat.setdefault(ep, deque(maxlen=200)).append(time.perf_counter() - t)
+        return r
+
+class Resilient:
+    """Wraps a SmartConnect-like object; every public method call goes through call()."""
+    def __init__(self, sc: Any, hedge: bool = True):
+        self._sc, self._hedge = sc, hedge
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._sc, name)
+        if name.startswith("_") or not callable(attr): return attr
+        def run(*a, **kw):
+            return call(name, attr, *a, hedge=self._hedge, **kw)
+        return run
+
+def _wraps(sc: Any, cls: type) -> bool:
+    # anywhere in a wrapper chain (Limited(Resilient(...)) included): retries inside retries multiply
+    while sc is not None:
+        if isinstance(sc, cls): return True
+        sc = getattr(sc, "__dict__", {}).get("_sc")
+    return False
+
+def resilient(sc: Any, hedge: bool = True) -> Any:
+    """sc with call() around every method; as is when it already is."""
+    return sc if sc is None or _wraps(sc, Resilient) else Resilient(sc, hedge)
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for ep in set(_counts) | set(_breakers) | set(_lat):
+        row: Dict[str, Any] = dict(_counts.get(ep, {}))
+        if ep in _breakers: row["breaker"] = _breakers[ep].state
+        q = p95(ep)
+        if q is not None: row["p95_ms"] = round(q * 1e3, 3)
+        out[ep] = row
+    return out
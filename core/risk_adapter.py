@@ -19,6 +19,15 @@ except Exception as e:
 def load_risk_config() -> RiskConfig:
     return RiskConfig()
 
-def calc_lots(balance: float, option_price: float, lot_size: int, cfg: RiskConfig|None=None) -> int:
+def calc_lots(balance: float|None, option_price: float, lot_size: int, cfg: RiskConfig|None=None, sc=None) -> int:
+    # balance=None sizes against the account's funds: rmsLimit via core.positions (cached),
+    # through sc or else the session broker
+    if balance is None:
+        from core.positions import book
+        if sc is None:
+            from core.session_broker import shared_api
+            sc = shared_api()
+        if sc is None: raise ValueError("calc_lots: balance=None needs sc (or a running session broker) to read funds")
+        balance = book(sc).balance()
     cfg = cfg or RiskConfig()
     return int(max(0, position_size_for_option(balance=balance, option_price=option_price, lot_size=lot_size, cfg=cfg)))
@@ -0,0 +1,206 @@
+"""
+One long-lived SmartAPI session shared by every script over a Unix socket
+(data/session.sock). The broker logs in once, renews the JWT from the refresh
+token ahead of expiry, and executes SmartConnect calls for local clients.
+
+Wire format, one JSON object per line both ways (connections are reused):
+  {"method": "position", "args": [], "kwargs": {}} -> {"ok": true, "result": ...}
+                                                    | {"ok": false, "type": "DataException", "error": "..."}
+  {"cmd": "methods"} -> {"ok": true, "result": [callable names]}
+  {"cmd": "tokens"}  -> {"ok": true, "result": {"jwt", "feed", "refresh", "client", "expires_at"}}
+  {"cmd": "stats"}   -> {"ok": true, "result": {calls, errors, logins, renewals, up_s, book}}
+
+  python -m core.session_broker [--sock data/session.sock] [--renew-ahead 900]
+
+Scripts call shared_api(): a SmartConnect look-alike proxy when the broker is
+up, None otherwise (so they keep their own login as the fallback).
+
+position and rmsLimit are answered from one core.positions.Book (short TTL),
+dropped whenever an order is placed, modified or cancelled through the broker.
+"""
+from __future__ import annotations
+import argparse, json, os, signal, socket, socketserver, sys, threading, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.positions import ENDPOINTS as CACHED, Book
+from core.ratelimit import HIGH, acquire
+from core.retry import call as retry
+
+ROOT = Path(__file__).resolve().parents[1]
+SOCK = ROOT / "data" / "session.sock"
+# calls that would end or replace the shared session
+DENY = {"generateSession", "terminateSession", "logout", "generateToken", "renewAccessToken",
+        "setAccessToken", "setRefreshToken", "setFeedToken", "setUserId", "setSessionExpiryHook"}
+
+class BrokerError(RuntimeError):
+    pass
+
+# --- server ---
+class SessionBroker:
+    def __init__(self, renew_ahead: float = 900.0):
+        from core.smart_session import SmartSession, CLIENT_ID
+        self.sess, self.client = SmartSession(), CLIENT_ID
+        self.renew_ahead = renew_ahead
+        self.lock = threading.Lock()          # guards login/renew, not calls
+        self.stats = {"calls": 0, "errors": 0, "logins": 0, "renewals": 0, "started": time.time()}
+        self._methods: List[str] = []
+        self.book = Book(fetch=lambda ep: self._call(ep, [], {}))
+
+    def refresh(self):
+        with self.lock:
+            jwt, t0 = self.sess.jwt, self.sess.last_login
+            self.sess.ensure_fresh(self.renew_ahead)
+            if self.sess.last_login != t0: self.stats["logins"] += 1
+            elif self.sess.jwt != jwt: self.stats["renewals"] += 1
+        return self.sess.sc
+
+    def methods(self) -> List[str]:
+        if not self._methods:
+            sc = self.refresh()
+            self._methods = sorted(n for n in dir(sc) if not n.startswith("_") and n not in DENY and callable(getattr(sc, n)))
+        return self._methods
+
+    def call(self, method: str, args: list, kwargs: dict) -> Any:
+        if method not in self.methods(): raise AttributeError(f"SmartConnect has no callable {method!r}")
+        self.stats["calls"] += 1
+        if method in CACHED and not args and not kwargs: return self.book.raw(method)
+        try:
+            return self._call(method, args, kwargs)
+        finally:
+            if method in HIGH: self.book.invalidate()
+
+    def _call(self, method: str, args: list, kwargs: dict) -> Any:
+        fn = getattr(self.refresh(), method)
+        def once(*a, **kw):
+            acquire(method)                   # account-wide limits, shared with non-broker callers
+            return fn(*a, **kw)
+        try:
+            return retry(method, once, *args, **kwargs)   # one breaker per endpoint for every client
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    def handle(self, req: dict) -> dict:
+        try:
+            cmd = req.get("cmd")
+            if cmd == "methods": return {"ok": True, "result": self.methods()}
+            if cmd == "tokens":
+                self.refresh(); s = self.sess
+                return {"ok": True, "result": {"jwt": s.jwt, "feed": s.feed, "refresh": s.refresh,
+                                               "client": self.client, "expires_at": s.expires_at}}
+            if cmd == "stats":
+                st = dict(self.stats); st["up_s"] = round(time.time() - st.pop("started"), 1)
+                st["book"] = dict(self.book.stats)
+                return {"ok": True, "result": st}
+            return {"ok": True, "result": self.call(req["method"], req.get("args") or [], req.get("kwargs") or {})}
+        except Exception as e:
+            return {"ok": False, "type": type(e).__name__, "error": str(e)}
+
+    def keep_fresh(self, stop: threading.Event, every: float = 60.0):
+        while not stop.wait(every):
+            try: self.refresh()
+            except Exception as e: print(json.dumps({"event": "session_renew_fail", "err": str(e)}), flush=True)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try: out = self.server.broker.handle(json.loads(line))
+            except ValueError as e: out = {"ok": False, "type": "ValueError", "error": f"bad request: {e}"}
+            self.wfile.write((json.dumps(out, ensure_ascii=False, default=str) + "\n").encode()); self.wfile.flush()
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def _term(*a):
+    raise KeyboardInterrupt
+
+def _bind(sock: Path) -> _Server:
+    sock.unlink(missing_ok=True)
+    old = os.umask(0o077)                 # the socket hands out a live session: owner-only from bind on
+    try:
+        return _Server(str(sock), _Handler)
+    finally:
+        os.umask(old)
+
+def serve(sock: Path = SOCK, renew_ahead: float = 900.0):
+    broker = SessionBroker(renew_ahead)
+    broker.refresh()                      # log in before accepting clients
+    srv = _bind(sock); srv.broker = broker
+    stop = threading.Event()
+    threading.Thread(target=broker.keep_fresh, args=(stop,), daemon=True).start()
+    signal.signal(signal.SIGTERM, _term)
+    print(json.dumps({"event": "session_broker_up", "sock": str(sock), "pid": os.getpid()}), flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set(); srv.server_close(); sock.unlink(missing_ok=True)
+        print(json.dumps({"event": "session_broker_down", **broker.handle({"cmd": "stats"})["result"]}), flush=True)
+
+# --- client ---
+def _raise(resp: dict):
+    typ, msg = resp.get("type") or "BrokerError", resp.get("error") or ""
+    try:
+        from SmartApi import smartExceptions as sx
+        cls = getattr(sx, typ, None)
+    except ImportError:
+        cls = None
+    if cls is None and typ == "CircuitOpen":
+        from core.retry import CircuitOpen as cls
+    if cls is None and typ == "AttributeError": cls = AttributeError
+    if isinstance(cls, type) and issubclass(cls, Exception): raise cls(msg)
+    raise BrokerError(f"{typ}: {msg}")
+
+class BrokerClient:
+    """SmartConnect stand-in: attribute access yields a function that runs remotely in the broker."""
+    def __init__(self, sock: Path = SOCK, timeout: float = 30.0):
+        self._s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._s.settimeout(timeout); self._s.connect(str(sock))
+        self._f = self._s.makefile("rb")
+        self._lock = threading.Lock()
+        self._methods = set(self._request({"cmd": "methods"}))
+
+    def _request(self, req: dict) -> Any:
+        with self._lock:
+            self._s.sendall((json.dumps(req, default=str) + "\n").encode())
+            line = self._f.readline()
+        if not line: raise BrokerError("session broker closed the connection")
+        resp = json.loads(line)
+        if not resp.get("ok"): _raise(resp)
+        return resp.get("result")
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or name not in self._methods:
+            raise AttributeError(name)
+        def call(*args, **kwargs):
+            return self._request({"method": name, "args": list(args), "kwargs": kwargs})
+        call.__name__, call.remote = name, True
+        return call
+
+    def tokens(self) -> Dict[str, Any]:
+        return self._request({"cmd": "tokens"})
+
+    def stats(self) -> Dict[str, Any]:
+        return self._request({"cmd": "stats"})
+
+    def close(self):
+        try: self._f.close(); self._s.close()
+        except OSError: pass
+
+def shared_api(sock: Path = SOCK) -> Optional[BrokerClient]:
+    """Proxy to the running broker, or None when it isn't up (callers then log in themselves)."""
+    if os.getenv("SESSION_BROKER", "1") == "0" or not sock.exists():
+        return None
+    try:
+        return BrokerClient(sock)
+    except (OSError, ValueError, BrokerError):
+        return None
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Shared SmartAPI session broker")
+    ap.add_argument("--sock", type=Path, default=SOCK)
+    ap.add_argument("--renew-ahead", type=float, default=900.0, help="renew the JWT this many seconds before expiry")
+    a = ap.parse_args()
+    serve(a.sock, a.renew_ahead)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, time
+import base64, json, os, time
 import pyotp
 from logzero import logger
 
@@ -9,14 +9,29 @@ try:
 except ModuleNotFoundError:
     from smartapi import SmartConnect  # fallback if available
 
-API_KEY   = os.getenv("SMARTAPI_SECRET") or os.getenv("SMARTAPI_APIKEY") or os.getenv("SMARTAPI_KEY")
-CLIENT_ID = os.getenv("SMARTAPI_CLIENT")
-PWD       = os.getenv("SMARTAPI_PWD")
-TOTP_SEC  = os.getenv("SMARTAPI_TOTP_SECRET")
+# SMARTAPI_* first, then the names the scripts' .env uses
+API_KEY   = os.getenv("SMARTAPI_SECRET") or os.getenv("SMARTAPI_APIKEY") or os.getenv("SMARTAPI_KEY") or os.getenv("SMARTAPI_API_KEY") or os.getenv("API_KEY")
+CLIENT_ID = os.getenv("SMARTAPI_CLIENT") or os.getenv("SMARTAPI_CLIENT_CODE") or os.getenv("CLIENT_CODE")
+PWD       = os.getenv("SMARTAPI_PWD") or os.getenv("SMARTAPI_PASSWORD") or os.getenv("MPIN")
+TOTP_SEC  = os.getenv("SMARTAPI_TOTP_SECRET") or os.getenv("TOTP_SECRET")
+
+def jwt_exp(jwt: str | None) -> float:
+    """exp claim of a (possibly "Bearer "-prefixed) JWT; 0 if unreadable."""
+    try:
+        body = (jwt or "").split()[-1].split(".")[1]
+        return float(json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))["exp"])
+    except (IndexError, KeyError, ValueError, TypeError):
+        return 0.0
+
+def bearer(jwt: str | None) -> str | None:
+    """JWT as this module keeps it: "Bearer "-prefixed like generateSession's (generateToken's comes bare)."""
+    if not jwt: return jwt
+    return jwt if jwt.startswith("Bearer ") else "Bearer " + jwt
 
 class SmartSession:
     def __init__(self):
         self.sc = None; self.jwt = None; self.refresh = None; self.feed = None; self.last_login = 0
+        self.expires_at = 0.0
 
     def login(self, force: bool = False):
         if not force and self.jwt and (time.time() - self.last_login < 6*3600):
@@ -24,6 +39,11 @@ class SmartSession:
         if not (API_KEY and CLIENT_ID and PWD and TOTP_SEC):
             raise RuntimeError("Missing SmartAPI env: SMARTAPI_SECRET/CLIENT/PWD/TOTP_SECRET")
 
+        try:
+            from core.transport import install
+            install()                       # pooled keep-alive HTTP for every SmartConnect call
+        except ImportError:
+            pass
         self.sc = SmartConnect(API_KEY)
         otp = pyotp.TOTP(TOTP_SEC).now()
         resp = self.sc.generateSession(CLIENT_ID, PWD, otp)
@@ -31,12 +51,34 @@ class SmartSession:
         if not isinstance(resp, dict) or not resp.get("status"):
             raise RuntimeError(f"Login failed: {resp}")
         data = resp.get("data") or {}
-        self.jwt = data.get("jwtToken"); self.refresh = data.get("refreshToken")
+        self.jwt = bearer(data.get("jwtToken")); self.refresh = data.get("refreshToken")
         self.feed = getattr(self.sc, "getfeedToken", getattr(self.sc, "getFeedToken", lambda: None))()
         self.last_login = time.time()
+        self.expires_at = jwt_exp(self.jwt) or self.last_login + 6*3600
         logger.info("SmartAPI login ok")
         return self.jwt
 
+    def renew(self):
+        """New JWT/feed token from the refresh token (no TOTP); full login if that fails."""
+        try:
+            data = (self.sc.generateToken(self.refresh) or {}).get("data") or {}
+            if not data.get("jwtToken"): raise RuntimeError(f"generateToken: {data}")
+        except Exception as e:
+            logger.warning(f"SmartAPI token renew failed ({e}); logging in again")
+            return self.login(force=True)
+        self.jwt = bearer(data["jwtToken"]); self.feed = data.get("feedToken") or self.feed
+        self.refresh = data.get("refreshToken") or self.refresh
+        self.expires_at = jwt_exp(self.jwt) or time.time() + 6*3600
+        logger.info("SmartAPI token renewed")
+        return self.jwt
+
+    def ensure_fresh(self, ahead: float = 600.0):
+        """Renew when the JWT expires within `ahead` seconds (or the day rolled)."""
+        if not self.jwt: self.login(force=True)
+        elif time.localtime(self.last_login).tm_mday != time.localtime().tm_mday: self.login(force=True)
+        elif time.time() > self.expires_at - ahead: self.renew()
+        return self.sc
+
     def ensure(self):
         if self.last_login and time.localtime(self.last_login).tm_mday != time.localtime().tm_mday:
             self.login(force=True)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import bisect, re, sys, json, time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from core.token_map import TM, TokenMap
+
+# Offline replacement for searchScrip: every non-derivative row of the
+# snapshot (equities, indices, ...) is indexed by word prefix and by
+# trigrams of its compacted name/symbol. Option/future rows are reached
+# through the strike ladders instead.
+EXCH_PREF = {e: i for i, e in enumerate(["NSE_INDICES", "INDICES", "NSE", "NFO"])}
+INDEX_TYPES = ("INDEX", "AMXIDX")
+
+def _compact(s: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", s.lower())
+
+def _grams(s: str) -> Set[str]:
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+class SymbolIndex:
+    def __init__(self, tm: TokenMap = TM):
+        self.tm = tm
+        self._snap = None
+        self.docs: List[Tuple[str, str, str, str, int]] = []   # (exch, symbol, name, inst, token)
+        self.words: List[Tuple[str, int]] = []                 # sorted (word, doc) for prefix lookups
+        self.grams: Dict[str, Set[int]] = {}
+        self._compacts: List[Tuple[str, str]] = []
+        self._full: Optional[SymbolIndex] = None
+
+    def ensure_built(self):
+        self.tm.ensure_loaded()
+        snap = self.tm.snap
+        if snap is self._snap: return
+        docs, words, grams, compacts = [], [], {}, []
+        for i in range(snap.n):
+            if snap.opt[i]: continue
+            inst = snap.s(snap.inst[i])
+            if inst.startswith("FUT"): continue
+            d = len(docs)
+            sym, name = snap.ts_bytes(i).decode(), snap.s(snap.name[i])
+            docs.append((snap.s(snap.exch[i]), sym, name, inst, snap.tok[i]))
+            nc, sc = _compact(name), _compact(sym)
+            compacts.append((nc, sc))
+            for w in set(re.findall(r"[a-z0-9]+", f"{name} {sym}".lower())) | {nc, sc}:
+                if w: words.append((w, d))
+            for g in _grams(nc) | _grams(sc):
+                grams.setdefault(g, set()).add(d)
+        words.sort()
+        self.docs, self.words, self.grams, self._compacts, self._snap = docs, words, grams, compacts, snap
+
+    def _prefix(self, p: str) -> Set[int]:
+        lo = bisect.bisect_left(self.words, (p, -1))
+        hi = bisect.bisect_left(self.words, (p + "\uffff", -1))
+        return {d for _, d in self.words[lo:hi]}
+
+    def _candidates(self, q: str) -> Set[int]:
+        qc = _compact(q)
+        if not qc: return set()
+        cands = self._prefix(qc)
+        gs = _grams(qc)
+        if gs:
+            posts = sorted((self.grams.get(g, set()) for g in gs), key=len)
+            hit = set(posts[0]).intersection(*posts[1:]) if posts[0] else set()
+            cands |= {d for d in hit if qc in self._compacts[d][0] or qc in self._compacts[d][1]}
+        for w in re.findall(r"[a-z0-9]+", q.lower()):
+            if w != qc: cands |= self._prefix(w) if len(w) >= 3 else set()
+        return cands
+
+    def score(self, d: int, q: str) -> int:
+        exch, sym, name, inst, _ = self.docs[d]
+        qu, ql = q.upper().strip(), q.lower()
+        tl = f"{name} {sym}".lower()
+        s = 0
+        if qu in (name, sym) or _compact(q) in self._compacts[d]: s += 4
+        elif name.startswith(qu) or sym.startswith(qu): s += 2
+        # index heuristics carried over from find_token / resolve_index_token
+        if "index" in tl or inst in INDEX_TYPES or exch in ("NSE_INDICES", "INDICES"): s += 2
+        if "nifty" in ql and "nifty" in tl: s += 1
+        if "bank" in ql and "bank" in tl: s += 1
+        return s
+
+    def search(self, q: str, exchanges: Optional[Sequence[str]] = None, limit: int = 20) -> List[dict]:
+        self.ensure_built()
+        ex = {e.upper() for e in exchanges} if exchanges else None
+        rows = []
+        for d in self._candidates(q):
+            exch, sym, name, inst, tok = self.docs[d]
+            if ex and exch not in ex: continue
+            rows.append({"exchange": exch, "symbol": sym, "name": name, "token": str(tok),
+                         "instrumenttype": inst, "score": self.score(d, q)})
+        if not rows and self.tm.universe:
+            # outside the TM_UNIVERSE subset: index the full snapshot on demand
+            if self._full is None: self._full = SymbolIndex(self.tm.full())
+            return self._full.search(q, exchanges, limit)
+        rows.sort(key=lambda r: (-r["score"], EXCH_PREF.get(r["exchange"], 99), r["name"], r["symbol"]))
+        return rows[:limit]
+
+    def index_token(self, name: str, exchanges: Sequence[str] = ("NSE",)) -> Optional[str]:
+        hits = self.search(name, exchanges, limit=1)
+        return hits[0]["token"] if hits else None
+
+SI = SymbolIndex()
+
+def search(q: str, exchanges: Optional[Sequence[str]] = None, limit: int = 20) -> List[dict]: return SI.search(q, exchanges, limit)
+def index_token(name: str, exchanges: Sequence[str] = ("NSE",)) -> Optional[str]: return SI.index_token(name, exchanges)
+
+if __name__ == "__main__":
+    # python -m core.symbol_search "nifty bank" [EXCH,...]
+    q = sys.argv[1] if len(sys.argv) > 1 else "NIFTY 50"
+    exs = sys.argv[2].split(",") if len(sys.argv) > 2 else None
+    t0 = time.perf_counter(); SI.ensure_built(); t1 = time.perf_counter()
+    res = SI.search(q, exs); t2 = time.perf_counter()
+    print(json.dumps({"query": q, "build_ms": round((t1-t0)*1e3, 1), "query_ms": round((t2-t1)*1e3, 3), "results": res}))
@@ -0,0 +1,271 @@
+"""
+Tick journal: every feed tick appended to a compact fixed-width binary
+segment, one per IST day, and replayed later through the same subscriber
+interface as the live feed (core.market_data) -- to reproduce an intraday
+incident tick for tick.
+
+  data/ticks/2026-07-01.tj     32-byte header (magic "AOTJ", version, record size, created),
+                               then 120-byte little-endian records:
+                               recv, ts, ltp, bid, ask, open, high, low, close f64 |
+                               volume, oi, seq i64 | exchange type, mode u8 | token 16s
+  data/ticks/2026-07-01.tjx    sparse time index: (recv, record number) every INDEX_EVERY records
+
+Records are in arrival order and keyed by the local receive time, which is
+what the index seeks on and what replay paces by. The live path only appends
+the Tick to a deque (on_tick); a background thread packs and writes it every
+FLUSH_S seconds. A torn last record (crash mid-write) is cut off on the next
+open.
+
+  rec = Recorder().start(); market_data().subscribe(rec.on_tick)   # core.quote_table --publish does this
+  Replayer("2026-07-01", speed=10, start="10:00", end="11:00").run(into=md)   # md.push -> md's subscribers
+  PaperBroker().feed(Segment("2026-07-01").prices())                           # (exch, token, ltp, ts)
+
+  python -m core.tick_journal --replay 2026-07-01 --speed max [--from 10:00 --to 11:00] [--tokens NFO:43854]
+  python -m core.tick_journal --info 2026-07-01
+  python -m core.tick_journal --bench
+"""
+from __future__ import annotations
+import argparse, bisect, json, mmap, os, struct, sys, threading, time
+from collections import deque
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from core.candle_store import IST, epoch
+from core.market_data import EXCH_NAME, EXCH_TYPE, MarketData, Tick
+
+ROOT  = Path(__file__).resolve().parents[1]
+DIR   = Path(os.getenv("AO_TICKS") or ROOT / "data" / "ticks")
+FLUSH_S = float(os.getenv("AO_TICKS_FLUSH", "0.25"))
+INDEX_EVERY = 4096
+MAGIC, VERSION = b"AOTJ", 1
+HDR  = struct.Struct("<4sHHd")                  # magic, version, record size, created
+HDR_SIZE = 32
+REC  = struct.Struct("<9d3qBB6x16s")            # 120 bytes, see above
+IDX  = struct.Struct("<dQ")
+
+def _day(d) -> date:
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+def _when(day: date, x) -> Optional[float]:
+    """Epoch seconds from an epoch, a time of day on `day` ("10:00", "10:00:30") or a date-time."""
+    if x is None or isinstance(x, (int, float)): return x
+    s = str(x)
+    return float(epoch(f"{day} {s}" if len(s) <= 8 else s))
+
+def _pack(t: Tick) -> bytes:
+    return REC.pack(t.recv, t.ts, t.ltp, t.bid, t.ask, t.open, t.high, t.low, t.close, t.volume, t.oi, t.seq,
+                    EXCH_TYPE.get(t.exchange, 0), t.mode, t.token.encode()[:16])
+
+def _tick(r: tuple) -> Tick:
+    return Tick(EXCH_NAME.get(r[12], str(r[12])), r[14].rstrip(b"\0").decode(), r[2], r[1], r[13], r[11], r[9], r[10],
+                r[3], r[4], r[5], r[6], r[7], r[8], r[0])
+
+class Recorder:
+    def __init__(self, root: Path = DIR, flush_every: float = FLUSH_S):
+        self.root, self.flush_every = root, flush_every
+        self.q: Deque[Tick] = deque()
+        self.day: Optional[date] = None
+        self.f = self.fx = None
+        self.n = 0                                   # records in the open segment
+        self.stop_ev = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {"ticks": 0, "bytes": 0, "flushes": 0, "segments": 0, "write_errors": 0, "last_error": ""}
+
+    def on_tick(self, t: Tick):
+        """core.market_data subscriber: the whole cost on the feed thread."""
+        self.q.append(t)
+
+    def _open(self, day: date):
+        if self.f is not None: self.f.close(); self.fx.close()
+        self.root.mkdir(parents=True, exist_ok=True)
+        p = self.root / f"{day.isoformat()}.tj"
+        self.f = open(p, "ab")
+        size = self.f.tell()
+        if size < HDR_SIZE:
+            self.f.truncate(0); self.f.write(HDR.pack(MAGIC, VERSION, REC.size, time.time()).ljust(HDR_SIZE, b"\0"))
+            size = HDR_SIZE
+        self.n = (size - HDR_SIZE) // REC.size
+        if HDR_SIZE + self.n * REC.size != size: self.f.truncate(HDR_SIZE + self.n * REC.size)   # torn tail
+        self.fx = open(p.with_suffix(".tjx"), "ab")
+        self.day = day; self.stats["segments"] += 1
+
+    def flush(self):
+        buf, idx = bytearray(), bytearray()
+        while self.q:
+            t = self.q.popleft()
+            day = datetime.fromtimestamp(t.recv, IST).date()
+            if day != self.day:
+                if buf: self._write(buf, idx); buf, idx = bytearray(), bytearray()
+                self._open(day)
+            if self.n % INDEX_EVERY == 0: idx += IDX.pack(t.recv, self.n)
+            buf += _pack(t); self.n += 1; self.stats["ticks"] += 1
+        if buf: self._write(buf, idx)
+
+    def _write(self, buf: bytearray, idx: bytearray):
+        try:
+            self.f.write(buf); self.f.flush()
+            if idx: self.fx.write(idx); self.fx.flush()
+            self.stats["bytes"] += len(buf); self.stats["flushes"] += 1
+        except OSError as e:
+            self.stats["write_errors"] += 1; self.stats["last_error"] = str(e)
+
+    def _run(self):
+        while not self.stop_ev.wait(self.flush_every): self.flush()
+
+    def start(self) -> "Recorder":
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_ev.clear()
+            self.thread = threading.Thread(target=self._run, name="ao-tick-journal", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_ev.set()
+        if self.thread is not None: self.thread.join()
+        self.flush()
+        if self.f is not None: self.f.close(); self.fx.close(); self.f = self.fx = None; self.day = None
+
+class Segment:
+    """One day's journal, mapped read-only."""
+    def __init__(self, day, root: Path = DIR):
+        self.day = _day(day)
+        p = root / f"{self.day.isoformat()}.tj"
+        with open(p, "rb") as f: self.m = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+        magic, ver, size, self.created = HDR.unpack_from(self.m, 0)
+        if magic != MAGIC or ver != VERSION or size != REC.size: raise ValueError(f"{p}: not a v{VERSION} tick journal")
+        self.n = (len(self.m) - HDR_SIZE) // REC.size
+        xp = p.with_suffix(".tjx")
+        ix = list(IDX.iter_unpack(xp.read_bytes()[:os.path.getsize(xp) // IDX.size * IDX.size])) if xp.exists() else []
+        self.index = [(t, i) for t, i in ix if i < self.n]
+        self.keys = [t for t, _ in self.index]
+
+    def seek(self, t: Optional[float]) -> int:
+        """Number of the first record received at or after t: the index, then a binary search in its block."""
+        if t is None: return 0
+        j = bisect.bisect_right(self.keys, t) - 1
+        lo = self.index[j][1] if j >= 0 else 0
+        hi = self.index[j + 1][1] if j + 1 < len(self.index) else self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if REC.unpack_from(self.m, HDR_SIZE + mid * REC.size)[0] < t: lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def records(self, start=None, end=None, tokens: Optional[Set[Tuple[str, str]]] = None) -> Iterator[tuple]:
+        lo, hi = _when(self.day, start), _when(self.day, end)
+        i = self.seek(lo)
+        keys = {(EXCH_TYPE[e.upper()], str(k).encode()[:16].ljust(16, b"\0")) for e, k in tokens} if tokens else None
+        for r in REC.iter_unpack(memoryview(self.m)[HDR_SIZE + i * REC.size: HDR_SIZE + self.n * REC.size]):
+            if hi is not None and r[0] > hi: break
+            if keys is None or (r[12], r[14]) in keys: yield r
+
+    def ticks(self, start=None, end=None, tokens=None) -> Iterator[Tick]:
+        return map(_tick, self.records(start, end, tokens))
+
+    def prices(self, start=None, end=None, tokens=None) -> Iterator[Tuple[str, str, float, float]]:
+        """(exch, token, ltp, ts) for PaperBroker.feed()."""
+        for r in self.records(start, end, tokens):
+            yield EXCH_NAME.get(r[12], str(r[12])), r[14].rstrip(b"\0").decode(), r[2], r[1]
+
+    def info(self) -> Dict[str, Any]:
+        toks: Set[Tuple[int, bytes]] = set()
+        for r in REC.iter_unpack(memoryview(self.m)[HDR_SIZE: HDR_SIZE + self.n * REC.size]): toks.add((r[12], r[14]))
+        first = REC.unpack_from(self.m, HDR_SIZE)[0] if self.n else None
+        last = REC.unpack_from(self.m, HDR_SIZE + (self.n - 1) * REC.size)[0] if self.n else None
+        return {"day": self.day.isoformat(), "ticks": self.n, "tokens": len(toks), "index_entries": len(self.index),
+                "first": first and datetime.fromtimestamp(first, IST).isoformat(),
+                "last": last and datetime.fromtimestamp(last, IST).isoformat()}
+
+class Replayer:
+    """Push a recorded day to subscribers at `speed` x real time (0 = as fast as possible)."""
+    def __init__(self, day, root: Path = DIR, speed: float = 1.0, start=None, end=None,
+                 tokens: Optional[Set[Tuple[str, str]]] = None, restamp: bool = False):
+        self.seg, self.speed, self.start, self.end, self.tokens = Segment(day, root), speed, start, end, tokens
+        self.restamp = restamp                       # recv := replay time, for consumers with max_age checks
+        self.subscribers: List[Callable[[Tick], None]] = []
+        self.stop_ev = threading.Event()
+        self.stats = {"ticks": 0, "subscriber_errors": 0, "secs": 0.0, "recorded_secs": 0.0, "ticks_per_s": 0.0}
+
+    def subscribe(self, fn: Callable[[Tick], None]) -> Callable[[Tick], None]:
+        self.subscribers.append(fn)
+        return fn
+
+    def unsubscribe(self, fn: Callable[[Tick], None]):
+        if fn in self.subscribers: self.subscribers.remove(fn)
+
+    def run(self, into: Optional[MarketData] = None) -> Dict[str, Any]:
+        """Replay to the subscribers and, with `into`, through MarketData.push (its cache and subscribers)."""
+        fns = ([into.push] if into is not None else []) + self.subscribers
+        base = first = None
+        t0 = time.perf_counter()
+        for t in self.seg.ticks(self.start, self.end, self.tokens):
+            if self.stop_ev.is_set(): break
+            if base is None: base = first = t.recv
+            if self.speed:
+                lag = (t.recv - base) / self.speed - (time.perf_counter() - t0)
+                if lag > 0.001: time.sleep(lag)
+            last = t.recv
+            if self.restamp: t.recv = time.time()
+            for fn in fns:
+                try: fn(t)
+                except Exception: self.stats["subscriber_errors"] += 1
+            self.stats["ticks"] += 1
+        secs = time.perf_counter() - t0
+        self.stats.update(secs=round(secs, 3), recorded_secs=round(last - first, 3) if base is not None else 0.0,
+                          ticks_per_s=round(self.stats["ticks"] / secs, 1) if secs else 0.0)
+        return self.stats
+
+    def stop(self):
+        self.stop_ev.set()
+
+def bench(n: int = 300000, tokens: int = 200) -> Dict[str, float]:
+    """Live-path cost of on_tick, recorder write rate and max-speed replay rate."""
+    import tempfile
+    root = Path(tempfile.mkdtemp(prefix="ao_ticks_"))
+    now = time.time()
+    ticks = [Tick("NFO", str(40000 + i % tokens), 100.0 + i % 97 * 0.05, now + i * 1e-4, 3, i, i * 10, 5000,
+                  99.95, 100.05, recv=now + i * 1e-4) for i in range(n)]
+    rec = Recorder(root)
+    t0 = time.perf_counter()
+    for t in ticks: rec.on_tick(t)
+    on_tick_ns = (time.perf_counter() - t0) / n * 1e9
+    t0 = time.perf_counter(); rec.flush(); write_s = time.perf_counter() - t0
+    rec.stop()
+    day = datetime.fromtimestamp(now, IST).date()
+    seen = []
+    rp = Replayer(day, root, speed=0); rp.subscribe(seen.append)
+    st = rp.run()
+    assert len(seen) == n and seen[-1] == ticks[-1], "replay differs from what was recorded"
+    seg = Segment(day, root)
+    t0 = time.perf_counter(); i = seg.seek(now + n * 5e-5); seek_us = (time.perf_counter() - t0) * 1e6
+    for f in root.iterdir(): f.unlink()
+    root.rmdir()
+    return {"on_tick_ns": round(on_tick_ns, 1), "write_ticks_per_s": round(n / write_s), "bytes_per_tick": REC.size,
+            "replay_ticks_per_s": st["ticks_per_s"], "seek_us": round(seek_us, 1), "seek_record": i}
+
+def _keys(spec: str) -> Set[Tuple[str, str]]:
+    return {tuple(k.split(":", 1)) for k in (s.strip() for s in spec.split(",")) if ":" in k}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Binary tick journal: replay / info / bench")
+    ap.add_argument("--replay", metavar="YYYY-MM-DD")
+    ap.add_argument("--info", metavar="YYYY-MM-DD")
+    ap.add_argument("--speed", default="1", help="1, 10, ... or max")
+    ap.add_argument("--from", dest="start", help="HH:MM[:SS] IST")
+    ap.add_argument("--to", dest="end")
+    ap.add_argument("--tokens", default="", help="EXCH:TOKEN,... (default: all)")
+    ap.add_argument("--print", action="store_true", help="print every replayed tick as a JSON line")
+    ap.add_argument("--bench", action="store_true")
+    a = ap.parse_args()
+    if a.bench: print(json.dumps(bench()))
+    elif a.info: print(json.dumps(Segment(a.info).info()))
+    elif a.replay:
+        from dataclasses import asdict
+        rp = Replayer(a.replay, speed=0 if a.speed == "max" else float(a.speed), start=a.start, end=a.end,
+                      tokens=_keys(a.tokens) or None)
+        if a.print: rp.subscribe(lambda t: print(json.dumps(asdict(t)), flush=True))
+        try: print(json.dumps({"event": "replay_done", **rp.run()}), file=sys.stderr)
+        except KeyboardInterrupt: pass
+    else:
+        ap.print_help()
@@ -1,11 +1,37 @@
 from __future__ import annotations
-import csv, re
-from dataclasses import dataclass
+import bisect, csv, json, mmap, os, re, struct, sys, time, zlib
+from array import array
+from datetime import date
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Callable, Optional, Dict, List, Sequence, Tuple
 
 ROOT = Path(__file__).resolve().parents[1]
 CSV  = ROOT / "data" / "instruments.csv"
+SNAP = ROOT / "data" / "instruments.snap"
+HEAD = ["token","tradingsymbol","name","exch_seg","instrumenttype","expiry","strike","lotsize"]
+# Snapshot strikes keep the scrip master's units (paise: 24500 is stored as 2450000).
+# Lookups take rupees and convert once with `scale`; pass scale=1 for snapshot units.
+STRIKE_SCALE = 100.0
+
+# Snapshot layout: header, section directory, then 8-byte aligned sections.
+# Columns are row-ordered arrays; strings (name/exch/inst/expiry) are interned
+# into one table, tradingsymbols live in their own blob. ix_ts / ix_key are
+# open-addressing tables of row+1 (0 = empty) probed with crc32.
+# Strike ladders: lad_row/lad_strike hold option rows grouped by
+# (name, expiry, opt, exch) and sorted by strike; group g spans
+# lad_lo[g]:lad_lo[g+1] and ix_lad maps the group key to g+1.
+# Expiry calendar: per underlying (cal_nm, ix_cal on the name) the listed
+# expiry days as date ordinals, all in cal_day[cal_lo[u]:cal_lo[u+1]] and
+# the monthly ones (last listed expiry of each month) in mon_day/mon_lo.
+MAGIC   = b"AOTMSNAP"
+VERSION = 3
+_HDR = struct.Struct("<8sIIqI")   # magic, version, nrows, src mtime_ns, nsections
+_SEC = struct.Struct("<8sQQ")     # name, offset, length
+
+MON = {"JAN":"01","FEB":"02","MAR":"03","APR":"04","MAY":"05","JUN":"06","JUL":"07","AUG":"08","SEP":"09","OCT":"10","NOV":"11","DEC":"12"}
+OPTS = ("", "CE", "PE")
+_exp_cache: Dict[str, str] = {}
 
 @dataclass
 class Contract:
@@ -18,75 +44,514 @@ class Contract:
     strike: float|None
     lotsize: int|None
 
+def norm_exp(exp: str) -> str:
+    if not exp: return ""
+    hit = _exp_cache.get(exp)
+    if hit is not None: return hit
+    s = exp.upper().replace("/", "-").strip()
+    out = s
+    if re.match(r"^(\d{4})-(\d{2})-(\d{2})$", s): out = s
+    elif (m := re.match(r"^(\d{2})-(\d{2})-(\d{4})$", s)):
+        out = f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+    elif (m := re.match(r"^(\d{2})([A-Z]{3})(\d{2,4})$", s)):
+        dd, mon, yy = m.groups()
+        yyyy = f"20{yy}" if len(yy)==2 else yy
+        out = f"{yyyy}-{MON[mon]}-{dd}"
+    _exp_cache[exp] = out
+    return out
+
+def opt_of(inst: str, ts: str) -> str:
+    if inst in ("CE","PE","CALL","PUT"):
+        return "CE" if inst in ("CE","CALL") else "PE"
+    if inst in ("OPTIDX","OPTSTK"):
+        if ts.endswith("CE"): return "CE"
+        if ts.endswith("PE"): return "PE"
+    return ""
+
+def parse_row(row: Dict[str, str]) -> Optional[Contract]:
+    """One instruments.csv row -> Contract (upper-cased, expiry normalized); None if unusable."""
+    try: token = int(row["token"])
+    except: return None
+    return Contract(
+        token,
+        (row["tradingsymbol"] or "").upper().strip(),
+        (row["name"] or "").upper().strip(),
+        (row["exch_seg"] or "NFO").upper().strip(),
+        (row["instrumenttype"] or "").upper().strip(),
+        norm_exp(row.get("expiry","")),
+        float(row.get("strike") or 0) if row.get("strike") else None,
+        int(float(row.get("lotsize") or 0)) if row.get("lotsize") else None,
+    )
+
+def _day(exp: str) -> int:
+    try: return date.fromisoformat(exp).toordinal()
+    except ValueError: return 0
+
+def monthly_of(days: Sequence[int]) -> List[int]:
+    """Last listed expiry of each calendar month (days ascending)."""
+    out = []
+    for j, d in enumerate(days):
+        dd = date.fromordinal(d)
+        if j + 1 == len(days) or (nx := date.fromordinal(days[j+1])).month != dd.month or nx.year != dd.year:
+            out.append(d)
+    return out
+
+@dataclass
+class Universe:
+    """
+    Instrument subset for low-memory processes, e.g. TM_UNIVERSE="NIFTY,BANKNIFTY@2":
+    derivatives of those underlyings for their next 2 listed expiries plus
+    their spot rows (index/equity). Groups are ';'-separated, "@n" defaults to 2.
+    """
+    names: Dict[str, int]
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Universe"]:
+        names: Dict[str, int] = {}
+        for grp in filter(None, (g.strip() for g in spec.split(";"))):
+            nms, _, n = grp.partition("@")
+            for nm in filter(None, (x.strip().upper() for x in nms.split(","))):
+                names[nm] = int(n or 2)
+        return cls(names) if names else None
+
+    @classmethod
+    def from_env(cls) -> Optional["Universe"]:
+        return cls.parse(os.getenv("TM_UNIVERSE", ""))
+
+    @property
+    def tag(self) -> str:
+        return f"u{zlib.crc32(';'.join(f'{k}@{v}' for k, v in sorted(self.names.items())).encode()):08x}"
+
+    def snap_path(self, csv_path: Path) -> Path:
+        return csv_path.with_suffix(f".{self.tag}.snap")
+
+    def keep(self, src: Path) -> Callable[[Contract], bool]:
+        """Row predicate for compile_snapshot; one streaming pass picks each name's next n expiries."""
+        today, cal = _day(time.strftime("%Y-%m-%d")), {}
+        with src.open() as f:
+            for row in csv.DictReader(f):
+                nm = (row["name"] or "").upper().strip()
+                if nm in self.names and (d := _day(norm_exp(row.get("expiry", "")))) >= today:
+                    cal.setdefault(nm, set()).add(d)
+        cut = {nm: set(sorted(ds)[:self.names[nm]]) for nm, ds in cal.items()}
+        return lambda c: c.name in self.names and (not c.expiry or _day(c.expiry) in cut.get(c.name, ()))
+
+def _key(name: str, exp: str, strike: float, opt: str, exch: str) -> bytes:
+    return f"{name}|{exp}|{float(strike):.2f}|{opt}|{exch}".encode()
+
+def _gkey(name: str, exp: str, opt: str, exch: str) -> bytes:
+    return f"{name}|{exp}|{opt}|{exch}".encode()
+
+def _table(keys: Dict[bytes, int]) -> array:
+    size = 1 << max(4, (2*len(keys)).bit_length())
+    mask = size - 1
+    t = array("I", bytes(4*size))
+    for k, i in keys.items():
+        h = zlib.crc32(k) & mask
+        while t[h]: h = (h+1) & mask
+        t[h] = i + 1
+    return t
+
+def compile_snapshot(src: Path = CSV, dst: Path = SNAP, keep: Optional[Callable[[Contract], bool]] = None) -> Path:
+    """
+    Parse the instruments CSV once and write the mmap-able snapshot next to it.
+    With keep, only matching rows are stored; the expiry calendar still
+    covers every row.
+    """
+    src_mtime = src.stat().st_mtime_ns
+    strs: Dict[str, int] = {"": 0}
+    def intern(s: str) -> int:
+        i = strs.get(s)
+        if i is None: i = strs[s] = len(strs)
+        return i
+    tok, strike, lot = array("q"), array("d"), array("i")
+    name, exch, inst, expc, opt = array("I"), array("I"), array("I"), array("I"), array("B")
+    tsblob, tsoff = bytearray(), array("I", [0])
+    by_ts: Dict[bytes, int] = {}; by_key: Dict[bytes, int] = {}
+    groups: Dict[Tuple[str, str, str, str], List[Tuple[float, int]]] = {}
+    cal: Dict[str, set] = {}
+    with src.open() as f:
+        for row in csv.DictReader(f):
+            c = parse_row(row)
+            if c is None: continue
+            ts, nm, ex, it, e, s = c.tradingsymbol, c.name, c.exch_seg, c.instrumenttype, c.expiry, c.strike
+            if nm and e and (d := _day(e)): cal.setdefault(nm, set()).add(d)
+            if keep and not keep(c): continue
+            o  = opt_of(it, ts)
+            i  = len(tok)
+            tb = ts.encode()
+            tok.append(c.token); strike.append(float("nan") if s is None else s); lot.append(-1 if c.lotsize is None else c.lotsize)
+            name.append(intern(nm)); exch.append(intern(ex)); inst.append(intern(it)); expc.append(intern(e))
+            opt.append(OPTS.index(o))
+            tsblob += tb; tsoff.append(len(tsblob))
+            by_ts[tb] = i
+            if nm and e and s is not None and o:
+                by_key[_key(nm, e, s, o, ex)] = i
+                groups.setdefault((nm, o, ex, e), []).append((s, i))
+    lad_row, lad_strike, lad_lo = array("I"), array("d"), array("I", [0])
+    by_grp: Dict[bytes, int] = {}
+    for g, (nm, o, ex, e) in enumerate(sorted(groups)):
+        for s, i in sorted(groups[(nm, o, ex, e)]):
+            lad_row.append(i); lad_strike.append(s)
+        lad_lo.append(len(lad_row))
+        by_grp[_gkey(nm, e, o, ex)] = g
+    cal_nm, cal_day, cal_lo, mon_day, mon_lo = array("I"), array("i"), array("I", [0]), array("i"), array("I", [0])
+    by_cal: Dict[bytes, int] = {}
+    for u, (nm, days) in enumerate(sorted(cal.items())):
+        days = sorted(days)
+        cal_nm.append(intern(nm)); cal_day.extend(days); cal_lo.append(len(cal_day))
+        mon_day.extend(monthly_of(days)); mon_lo.append(len(mon_day))
+        by_cal[nm.encode()] = u
+    strblob, stroff = bytearray(), array("I", [0])
+    for s in strs:   # dicts keep insertion order == intern index
+        strblob += s.encode(); stroff.append(len(strblob))
+    secs = [
+        (b"tok", tok), (b"strike", strike), (b"lot", lot), (b"name", name), (b"exch", exch),
+        (b"inst", inst), (b"exp", expc), (b"opt", opt), (b"tsoff", tsoff), (b"tsblob", tsblob),
+        (b"stroff", stroff), (b"strblob", strblob), (b"ix_ts", _table(by_ts)), (b"ix_key", _table(by_key)),
+        (b"lad_row", lad_row), (b"lad_stk", lad_strike), (b"lad_lo", lad_lo), (b"ix_lad", _table(by_grp)),
+        (b"cal_nm", cal_nm), (b"cal_day", cal_day), (b"cal_lo", cal_lo), (b"mon_day", mon_day),
+        (b"mon_lo", mon_lo), (b"ix_cal", _table(by_cal)),
+    ]
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        off = _HDR.size + _SEC.size*len(secs)
+        dirent = []
+        for nm, data in secs:
+            off = (off + 7) & ~7
+            n = len(data) * (data.itemsize if isinstance(data, array) else 1)
+            dirent.append((nm, off, n)); off += n
+        f.write(_HDR.pack(MAGIC, VERSION, len(tok), src_mtime, len(secs)))
+        for d in dirent: f.write(_SEC.pack(*d))
+        for (nm, data), (_, off, n) in zip(secs, dirent):
+            f.write(b"\0" * (off - f.tell()))
+            f.write(data.tobytes() if isinstance(data, array) else bytes(data))
+    tmp.replace(dst)
+    return dst
+
+class Snapshot:
+    """Read-only view over a compiled snapshot; pages are shared between processes."""
+    def __init__(self, path: Path = SNAP):
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ver, n, self.src_mtime_ns, nsec = _HDR.unpack_from(self._mm, 0)
+        if magic != MAGIC or ver != VERSION:
+            raise ValueError(f"{path}: unsupported snapshot (magic={magic!r} version={ver})")
+        self.path, self.n = path, n
+        mv = memoryview(self._mm)
+        sec = {}
+        for j in range(nsec):
+            nm, off, ln = _SEC.unpack_from(self._mm, _HDR.size + j*_SEC.size)
+            sec[nm.rstrip(b"\0").decode()] = mv[off:off+ln]
+        self.tok, self.strike, self.lot = sec["tok"].cast("q"), sec["strike"].cast("d"), sec["lot"].cast("i")
+        self.name, self.exch, self.inst = sec["name"].cast("I"), sec["exch"].cast("I"), sec["inst"].cast("I")
+        self.exp, self.opt = sec["exp"].cast("I"), sec["opt"].cast("B")
+        self.tsoff, self.tsblob = sec["tsoff"].cast("I"), sec["tsblob"]
+        self.stroff, self.strblob = sec["stroff"].cast("I"), sec["strblob"]
+        self.ix_ts, self.ix_key = sec["ix_ts"].cast("I"), sec["ix_key"].cast("I")
+        self.lad_row, self.lad_strike = sec["lad_row"].cast("I"), sec["lad_stk"].cast("d")
+        self.lad_lo, self.ix_lad = sec["lad_lo"].cast("I"), sec["ix_lad"].cast("I")
+        self.cal_nm, self.cal_day, self.cal_lo = sec["cal_nm"].cast("I"), sec["cal_day"].cast("i"), sec["cal_lo"].cast("I")
+        self.mon_day, self.mon_lo, self.ix_cal = sec["mon_day"].cast("i"), sec["mon_lo"].cast("I"), sec["ix_cal"].cast("I")
+        self._strs: list = [None] * (len(self.stroff) - 1)
+
+    def s(self, i: int) -> str:
+        v = self._strs[i]
+        if v is None:
+            v = self._strs[i] = bytes(self.strblob[self.stroff[i]:self.stroff[i+1]]).decode()
+        return v
+
+    def ts_bytes(self, i: int) -> bytes:
+        return bytes(self.tsblob[self.tsoff[i]:self.tsoff[i+1]])
+
+    def contract(self, i: int) -> Contract:
+        s, lt = self.strike[i], self.lot[i]
+        return Contract(self.tok[i], self.ts_bytes(i).decode(), self.s(self.name[i]), self.s(self.exch[i]),
+                        self.s(self.inst[i]), self.s(self.exp[i]), None if s != s else s, None if lt < 0 else lt)
+
+    def row_key(self, i: int) -> bytes:
+        return _key(self.s(self.name[i]), self.s(self.exp[i]), self.strike[i], OPTS[self.opt[i]], self.s(self.exch[i]))
+
+    def find_ts(self, ts: str) -> int:
+        k = ts.encode(); t = self.ix_ts; mask = len(t) - 1
+        h = zlib.crc32(k) & mask
+        while t[h]:
+            if self.ts_bytes(t[h]-1) == k: return t[h] - 1
+            h = (h+1) & mask
+        return -1
+
+    def find_key(self, name: str, exp: str, strike: float, opt: str, exch: str) -> int:
+        k = _key(name, exp, strike, opt, exch); t = self.ix_key; mask = len(t) - 1
+        h = zlib.crc32(k) & mask
+        while t[h]:
+            if self.row_key(t[h]-1) == k: return t[h] - 1
+            h = (h+1) & mask
+        return -1
+
+    def find_ladder(self, name: str, exp: str, opt: str, exch: str) -> Tuple[int, int]:
+        """[lo, hi) slice of lad_row/lad_strike for one strike ladder; (0, 0) if absent."""
+        k = _gkey(name, exp, opt, exch); t = self.ix_lad; mask = len(t) - 1
+        h = zlib.crc32(k) & mask
+        while t[h]:
+            g = t[h] - 1; lo = self.lad_lo[g]
+            i = self.lad_row[lo]
+            if _gkey(self.s(self.name[i]), self.s(self.exp[i]), OPTS[self.opt[i]], self.s(self.exch[i])) == k:
+                return lo, self.lad_lo[g+1]
+            h = (h+1) & mask
+        return 0, 0
+
+    def find_calendar(self, name: str) -> Tuple[Sequence[int], Sequence[int]]:
+        """(all listed expiry ordinals, monthly ones) for an underlying; empty if unlisted."""
+        k = name.encode(); t = self.ix_cal; mask = len(t) - 1
+        h = zlib.crc32(k) & mask
+        while t[h]:
+            u = t[h] - 1
+            if self.s(self.cal_nm[u]) == name:
+                return (self.cal_day[self.cal_lo[u]:self.cal_lo[u+1]], self.mon_day[self.mon_lo[u]:self.mon_lo[u+1]])
+            h = (h+1) & mask
+        return (), ()
+
 class TokenMap:
-    def __init__(self):
-        self.by_ts: Dict[str, Contract] = {}
-        self.by_key: Dict[Tuple[str,str,float,str,str], Contract] = {}
+    """
+    Lookups over the mapped snapshot. A refresh that ships a delta
+    (instruments.delta.json) is applied in place as an overlay, so a
+    long-running process keeps its mapping warm; contracts whose expiry
+    has passed are treated as absent. With a Universe only that subset is
+    mapped (its own snapshot, rebuilt daily as expiries roll); misses fall
+    through to a full TokenMap opened on first use.
+    """
+    def __init__(self, csv_path: Path = CSV, snap_path: Path | None = None, universe: Optional[Universe] = None):
+        self.csv = csv_path
+        self.universe = universe
+        self.full_path = snap_path or csv_path.with_suffix(".snap")
+        self.snap_path = universe.snap_path(csv_path) if universe else self.full_path
+        self.delta_path = csv_path.with_suffix(".delta.json")
+        self.snap: Optional[Snapshot] = None
         self.mtime = 0.0
+        self.src_mtime_ns = 0
+        self._built = ""
+        self._full: Optional[TokenMap] = None
+        self._reset_overlay()
+
+    def _reset_overlay(self):
+        self._added: Dict[str, Contract] = {}
+        self._added_key: Dict[bytes, str] = {}          # contract key -> tradingsymbol in _added
+        self._removed: set = set()
+        self._lot: Dict[str, int] = {}
+        self._merged: Dict[Tuple[str, str, str, str], Tuple[List[float], List[Contract]]] = {}
 
     def _norm_exp(self, exp: str) -> str:
-        if not exp: return ""
-        s = exp.upper().replace("/", "-").strip()
-        m = re.match(r"^(\d{4})-(\d{2})-(\d{2})$", s)
-        if m: return s
-        m = re.match(r"^(\d{2})-(\d{2})-(\d{4})$", s)
-        if m: return f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
-        m = re.match(r"^(\d{2})([A-Z]{3})(\d{2,4})$", s)
-        if m:
-            dd, mon, yy = m.groups()
-            MON={"JAN":"01","FEB":"02","MAR":"03","APR":"04","MAY":"05","JUN":"06","JUL":"07","AUG":"08","SEP":"09","OCT":"10","NOV":"11","DEC":"12"}
-            yyyy = f"20{yy}" if len(yy)==2 else yy
-            return f"{yyyy}-{MON[mon]}-{dd}"
-        return s
+        return norm_exp(exp)
+
+    def _open(self) -> Optional[Snapshot]:
+        try: return Snapshot(self.snap_path)
+        except (OSError, ValueError): return None
+
+    # a universe keeps "next n expiries", so its snapshot goes stale when the day rolls
+    def _stale(self, snap: Snapshot) -> bool:
+        return bool(self.universe) and time.strftime("%Y-%m-%d", time.localtime(snap.path.stat().st_mtime)) < self._today()
+
+    @property
+    def _rolled(self) -> bool:
+        return bool(self.universe) and self._built < self._today()
+
+    def full(self) -> TokenMap:
+        """The unfiltered map behind a universe (self when there is none)."""
+        if not self.universe: return self
+        if self._full is None: self._full = TokenMap(self.csv, self.full_path)
+        return self._full
 
     def ensure_loaded(self):
-        if not CSV.exists(): raise FileNotFoundError(f"{CSV} missing; run instruments_sync.py")
-        mt = CSV.stat().st_mtime
-        if mt == self.mtime and self.by_ts: return
-        self.by_ts.clear(); self.by_key.clear()
-        with CSV.open() as f:
-            r = csv.DictReader(f)
-            for row in r:
-                try: token = int(row["token"])
-                except: continue
-                ts   = (row["tradingsymbol"] or "").upper().strip()
-                name = (row["name"] or "").upper().strip()
-                exch = (row["exch_seg"] or "NFO").upper().strip()
-                inst = (row["instrumenttype"] or "").upper().strip()
-                exp  = self._norm_exp(row.get("expiry",""))
-                strike = float(row.get("strike") or 0) if row.get("strike") else None
-                lot    = int(float(row.get("lotsize") or 0)) if row.get("lotsize") else None
-                c = Contract(token, ts, name, exch, inst, exp, strike, lot)
-                self.by_ts[ts]=c
-                # CE/PE key
-                opt=None
-                if inst in ("CE","PE","CALL","PUT"):
-                    opt = "CE" if inst in ("CE","CALL") else "PE"
-                elif inst in ("OPTIDX","OPTSTK"):
-                    if ts.endswith("CE"): opt="CE"
-                    elif ts.endswith("PE"): opt="PE"
-                if name and exp and strike is not None and opt in ("CE","PE"):
-                    self.by_key[(name, exp, float(strike), opt, exch)] = c
-        self.mtime = mt
+        if self.csv.exists():
+            mt = self.csv.stat().st_mtime_ns
+            if self.snap and not self._rolled:
+                if self.src_mtime_ns == mt or self._try_delta(mt): return
+            snap = self._open()
+            if snap is None or snap.src_mtime_ns != mt or self._stale(snap):
+                compile_snapshot(self.csv, self.snap_path, self.universe.keep(self.csv) if self.universe else None)
+                snap = Snapshot(self.snap_path)
+        elif self.snap: return
+        else:
+            snap = self._open()
+            if snap is None: raise FileNotFoundError(f"{self.csv} missing; run instruments_sync.py")
+        self.snap = snap
+        if self.universe: self._built = time.strftime("%Y-%m-%d", time.localtime(snap.path.stat().st_mtime))
+        self._reset_overlay()
+        self.src_mtime_ns = snap.src_mtime_ns
+        self.mtime = snap.src_mtime_ns / 1e9
+
+    # --- in-place refresh ---
+    def _try_delta(self, mt: int) -> bool:
+        try: d = json.loads(self.delta_path.read_text())
+        except (OSError, ValueError): return False
+        if d.get("base") != self.src_mtime_ns or d.get("target") != mt: return False
+        self.apply_delta(d)
+        return True
+
+    def apply_delta(self, d: Dict) -> None:
+        """Fold {added: [HEAD rows], removed: [ts], lot: {ts: lotsize}, target: mtime_ns} into the overlay."""
+        gone = set(d.get("removed", ()))
+        for ts in gone:
+            self._removed.add(ts); self._added.pop(ts, None); self._lot.pop(ts, None)
+        if gone: self._added_key = {k: ts for k, ts in self._added_key.items() if ts not in gone}
+        for r in d.get("added", ()):
+            c = parse_row(dict(zip(HEAD, r)))
+            if c is None or (self.universe and c.name not in self.universe.names): continue
+            self._added[c.tradingsymbol] = c; self._removed.discard(c.tradingsymbol)
+            o = opt_of(c.instrumenttype, c.tradingsymbol)
+            if c.name and c.expiry and c.strike is not None and o:
+                self._added_key[_key(c.name, c.expiry, c.strike, o, c.exch_seg)] = c.tradingsymbol
+        self._lot.update(d.get("lot", {}))
+        self._merged.clear()
+        if "target" in d:
+            self.src_mtime_ns = d["target"]; self.mtime = d["target"] / 1e9
+
+    @property
+    def _dirty(self) -> bool:
+        return bool(self._added or self._removed or self._lot)
+
+    def _today(self) -> str:
+        return time.strftime("%Y-%m-%d")
+
+    def _live(self, c: Optional[Contract]) -> Optional[Contract]:
+        if c is None or (c.expiry and c.expiry < self._today()): return None
+        return c
+
+    def _overlaid(self, ts: str) -> Optional[Contract]:
+        """A delta-added contract with the lot-size overlay applied; None once removed."""
+        c = self._added.get(ts)
+        if c is not None and ts in self._lot and c.lotsize != self._lot[ts]: c = replace(c, lotsize=self._lot[ts])
+        return c
+
+    def _row(self, i: int) -> Optional[Contract]:
+        c = self.snap.contract(i)
+        if self._dirty:
+            if c.tradingsymbol in self._removed or c.tradingsymbol in self._added: return None
+            if c.tradingsymbol in self._lot: c.lotsize = self._lot[c.tradingsymbol]
+        return c
 
     def get_by_ts(self, ts:str) -> Optional[Contract]:
-        self.ensure_loaded(); return self.by_ts.get(ts.upper())
+        self.ensure_loaded()
+        ts = ts.upper()
+        if ts in self._added: return self._live(self._overlaid(ts))
+        i = self.snap.find_ts(ts)
+        if i >= 0: return self._live(self._row(i))
+        return self.full().get_by_ts(ts) if self.universe else None
 
-    def get_token(self, name:str, expiry:str, strike:float, opt:str, exch:str="NFO") -> Optional[int]:
+    def get_contract(self, name:str, expiry:str, strike:float, opt:str, exch:str="NFO",
+                     scale:float=STRIKE_SCALE) -> Optional[Contract]:
         self.ensure_loaded()
         exp = self._norm_exp(expiry)
         nm, op, ex = name.upper(), opt.upper(), exch.upper()
-        # try as-is
-        k = (nm, exp, float(strike), op, ex)
-        c = self.by_key.get(k)
-        if c: return c.token
-        # try scaled (user passed 24500 but CSV had 2450000)
-        k2 = (nm, exp, float(strike)*100.0, op, ex)
-        c = self.by_key.get(k2)
-        if c: return c.token
+        if exp and exp < self._today(): return None
+        s = self._scaled(strike, scale)
+        ts = self._added_key.get(_key(nm, exp, s, op, ex))
+        if ts and (c := self._overlaid(ts)): return c
+        i = self.snap.find_key(nm, exp, s, op, ex)
+        if i >= 0 and (c := self._row(i)): return c
+        return self.full().get_contract(name, expiry, strike, opt, exch, scale) if self.universe else None
+
+    def get_token(self, name:str, expiry:str, strike:float, opt:str, exch:str="NFO", scale:float=STRIKE_SCALE) -> Optional[int]:
+        c = self.get_contract(name, expiry, strike, opt, exch, scale)
+        return c.token if c else None
+
+    # --- strike ladder queries (bisect over the snapshot's sorted strikes) ---
+    def _ladder(self, name:str, expiry:str, opt:str, exch:str) -> Tuple[Sequence[float], Callable[[int], Contract]]:
+        """(ascending strikes, index -> Contract) for one ladder, overlay merged in."""
+        self.ensure_loaded()
+        g = (name.upper(), self._norm_exp(expiry), opt.upper(), exch.upper())
+        if g[1] and g[1] < self._today(): return (), None
+        snap = self.snap
+        lo, hi = snap.find_ladder(*g)
+        if lo == hi and self.universe and not any(c.name == g[0] for c in self._added.values()):
+            return self.full()._ladder(name, expiry, opt, exch)
+        if not self._dirty:
+            return snap.lad_strike[lo:hi], lambda j: snap.contract(snap.lad_row[lo+j])
+        hit = self._merged.get(g)
+        if hit is None:
+            items = [(snap.lad_strike[k], c) for k in range(lo, hi) if (c := self._row(snap.lad_row[k]))]
+            items += [(c.strike, self._overlaid(c.tradingsymbol)) for c in self._added.values()
+                      if (c.name, c.expiry, opt_of(c.instrumenttype, c.tradingsymbol), c.exch_seg) == g]
+            items.sort(key=lambda x: x[0])
+            hit = self._merged[g] = ([x[0] for x in items], [x[1] for x in items])
+        return hit[0], hit[1].__getitem__
+
+    @staticmethod
+    def _scaled(strike:float, scale:float) -> float:
+        """Caller units -> snapshot units (see STRIKE_SCALE)."""
+        return float(strike) * scale
+
+    @staticmethod
+    def _nearest_idx(ls: Sequence[float], strike:float) -> int:
+        n = len(ls)
+        j = bisect.bisect_left(ls, strike)
+        if j == n or (j > 0 and strike - ls[j-1] <= ls[j] - strike): j -= 1
+        return j
+
+    def strikes(self, name:str, expiry:str, opt:str, exch:str="NFO") -> List[float]:
+        return list(self._ladder(name, expiry, opt, exch)[0])
+
+    def nearest(self, name:str, expiry:str, strike:float, opt:str, exch:str="NFO", scale:float=STRIKE_SCALE) -> Optional[Contract]:
+        ls, at = self._ladder(name, expiry, opt, exch)
+        if not len(ls): return None
+        return at(self._nearest_idx(ls, self._scaled(strike, scale)))
+
+    def atm_window(self, name:str, expiry:str, spot:float, opt:str, n:int=2, exch:str="NFO",
+                   scale:float=STRIKE_SCALE) -> List[Contract]:
+        """ATM strike plus n strikes either side, ascending."""
+        ls, at = self._ladder(name, expiry, opt, exch)
+        if not len(ls): return []
+        j = self._nearest_idx(ls, self._scaled(spot, scale))
+        return [at(k) for k in range(max(0, j-n), min(len(ls), j+n+1))]
+
+    # --- expiry calendar (listed contracts, not weekday guesses) ---
+    def calendar(self, name:str) -> Tuple[Sequence[int], Sequence[int]]:
+        self.ensure_loaded()
+        nm = name.upper()
+        days, mons = self.snap.find_calendar(nm)
+        extra = {d for c in self._added.values() if c.name == nm and c.expiry and (d := _day(c.expiry))} if self._added else set()
+        if extra - set(days):
+            days = sorted(set(days) | extra); mons = monthly_of(days)
+        return days, mons
+
+    def next_expiry(self, name:str, k:int=0, today:date|None=None, monthly:bool=False) -> Optional[date]:
+        """k-th listed (monthly) expiry on/after today; None if the calendar doesn't reach that far."""
+        days = self.calendar(name)[1 if monthly else 0]
+        j = bisect.bisect_left(days, (today or date.today()).toordinal()) + k
+        return date.fromordinal(days[j]) if 0 <= j < len(days) else None
+
+    def monthly_expiry_in(self, name:str, year:int, month:int) -> Optional[date]:
+        mons = self.calendar(name)[1]
+        j = bisect.bisect_left(mons, date(year, month, 1).toordinal())
+        if j < len(mons) and (d := date.fromordinal(mons[j])).year == year and d.month == month: return d
         return None
 
-TM = TokenMap()
+    def upcoming_expiries(self, name:str, n:int=5, start:date|None=None) -> List[date]:
+        days = self.calendar(name)[0]
+        j = bisect.bisect_left(days, (start or date.today()).toordinal())
+        return [date.fromordinal(d) for d in days[j:j+n]]
+
+    def strike_range(self, name:str, expiry:str, opt:str, low:float, high:float, exch:str="NFO",
+                     scale:float=STRIKE_SCALE) -> List[Contract]:
+        ls, at = self._ladder(name, expiry, opt, exch)
+        if not len(ls): return []
+        a = bisect.bisect_left(ls, self._scaled(low, scale))
+        b = bisect.bisect_right(ls, self._scaled(high, scale))
+        return [at(k) for k in range(a, b)]
+
+TM = TokenMap(universe=Universe.from_env())
 
 def get_by_tradingsymbol(ts:str) -> Optional[Contract]: return TM.get_by_ts(ts)
-def get_token(name:str, expiry:str, strike:float, opt:str, exch:str="NFO") -> Optional[int]: return TM.get_token(name,expiry,strike,opt,exch)
+def get_token(name:str, expiry:str, strike:float, opt:str, exch:str="NFO") -> Optional[int]:
+    # rupees, then snapshot units (paise) -- this entry point has always accepted both
+    t = TM.get_token(name,expiry,strike,opt,exch)
+    return t if t is not None else TM.get_token(name,expiry,strike,opt,exch,scale=1)
+def nearest_strike(name:str, expiry:str, strike:float, opt:str, exch:str="NFO") -> Optional[Contract]: return TM.nearest(name,expiry,strike,opt,exch)
+
+if __name__ == "__main__":
+    # python -m core.token_map [instruments.csv]  -> (re)build the snapshot (the TM_UNIVERSE one if set)
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else CSV
+    u = Universe.from_env()
+    t0 = time.perf_counter(); out = compile_snapshot(src, u.snap_path(src), u.keep(src)) if u else compile_snapshot(src, src.with_suffix(".snap"))
+    t1 = time.perf_counter(); snap = Snapshot(out); t2 = time.perf_counter()
+    print(f"[OK] {out} rows={snap.n} bytes={out.stat().st_size} build_ms={(t1-t0)*1e3:.0f} map_ms={(t2-t1)*1e3:.2f}")
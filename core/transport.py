@@ -0,0 +1,113 @@
+"""
+Pooled keep-alive HTTP transport for SmartConnect.
+
+SmartConnect._request goes through the module-level `requests.request`, i.e.
+a fresh TCP + TLS connection (and a DNS lookup) for every call. install()
+points SmartApi.smartConnect's `requests` at a Transport instead: one
+requests.Session with a kept-alive connection pool (TLS sessions live as long
+as the connections), a TTL'd DNS cache and (connect, read) timeouts. Every
+request's connect time (0 on a reused connection), TTFB and total are
+recorded; stats() summarises them per endpoint path.
+
+  from core.transport import install
+  install()                 # before/after creating SmartConnect, once per process
+"""
+from __future__ import annotations
+import os, socket, threading, time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+CONNECT_TIMEOUT = float(os.getenv("AO_HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT    = float(os.getenv("AO_HTTP_READ_TIMEOUT", "7"))
+DNS_TTL         = float(os.getenv("AO_DNS_TTL", "300"))
+
+_tl = threading.local()
+_dns: Dict[Tuple[str, int], Tuple[float, str]] = {}
+
+def resolve(host: str, port: int = 443) -> str:
+    """First address for host, cached for DNS_TTL seconds (IP literals pass through)."""
+    hit = _dns.get((host, port))
+    if hit and hit[0] > time.monotonic(): return hit[1]
+    ip = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+    _dns[(host, port)] = (time.monotonic() + DNS_TTL, ip)
+    return ip
+
+class _Timed:
+    # connect via the cached address; SNI / cert checks still use self.host
+    def connect(self):
+        t = time.perf_counter()
+        self._dns_host = resolve(self.host, self.port)
+        super().connect()
+        _tl.connect_ms = getattr(_tl, "connect_ms", 0.0) + (time.perf_counter() - t) * 1e3
+
+class _HTTPS(_Timed, HTTPSConnection): pass
+class _HTTP(_Timed, HTTPConnection): pass
+class _HTTPSPool(HTTPSConnectionPool): ConnectionCls = _HTTPS
+class _HTTPPool(HTTPConnectionPool): ConnectionCls = _HTTP
+
+class _Adapter(HTTPAdapter):
+    def init_poolmanager(self, *a, **kw):
+        super().init_poolmanager(*a, **kw)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+class Transport:
+    """Drop-in for the `requests` module as SmartConnect uses it (request() + passthrough)."""
+    def __init__(self, pool: int = 8, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 keep: int = 2000):
+        self.session = requests.Session()
+        ad = _Adapter(pool_connections=4, pool_maxsize=pool, max_retries=0)
+        self.session.mount("https://", ad); self.session.mount("http://", ad)
+        self.timeout = (connect_timeout, read_timeout)
+        self.timings: Deque[Tuple[str, float, float, float]] = deque(maxlen=keep)   # (path, connect, ttfb, total) ms
+
+    def request(self, method: str, url: str, **kw) -> requests.Response:
+        kw.setdefault("timeout", self.timeout)          # a caller's own timeout wins
+        _tl.connect_ms = 0.0
+        t = time.perf_counter()
+        r = self.session.request(method, url, **kw)
+        total = (time.perf_counter() - t) * 1e3
+        c = _tl.connect_ms
+        # r.elapsed runs from send to parsed headers and includes any connect
+        self.timings.append((urlsplit(url).path, round(c, 3), round(r.elapsed.total_seconds() * 1e3 - c, 3), round(total, 3)))
+        return r
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(requests, name)   # requests.packages, .adapters, .get, ...
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        by: Dict[str, list] = {}
+        for path, c, ttfb, total in self.timings: by.setdefault(path, []).append((c, ttfb, total))
+        out = {}
+        for path, xs in by.items():
+            pct = lambda i, p: round(sorted(x[i] for x in xs)[min(len(xs)-1, int(p*len(xs)))], 3)
+            new = [x[0] for x in xs if x[0] > 0]
+            out[path] = {"n": len(xs), "new_conns": len(new), "connect_ms_avg": round(sum(new) / len(new), 3) if new else 0.0,
+                         "ttfb_p50_ms": pct(1, .5), "ttfb_p95_ms": pct(1, .95), "total_p50_ms": pct(2, .5), "total_p95_ms": pct(2, .95)}
+        return out
+
+    def close(self):
+        self.session.close()
+
+_installed: Optional[Transport] = None
+
+def install(transport: Optional[Transport] = None) -> Transport:
+    """Route every SmartConnect in this process through one pooled Transport (idempotent)."""
+    global _installed
+    if transport is None and _installed is not None: return _installed
+    _installed = transport or Transport()
+    try:
+        import SmartApi.smartConnect as m
+    except ModuleNotFoundError:
+        import smartapi.smartConnect as m
+    m.requests = _installed
+    m.SmartConnect._default_timeout = _installed.timeout   # SmartConnect(timeout=...) still overrides it
+    return _installed
+
+def installed() -> Optional[Transport]:
+    return _installed
@@ -1,50 +1,43 @@
 from __future__ import annotations
-import os, time, random
+import os
+from typing import Optional
 import pyotp
 from SmartApi.smartConnect import SmartConnect
-from SmartApi.smartExceptions import DataException
-
-# Retry-worthy messages (Angel One style)
-RL = (
-    "Access denied because of exceeding access rate",
-    "Too many requests",
-    "Request rate limit exceeded",
-)
-
-def _rl(msg: str) -> bool:
-    m = (msg or "").lower()
-    return (
-        any(e.lower() in m for e in RL)
-        or "couldn't parse the json" in m  # empty/garbled body from server
-    )
+from core.positions import invalidate
+from core.ratelimit import HIGH, limited
+from core.retry import call
+from core.transport import install
 
 def login() -> SmartConnect:
     api = os.environ["SMARTAPI_API_KEY"]
     cid = os.environ["SMARTAPI_CLIENT_CODE"]
     pwd = os.environ["SMARTAPI_PASSWORD"]
     totp = pyotp.TOTP(os.environ["TOTP_SECRET"]).now()
+    install()
     sc = SmartConnect(api)
     sc.generateSession(cid, pwd, totp)
-    return sc
+    return limited(sc)
+
+def with_retry(fn, ep: str = "", tries: int = 6, base: float = 0.6, cap: float = 5.0, idempotent: Optional[bool] = None):
+    """fn() under core.retry's policy for endpoint ep (default: fn's name).
 
-def with_retry(fn, tries: int = 6, base: float = 0.6, cap: float = 5.0):
-    """Small-burst retries with exponential backoff + jitter (Angel One friendly)."""
-    for i in range(tries):
-        try:
-            return fn()
-        except DataException as e:
-            if not _rl(str(e)):
-                raise
-        except Exception:
-            pass
-        time.sleep(min(cap, base * (2 ** i)) + random.uniform(0, 0.4))
-    raise RuntimeError("retry exhausted")
+    Transient errors are retried unless ep is an order endpoint or idempotent=False:
+    a lambda or other unknown name keeps the retries this helper always made."""
+    ep = ep or getattr(fn, "__name__", "?")
+    if idempotent is None: idempotent = ep not in HIGH
+    return call(ep, fn, tries=tries, base=base, cap=cap, idempotent=idempotent)
 
 def order_book_safe(sc):
-    return with_retry(lambda: sc.orderBook())
+    return call("orderBook", sc.orderBook)
 
 def cancel_order_safe(sc, variety, order_id):
-    return with_retry(lambda: sc.cancelOrder(variety, order_id))
+    try:
+        return call("cancelOrder", sc.cancelOrder, order_id, variety)
+    finally:
+        invalidate(sc)           # cached positions/funds (core.positions) are stale either way
 
 def place_order_safe(sc, order):
-    return with_retry(lambda: sc.placeOrder(order))
+    try:
+        return call("placeOrder", sc.placeOrder, order)
+    finally:
+        invalidate(sc)
@@ -56,10 +56,21 @@ def smart_login():
         if not all([cid, akey, mpin, tsec]):
             raise RuntimeError("Missing SmartAPI creds in .env")
         otp = pyotp.TOTP(tsec).now()
+        try:
+            from core.transport import install   # pooled keep-alive HTTP for the session
+            install()
+        except Exception:
+            pass
         obj = SmartConnect(api_key=akey)
         resp = obj.generateSession(cid, mpin, otp)
         if not resp or str(resp.get("status")).lower() not in ("ok","true","success"):
             raise RuntimeError(f"Login failed: {resp}")
+        try:
+            from core.ratelimit import limited   # strategies' calls share the account's rate budget
+            from core.retry import resilient     # classified retries, breakers, hedged reads
+            obj = resilient(limited(obj))
+        except Exception:
+            pass
         return obj, cid
     except Exception as e:
         raise
@@ -113,6 +124,7 @@ def main():
     LIVE = os.getenv("LIVE","0")=="1"
     DRY  = os.getenv("DRY","1")=="1"
     mode = "LIVE" if LIVE and not DRY else "DRY"
+    PAPER = mode == "DRY" and os.getenv("PAPER", "1") == "1"   # DRY ticks get core.paper_broker as api (tick() only logs; fills come from trailing_exit)
     # log chosen strategy once at startup
     _strat = os.getenv('STRATEGY','pcr_momentum_oi')
     try:
@@ -144,7 +156,13 @@ def main():
                     continue
             if within_market_ist():
                 try:
-                    call_strategy_tick(api=api, live=(LIVE and not DRY))
+                    if PAPER:
+                        from core.paper_broker import paper_broker, STATE
+                        pb = paper_broker(md=api, state=STATE)   # real session for prices only
+                        call_strategy_tick(api=pb, live=False)
+                        pb.save()
+                    else:
+                        call_strategy_tick(api=api, live=(LIVE and not DRY))
                 except Exception as e:
                     tb=traceback.format_exc()[-2000:]
                     print(json.dumps({"event":"strategy_error","err":str(e)}), flush=True)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for instrument loading and contract resolution.
+
+The fixture is generated from the checked-in data/instruments_{NSE,NFO,INDICES}.csv
+(expiry/strike parsed back out of the NFO symbols, dates shifted by whole weeks
+so the nearest one is upcoming) into a temp dir; the real data/instruments.csv
+is never touched. Each run is a fresh interpreter so cold numbers are cold;
+every metric is the best of --runs (default 3) to keep scheduler noise out.
+
+  python scripts/bench_instruments.py            # run, print, diff against baseline
+  python scripts/bench_instruments.py --save     # run and store as the baseline
+  python scripts/bench_instruments.py --check    # exit 1 on regression (CI / pre-commit)
+  python scripts/bench_instruments.py --universe "NIFTY,BANKNIFTY@2"
+"""
+from __future__ import annotations
+import argparse, csv, json, os, re, shutil, subprocess, sys, tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+BASELINE = DATA / "bench_baseline.json"
+SOURCES = ("instruments_NSE.csv", "instruments_NFO.csv", "instruments_INDICES.csv")
+HEAD = ["token","tradingsymbol","name","exch_seg","instrumenttype","expiry","strike","lotsize"]
+SYM_RX = re.compile(r"^(.*?)(\d{2}[A-Z]{3}\d{2})(\d*(?:\.\d+)?)(CE|PE|FUT)$")
+LOTS = {"NIFTY": 75, "BANKNIFTY": 35, "FINNIFTY": 65, "MIDCPNIFTY": 140}
+N_WARM = 2000
+# regression = slower than baseline by both the ratio and the absolute slack
+TOL = {"ratio": 1.5, "ms": 5.0, "us": 20.0, "mb": 3.0}
+
+def build_fixture(dst: Path) -> int:
+    """Checked-in split CSVs -> instruments.csv in HEAD layout (strikes x100 like the scrip master)."""
+    rows, exps = [], []
+    for fn in SOURCES:
+        with (DATA / fn).open() as f:
+            for r in csv.DictReader(f):
+                m = SYM_RX.match(r["symbol"]) if r["exchange"] == "NFO" else None
+                exp, strike, lot = None, "-1.000000", "1"
+                if m:
+                    exp = datetime.strptime(m.group(2), "%d%b%y").date(); exps.append(exp)
+                    if m.group(4) != "FUT": strike = f"{float(m.group(3))*100:.6f}"
+                    lot = str(LOTS.get(r["name"], 500))
+                rows.append([r["symboltoken"], r["symbol"], r["name"], r["exchange"], r["instrumenttype"], exp, strike, lot])
+    shift = timedelta(weeks=max(0, -(-(date.today() - min(exps)).days // 7))) if exps else timedelta()
+    with (dst / "instruments.csv").open("w", newline="") as f:
+        w = csv.writer(f); w.writerow(HEAD)
+        for r in rows:
+            r[5] = (r[5] + shift).strftime("%d%b%Y").upper() if r[5] else ""
+            w.writerow(r)
+    return len(rows)
+
+def child(fx: Path) -> dict:
+    import random, resource, time
+    from core.token_map import TM, Universe
+    from core.symbol_search import SI
+    from scripts import auto_token_resolver as atr
+    from scripts.resolve_index_token import scan_index
+    from scripts.expiry_calc import compute_weekly_expiry
+
+    def rss() -> float:
+        with open("/proc/self/status") as f:
+            return next(round(int(ln.split()[1]) / 1024, 1) for ln in f if ln.startswith("VmRSS"))
+
+    csv_path, out = fx / "instruments.csv", {"rss_start_mb": rss()}
+    uni = Universe.from_env()
+    # cold: compile + map from a bare CSV, then map-only on a fresh TokenMap
+    TM.__init__(csv_path, universe=uni)
+    t = time.perf_counter(); TM.ensure_loaded(); out["cold_compile_ms"] = round((time.perf_counter()-t)*1e3, 2)
+    TM.__init__(csv_path, universe=uni)
+    t = time.perf_counter(); TM.ensure_loaded(); out["cold_map_ms"] = round((time.perf_counter()-t)*1e3, 3)
+    t = time.perf_counter(); SI.ensure_built(); out["cold_index_ms"] = round((time.perf_counter()-t)*1e3, 2)
+    out["rss_loaded_mb"] = rss()
+
+    rng = random.Random(7)
+    with csv_path.open() as f:
+        opts = [r for r in csv.DictReader(f) if r["tradingsymbol"][-2:] in ("CE", "PE") and r["expiry"]]
+    if uni: opts = [r for r in opts if r["name"] in uni.names] or opts
+    sample = [rng.choice(opts) for _ in range(N_WARM)]
+    tup = [(r["name"], r["expiry"], float(r["strike"]) / 100, r["tradingsymbol"][-2:]) for r in sample]
+    wk = {nm: compute_weekly_expiry(nm, 0).isoformat() for nm in {t[0] for t in tup}}
+    cases = {
+        "get_token":         lambda i: TM.get_token(*tup[i]),
+        "get_by_ts":         lambda i: TM.get_by_ts(sample[i]["tradingsymbol"]),
+        "nearest_same_exp":  lambda i: atr.nearest_on_same_expiry(tup[i][0], tup[i][1], tup[i][3], tup[i][2] + 7, "NFO"),
+        "nearest_nearby_exp": lambda i: atr.nearest_across_nearby_expiries(tup[i][0], wk[tup[i][0]], tup[i][3], tup[i][2] + 7, "NFO"),
+        "resolve_index_scan": lambda i: scan_index([("NIFTY_50", "nifty 50", re.compile(r"\bnifty\b.*\b50\b|\bnifty50\b"))]),
+    }
+    warm, misses = {}, {}
+    for name, fn in cases.items():
+        fn(0)
+        lat, miss = [], 0
+        for i in range(N_WARM if name != "resolve_index_scan" else 200):
+            t = time.perf_counter_ns(); r = fn(i); lat.append((time.perf_counter_ns() - t) / 1e3)
+            miss += not r
+        lat.sort()
+        pct = lambda p: round(lat[min(len(lat)-1, int(p*len(lat)))], 2)
+        warm[name] = {"p50_us": pct(0.50), "p90_us": pct(0.90), "p99_us": pct(0.99)}
+        misses[name] = miss
+    out.update(warm=warm, misses=misses, rss_end_mb=rss(),
+               peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+               snap_bytes=TM.snap_path.stat().st_size, rows=TM.snap.n)
+    return out
+
+def _best(a, b):
+    if isinstance(a, dict): return {k: _best(v, b[k]) for k, v in a.items()}
+    return min(a, b) if isinstance(a, (int, float)) else a
+
+def run(universe: str, runs: int = 3) -> dict:
+    fx = Path(tempfile.mkdtemp(prefix="bench_instr_"))
+    try:
+        n, best = build_fixture(fx), None
+        env = {**os.environ, "PYTHONPATH": str(ROOT), "TM_UNIVERSE": universe}
+        for _ in range(runs):
+            for p in fx.glob("*.snap"): p.unlink()
+            p = subprocess.run([sys.executable, __file__, "--child", str(fx)], env=env, cwd=ROOT,
+                               capture_output=True, text=True)
+            if p.returncode: sys.exit(p.stderr)
+            cur = json.loads(p.stdout)
+            best = cur if best is None else _best(best, cur)
+        return {"fixture_rows": n, "runs": runs, **best}
+    finally:
+        shutil.rmtree(fx, ignore_errors=True)
+
+def _flat(res: dict) -> dict:
+    flat = {k: v for k, v in res.items() if k.endswith(("_ms", "_mb"))}
+    for case, ps in res.get("warm", {}).items():
+        flat.update({f"{case}.{p}": v for p, v in ps.items()})
+    return flat
+
+def compare(base: dict, cur: dict) -> list:
+    """[(metric, baseline, current)] that regressed past TOL."""
+    bad, b = [], _flat(base)
+    for k, v in _flat(cur).items():
+        if k not in b or k.startswith("rss_start"): continue
+        slack = TOL["us"] if k.endswith("_us") else TOL["ms"] if k.endswith("_ms") else TOL["mb"]
+        if v > b[k] * TOL["ratio"] and v - b[k] > slack: bad.append((k, b[k], v))
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--universe", default="", help="TM_UNIVERSE spec to bench instead of the full map")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--save", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--check", action="store_true", help="exit 1 if slower/bigger than the baseline")
+    ap.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        print(json.dumps(child(a.child))); return
+
+    label = a.universe or "full"
+    res = run(a.universe, a.runs)
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    bad = compare(baselines[label], res) if label in baselines else []
+    print(json.dumps({"label": label, **res, "baseline": label in baselines,
+                      "regressions": [{"metric": k, "baseline": b, "current": v} for k, b, v in bad]}, indent=2))
+    if a.save:
+        baselines[label] = res
+        BASELINE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+    if a.check and bad:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
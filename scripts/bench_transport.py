@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Stock SmartConnect vs the pooled transport (core/transport.py) against a local
+HTTPS stub: a self-signed cert (openssl) and a keep-alive HTTP/1.1 server that
+answers every POST with a small ltpData-shaped body, so the difference is
+connection setup only -- no network, no credentials.
+
+  python scripts/bench_transport.py [-n 200] [--delay-ms 0]
+"""
+from __future__ import annotations
+import argparse, json, shutil, ssl, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+BODY = json.dumps({"status": True, "message": "SUCCESS", "errorcode": "",
+                   "data": {"exchange": "NSE", "tradingsymbol": "SBIN-EQ", "symboltoken": "3045", "ltp": 812.35}}).encode()
+
+class _Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True   # headers and body go out as separate writes
+    delay = 0.0
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.delay: time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers(); self.wfile.write(BODY)
+    do_GET = do_POST
+    def log_message(self, *a): pass
+
+def stub(tmp: Path, delay_ms: float) -> ThreadingHTTPServer:
+    key, crt = tmp / "key.pem", tmp / "cert.pem"
+    subprocess.run([shutil.which("openssl") or "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(crt)], check=True, capture_output=True)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER); ctx.load_cert_chain(crt, key)
+    _Stub.delay = delay_ms / 1e3
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Stub); srv.daemon_threads = True
+    srv.socket = ctx.wrap_socket(srv.socket, server_side=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def run(sc, n: int) -> list:
+    lat = []
+    for _ in range(n):
+        t = time.perf_counter()
+        r = sc.ltpData("NSE", "SBIN-EQ", "3045")
+        lat.append((time.perf_counter() - t) * 1e3)
+        assert r and r.get("status"), r
+    return sorted(lat)
+
+def summary(lat: list) -> dict:
+    pct = lambda p: round(lat[min(len(lat)-1, int(p*len(lat)))], 3)
+    return {"n": len(lat), "p50_ms": pct(.5), "p95_ms": pct(.95), "max_ms": round(lat[-1], 3)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", type=int, default=200, help="ltpData calls per variant")
+    ap.add_argument("--delay-ms", type=float, default=0.0, help="server think time per request")
+    a = ap.parse_args()
+
+    import urllib3
+    urllib3.disable_warnings()
+    from SmartApi import SmartConnect
+    from core.transport import install
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_transport_"))
+    try:
+        srv = stub(tmp, a.delay_ms)
+        root = f"https://localhost:{srv.server_address[1]}"
+        mk = lambda: SmartConnect(api_key="bench", access_token="x", root=root, disable_ssl=True)
+        stock = summary(run(mk(), a.n))
+        tr = install()
+        pooled = summary(run(mk(), a.n))
+        out = {"stub": root, "stock": stock, "pooled": pooled,
+               "p50_saved_ms": round(stock["p50_ms"] - pooled["p50_ms"], 3), "transport": tr.stats()}
+        print(json.dumps(out, indent=2))
+        srv.shutdown()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,15 @@
 import os, sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
+from core.positions import book
 
 def env(k, d=""):
     v = os.getenv(k, "").strip()
@@ -11,6 +22,9 @@ def need(k):
     return v
 
 def login():
+    api = shared_api()
+    if api is not None:
+        return api
     from SmartApi import SmartConnect
     import pyotp
     sc = SmartConnect(api_key=need("SMARTAPI_API_KEY"))
@@ -18,47 +32,13 @@ def login():
     sc.generateSession(need("SMARTAPI_CLIENT_CODE"), need("SMARTAPI_PASSWORD"), otp)
     return sc
 
-def fetch_positions(sc):
-    for fn in ("position", "getPosition"):
-        if hasattr(sc, fn):
-            try:
-                out = getattr(sc, fn)()
-                data = (out or {}).get("data") or []
-                if isinstance(data, dict):
-                    data = data.get("net") or data.get("positiondata") or []
-                return data or []
-            except Exception:
-                pass
-    return []
-
-def netqty(row):
-    for k in ("netqty","netQty","net_quantity","netquantity"):
-        if k in row:
-            try:
-                return int(float(str(row[k]).strip()))
-            except:
-                pass
-    return 0
-
-def pnl(row):
-    for k in ("pnl","pnlmtm","unrealized","unrealizedpnl"):
-        if k in row:
-            try:
-                return float(str(row[k]).strip())
-            except:
-                pass
-    return 0.0
-
 def main():
     sc = login()
-    rows = fetch_positions(sc)
-    lines = []
-    for r in rows:
-        q = netqty(r)
-        ts = r.get("tradingsymbol") or r.get("symbolname") or ""
-        prod = (r.get("producttype") or r.get("product") or "").upper()
-        if q != 0:
-            lines.append(f"{ts} [{prod}] qty={q} pnl={pnl(r):.2f}")
+    try:
+        rows = book(sc).open()
+    except Exception:
+        rows = []
+    lines = [f"{p.tradingsymbol} [{p.product}] qty={p.netqty} pnl={p.pnl or 0.0:.2f}" for p in rows]
 
     if not lines:
         msg = "[i] No open positions."
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, csv, json
+import os, csv, json, sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from core.instruments import ingest
+
 ROOT = Path.home()/ "angel-one-smart-bot"
 DATA = ROOT/ "data"; DATA.mkdir(parents=True, exist_ok=True)
 
@@ -13,6 +16,12 @@ try:
 except Exception:
     pass
 
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
 def smart_connect():
     try:
         from SmartApi import SmartConnect
@@ -21,6 +30,9 @@ def smart_connect():
     return SmartConnect
 
 def login():
+    api = shared_api()
+    if api is not None:
+        return api
     cid  = os.getenv("CLIENT_CODE")
     akey = os.getenv("API_KEY")
     mpin = os.getenv("MPIN")
@@ -71,39 +83,12 @@ def fetch_instruments_via_api(api, exch: str) -> list[dict]:
                 pass
     return []
 
-def fetch_scrip_master() -> list[dict]:
+def fetch_scrip_master() -> dict:
     """
-    Public Angel One Scrip Master JSON (no auth).
+    Public Angel One Scrip Master JSON (no auth), streamed straight into
+    instruments.csv + the per-exchange CSVs; raw body cached for reference.
     """
-    import requests
-    url = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-    # Normalize keys
-    out = []
-    for d in data:
-        out.append({
-            "exchange": d.get("exch_seg") or d.get("exchange") or "",
-            "symbol": d.get("symbol") or d.get("tradingsymbol") or d.get("symbolname") or "",
-            "name": d.get("name") or d.get("symbolname") or "",
-            "symboltoken": d.get("token") or d.get("symboltoken") or "",
-            "instrumenttype": d.get("instrumenttype") or d.get("instrument_type") or "",
-            "segment": d.get("exch_seg") or "",
-        })
-    # save raw for reference
-    (DATA/"scrip_master.json").write_text(json.dumps(out, ensure_ascii=False))
-    return out
-
-def save_from_master(master: list[dict]):
-    # Build per-exchange CSVs from master
-    nse = [r for r in master if r["exchange"] == "NSE" and (r["instrumenttype"] or "").upper() != "INDEX"]
-    nfo = [r for r in master if r["exchange"] == "NFO"]
-    indices = [r for r in master if (r["instrumenttype"] or "").upper() == "INDEX"]
-    save_csv(DATA/"instruments_NSE.csv", nse)
-    save_csv(DATA/"instruments_NFO.csv", nfo)
-    save_csv(DATA/"instruments_INDICES.csv", indices)
-    save_csv(DATA/"instruments_NSE_INDICES.csv", indices)
+    return ingest(out=DATA/"instruments.csv", cache=DATA/"scrip_master.json")
 
 def main():
     api = login()
@@ -117,15 +102,7 @@ def main():
 
     if total == 0:
         # API failed/empty -> fallback to public scrip master
-        master = fetch_scrip_master()
-        save_from_master(master)
-        # recount after fallback
-        counts = {
-            "NSE": sum(1 for _ in (DATA/"instruments_NSE.csv").read_text().splitlines()[1:]) if (DATA/"instruments_NSE.csv").exists() else 0,
-            "NFO": sum(1 for _ in (DATA/"instruments_NFO.csv").read_text().splitlines()[1:]) if (DATA/"instruments_NFO.csv").exists() else 0,
-            "INDICES": sum(1 for _ in (DATA/"instruments_INDICES.csv").read_text().splitlines()[1:]) if (DATA/"instruments_INDICES.csv").exists() else 0,
-            "NSE_INDICES": sum(1 for _ in (DATA/"instruments_NSE_INDICES.csv").read_text().splitlines()[1:]) if (DATA/"instruments_NSE_INDICES.csv").exists() else 0,
-        }
+        counts = fetch_scrip_master()["splits"]
 
     print(json.dumps({"saved_counts": counts, "dir": str(DATA)}))
 
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from datetime import date, datetime, timedelta
 
+# Weekday guesses; only used when the instruments calendar has no listing
+# for the symbol (or the query runs past the listed range).
 EXPIRE_MAP = {
     "NIFTY": {"weekly": 1, "monthly": 1},  # Thu
     "BANKNIFTY":  {"weekly": 2, "monthly": 2},  # Wed
@@ -17,7 +19,17 @@ def _last_weekday_of_month(y: int, m: int, wd: int) -> date:
 def _on_or_after(start: date, wd: int) -> date:
     return start + timedelta(days=(wd - start.weekday()) % 7)
 
+def _listed():
+    try:
+        from core.token_map import TM
+        TM.ensure_loaded()
+        return TM
+    except Exception:
+        return None
+
 def compute_weekly_expiry(symbol: str, k: int = 0, today: date | None = None) -> date:
+    tm = _listed()
+    if tm and (d := tm.next_expiry(symbol, k, today)): return d
     wd = EXPIRE_MAP.get(symbol.upper(), EXPIRE_MAP["NIFTY"])["weekly"]
     t  = today or date.today()
     return _on_or_after(t, wd) + timedelta(weeks=k)
@@ -27,10 +39,17 @@ def compute_monthly_expiry(symbol: str, k: int = 0, ref: date | None = None) ->
     r  = ref or date.today()
     total = (r.year*12 + (r.month-1)) + k
     y, m = divmod(total, 12); m += 1
+    tm = _listed()
+    if tm:
+        # no ref: k-th upcoming listed monthly; with ref: the listed monthly of that month
+        d = tm.next_expiry(symbol, k, r, monthly=True) if ref is None else tm.monthly_expiry_in(symbol, y, m)
+        if d: return d
     return _last_weekday_of_month(y, m, wd)
 
 def compute_yearly_expiry(symbol: str, k: int = 0, ref: date | None = None) -> date:
     r = ref or date.today()
+    tm = _listed()
+    if tm and (d := tm.monthly_expiry_in(symbol, r.year + k, 12)): return d
     return _last_weekday_of_month(r.year + k, 12, EXPIRE_MAP.get(symbol.upper(), EXPIRE_MAP["NIFTY"])["monthly"])
 
 def parse_hint_to_date(symbol: str, hint: str) -> date:
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, json, itertools
+import os, re, sys, json, asyncio, itertools
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 # .env
 try:
     from dotenv import load_dotenv
@@ -10,6 +12,12 @@ try:
 except Exception:
     pass
 
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
 def smart_connect():
     try:
         from SmartApi import SmartConnect
@@ -29,39 +37,89 @@ def search_variants(q: str) -> list[str]:
         base += ["NIFTY BANK", "BANKNIFTY", "NSE NIFTY BANK", "Nifty Bank"]
     return list(dict.fromkeys(base))  # de-dupe, keep order
 
+OPT_RX = re.compile(r"^([A-Z&-]+)\s+(\d+(?:\.\d+)?)\s*(CE|PE)$")
+
+def ladder_lookup(q: str) -> dict | None:
+    """'NIFTY 24500 CE' style queries are answered from the local strike ladder (no login)."""
+    m = OPT_RX.match((q or "").upper().strip())
+    if not m:
+        return None
+    from core.token_map import TM
+    from scripts.expiry_calc import parse_hint_to_date, compute_weekly_expiry
+    name, strike, opt = m.group(1), float(m.group(2)), m.group(3)
+    hint = os.environ.get("EXPIRY", "").strip()
+    exp  = (parse_hint_to_date(name, hint) if hint else compute_weekly_expiry(name, 0)).strftime("%Y-%m-%d")
+    n    = int(os.environ.get("ATM_N", "0"))
+    rows = TM.atm_window(name, exp, strike, opt, n, os.environ.get("EXCH", "NFO"))
+    return {"query": q, "expiry": exp, "results": [
+        {"exchange": c.exch_seg, "symbol": c.tradingsymbol, "name": c.name, "token": str(c.token),
+         "strike": c.strike, "lotsize": c.lotsize} for c in rows]}
+
+def local_search(queries: list[str], exchs: list[str]) -> list[dict]:
+    try:
+        from core.symbol_search import search
+        seen, rows = set(), []
+        for q in queries:
+            for r in search(q, exchs, limit=20):
+                key = (r["exchange"], r["token"], r["symbol"])
+                if key not in seen:
+                    seen.add(key); rows.append(r)
+    except Exception:
+        return []
+    pref = {e:i for i,e in enumerate(["NSE_INDICES","INDICES","NSE","NFO"])}
+    rows.sort(key=lambda r: (-r["score"], pref.get(r["exchange"], 99), r["name"]))
+    return rows
+
+async def search_matrix(api, matrix: list) -> list:
+    """Every (client fn, exchange, query) search at once; failures come back as exceptions."""
+    from core.async_client import AsyncSmart
+    async with AsyncSmart(api) as aio:
+        async def one(fn_name, ex, q):
+            # try with exchange kw first; if fails, try plain
+            try:
+                return await aio.call(fn_name, exchange=ex, searchtext=q)
+            except Exception:
+                return await aio.call(fn_name, q)
+        return await aio.gather([one(*m) for m in matrix])
+
 def main():
     try:
         q_in = os.environ.get("Q", "NIFTY 50").strip()
+        hit = ladder_lookup(q_in)
+        if hit is not None:
+            print(json.dumps(hit, ensure_ascii=False)); return
         queries = search_variants(q_in) or [q_in]
         exchs = os.environ.get("EXCHS", "NSE_INDICES,INDICES,NSE,NFO").split(",")
         exchs = [e.strip() for e in exchs if e.strip()]
-        # login
-        cid  = os.getenv("CLIENT_CODE"); akey = os.getenv("API_KEY")
-        mpin = os.getenv("MPIN");        tsec = os.getenv("TOTP_SECRET")
-        if not all([cid, akey, mpin, tsec]):
-            raise SystemExit("SmartAPI creds missing in .env")
-
-        import pyotp
-        SC  = smart_connect()
-        otp = pyotp.TOTP(tsec).now()
-        api = SC(api_key=akey)
-        api.generateSession(cid, mpin, otp)
+
+        # offline symbol index (no login / API round-trips)
+        rows = local_search(queries, exchs)
+        if rows:
+            print(json.dumps({"query": q_in, "variants": queries, "exchanges": exchs, "source": "index", "results": rows[:20]}, ensure_ascii=False))
+            return
+        # login (shared broker session if it's up)
+        api = shared_api()
+        if api is None:
+            cid  = os.getenv("CLIENT_CODE"); akey = os.getenv("API_KEY")
+            mpin = os.getenv("MPIN");        tsec = os.getenv("TOTP_SECRET")
+            if not all([cid, akey, mpin, tsec]):
+                raise SystemExit("SmartAPI creds missing in .env")
+
+            import pyotp
+            SC  = smart_connect()
+            otp = pyotp.TOTP(tsec).now()
+            api = SC(api_key=akey)
+            api.generateSession(cid, mpin, otp)
 
         # different client versions use different names
         fn_names = ("searchScrip", "search_symbol", "searchScrips", "searchSymbol")
 
         seen = set()
         rows = []
-        for fn_name, ex, q in itertools.product(fn_names, exchs, queries):
-            f = getattr(api, fn_name, None)
-            if not callable(f): 
-                continue
+        matrix = [(fn_name, ex, q) for fn_name, ex, q in itertools.product(fn_names, exchs, queries)
+                  if callable(getattr(api, fn_name, None))]
+        for (_, ex, _), r in zip(matrix, asyncio.run(search_matrix(api, matrix))):
             try:
-                # try with exchange kw first; if fails, try plain
-                try:
-                    r = f(exchange=ex, searchtext=q)
-                except Exception:
-                    r = f(q)
                 data = r.get("data") if isinstance(r, dict) else r
                 if not isinstance(data, list):
                     continue
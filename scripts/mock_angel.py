@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Angel One SmartAPI REST endpoints, for offline load tests.
+
+Speaks the request/response shapes SmartConnect uses for login
+(loginByPassword, generateTokens, getProfile, logout), ltpData, getMarketData
+(quote), getCandleData, searchScrip, orderBook, position, placeOrder,
+modifyOrder and cancelOrder. Prices are a seeded random walk per token; market
+orders fill at the current price and show up in position().
+
+Faults, all optional:
+  --latency "lognormal:20,0.6"              default for every endpoint (ms)
+  --latency "ltpData=uniform:5,15;placeOrder=const:40"
+           const:MS | uniform:A,B | normal:MU,SD | lognormal:MEDIAN,SIGMA
+  --rate-limit-p 0.05   answer "Access denied because of exceeding access rate"
+  --enforce-limits      ... whenever an endpoint exceeds its core.ratelimit.LIMITS per-second rate
+  --malformed-p 0.02    truncated JSON body (SmartConnect: "Couldn't parse the JSON ...")
+  --error-p 0.01        502 with an HTML body
+
+  python scripts/mock_angel.py --port 8799 [--tls] ...
+  SmartConnect(api_key="x", root="http://127.0.0.1:8799")     # disable_ssl=True with --tls
+  curl 127.0.0.1:8799/__stats                                  # per-endpoint counts and injections
+
+Or in-process: srv, root = start(MockConfig(...)); ...; srv.shutdown()
+"""
+from __future__ import annotations
+import argparse, base64, json, math, random, shutil, ssl, subprocess, sys, tempfile, threading, time, uuid, zlib
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Tuple
+from urllib.parse import unquote, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+RL_BODY = b"Access denied because of exceeding access rate"
+# route suffix -> SmartConnect method name (the names core.ratelimit.LIMITS uses)
+ROUTES = {
+    "/user/v1/loginByPassword": "generateSession", "/jwt/v1/generateTokens": "generateToken",
+    "/user/v1/getProfile": "getProfile", "/user/v1/logout": "terminateSession",
+    "/order/v1/getLtpData": "ltpData", "/market/v1/quote": "getMarketData",
+    "/historical/v1/getCandleData": "getCandleData", "/order/v1/searchScrip": "searchScrip",
+    "/order/v1/getOrderBook": "orderBook", "/order/v1/getPosition": "position",
+    "/order/v1/placeOrder": "placeOrder", "/order/v1/modifyOrder": "modifyOrder", "/order/v1/cancelOrder": "cancelOrder",
+}
+PUBLIC = {"generateSession", "generateToken"}
+INTERVALS = {"ONE_MINUTE": 1, "THREE_MINUTE": 3, "FIVE_MINUTE": 5, "TEN_MINUTE": 10, "FIFTEEN_MINUTE": 15,
+             "THIRTY_MINUTE": 30, "ONE_HOUR": 60, "ONE_DAY": 1440}
+MAX_DAYS = {1: 30, 3: 60, 5: 100, 10: 100, 15: 200, 30: 200, 60: 400, 1440: 2000}
+
+def dist(spec: str) -> Callable[[random.Random], float]:
+    """'lognormal:20,0.6' -> sampler of milliseconds."""
+    kind, _, args = spec.partition(":")
+    a = [float(x) for x in args.split(",") if x]
+    if kind == "const": return lambda r: a[0]
+    if kind == "uniform": return lambda r: r.uniform(a[0], a[1])
+    if kind == "normal": return lambda r: max(0.0, r.gauss(a[0], a[1]))
+    if kind == "lognormal": return lambda r: r.lognormvariate(math.log(a[0]), a[1])
+    raise ValueError(f"unknown latency distribution {spec!r}")
+
+@dataclass
+class MockConfig:
+    host: str = "127.0.0.1"
+    port: int = 0
+    tls: bool = False
+    latency: str = ""                 # "spec" or "ep=spec;ep=spec" (ep "*" = default)
+    rate_limit_p: float = 0.0
+    enforce_limits: bool = False
+    malformed_p: float = 0.0
+    error_p: float = 0.0
+    seed: int = 7
+
+    def latencies(self) -> Dict[str, Callable[[random.Random], float]]:
+        out = {}
+        for part in filter(None, (p.strip() for p in self.latency.split(";"))):
+            ep, _, spec = part.rpartition("=")
+            out[ep or "*"] = dist(spec)
+        return out
+
+@dataclass
+class _State:
+    cfg: MockConfig
+    rng: random.Random
+    lat: Dict[str, Callable[[random.Random], float]]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    prices: Dict[str, float] = field(default_factory=dict)
+    symbols: Dict[str, Tuple[str, str]] = field(default_factory=dict)   # token -> (exchange, tradingsymbol)
+    orders: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    recent: Dict[str, Deque[float]] = field(default_factory=dict)
+    stats: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    seq: int = 0
+    client: str = "MOCK"
+
+    def count(self, ep: str, k: str):
+        c = self.stats.setdefault(ep, {})
+        c[k] = c.get(k, 0) + 1
+
+    def price(self, token: str) -> float:
+        # seeded per token, then a small random step per read
+        p = self.prices.get(token)
+        if p is None: p = 50.0 + zlib.crc32(token.encode()) % 25000 / 10.0
+        p = round(max(0.05, p * (1 + self.rng.gauss(0, 0.0005))) * 20) / 20
+        self.prices[token] = p
+        return p
+
+    def over_limit(self, ep: str) -> bool:
+        from core.ratelimit import LIMITS
+        ps = LIMITS.get(ep, (0, 0))[0]
+        if not ps: return False
+        q, now = self.recent.setdefault(ep, deque()), time.monotonic()
+        while q and now - q[0] > 1.0: q.popleft()
+        if len(q) >= ps: return True
+        q.append(now)
+        return False
+
+def _jwt(client: str, ttl: int = 6 * 3600) -> str:
+    enc = lambda d: base64.urlsafe_b64encode(json.dumps(d).encode()).rstrip(b"=").decode()
+    return f'{enc({"alg": "HS512"})}.{enc({"sub": client, "exp": int(time.time()) + ttl})}.mock'
+
+def _ok(data: Any) -> Dict[str, Any]:
+    return {"status": True, "message": "SUCCESS", "errorcode": "", "data": data}
+
+def _fail(msg: str, code: str = "AB1000") -> Dict[str, Any]:
+    return {"status": False, "message": msg, "errorcode": code, "data": None}
+
+# --- endpoint handlers: (state, params) -> response dict ---
+def h_login(st: _State, p: dict) -> dict:
+    if not (p.get("clientcode") and p.get("password") and p.get("totp")): return _fail("Invalid totp", "AB1050")
+    st.client = p["clientcode"]
+    return _ok({"jwtToken": _jwt(p["clientcode"]), "refreshToken": uuid.uuid4().hex, "feedToken": uuid.uuid4().hex})
+
+def h_token(st: _State, p: dict) -> dict:
+    return _ok({"jwtToken": _jwt(st.client), "refreshToken": p.get("refreshToken") or uuid.uuid4().hex,
+                "feedToken": uuid.uuid4().hex})
+
+def h_profile(st: _State, p: dict) -> dict:
+    return _ok({"clientcode": st.client, "name": "MOCK USER", "exchanges": ["NSE", "NFO"], "products": ["MIS", "NRML"]})
+
+def h_logout(st: _State, p: dict) -> dict:
+    return _ok(None)
+
+def h_ltp(st: _State, p: dict) -> dict:
+    tok = str(p.get("symboltoken") or "")
+    if not tok: return _fail("Invalid Token", "AB4020")
+    st.symbols.setdefault(tok, (p.get("exchange") or "NSE", p.get("tradingsymbol") or tok))
+    ltp = st.price(tok)
+    return _ok({"exchange": p.get("exchange"), "tradingsymbol": p.get("tradingsymbol"), "symboltoken": tok,
+                "open": ltp, "high": ltp, "low": ltp, "close": ltp, "ltp": ltp})
+
+def h_quote(st: _State, p: dict) -> dict:
+    mode, fetched = (p.get("mode") or "LTP").upper(), []
+    for ex, toks in (p.get("exchangeTokens") or {}).items():
+        for tok in toks:
+            tok = str(tok); ltp = st.price(tok)
+            row = {"exchange": ex, "tradingSymbol": st.symbols.get(tok, (ex, tok))[1], "symbolToken": tok, "ltp": ltp}
+            if mode in ("OHLC", "FULL"): row.update(open=ltp, high=ltp, low=ltp, close=ltp)
+            if mode == "FULL":
+                row.update(lastTradeQty=25, exchFeedTime=datetime.now().strftime("%d-%b-%Y %H:%M:%S"),
+                           exchTradeTime=datetime.now().strftime("%d-%b-%Y %H:%M:%S"), netChange=0.0, percentChange=0.0,
+                           avgPrice=ltp, tradeVolume=0, opnInterest=0, lowerCircuit=round(ltp * 0.9, 2),
+                           upperCircuit=round(ltp * 1.1, 2), totBuyQuan=0, totSellQuan=0, **{"52WeekLow": ltp, "52WeekHigh": ltp},
+                           depth={"buy": [{"price": round(ltp - 0.05, 2), "quantity": 25, "orders": 1}],
+                                  "sell": [{"price": round(ltp + 0.05, 2), "quantity": 25, "orders": 1}]})
+            fetched.append(row)
+    return _ok({"fetched": fetched, "unfetched": []})
+
+def h_candles(st: _State, p: dict) -> dict:
+    step = INTERVALS.get(p.get("interval") or "")
+    if step is None: return _fail("Invalid interval", "AB13000")
+    try:
+        t0, t1 = (datetime.strptime(p[k], "%Y-%m-%d %H:%M") for k in ("fromdate", "todate"))
+    except (KeyError, ValueError):
+        return _fail("Invalid date format", "AB13000")
+    if (t1 - t0).days > MAX_DAYS[step]: return _fail(f"Interval {p['interval']} allows at most {MAX_DAYS[step]} days", "AB13000")
+    tok = str(p.get("symboltoken") or "")
+    r = random.Random(zlib.crc32(f"{tok}:{p['interval']}".encode()))
+    px, out, t = 50.0 + zlib.crc32(tok.encode()) % 25000 / 10.0, [], t0
+    while t <= t1 and len(out) < 100000:
+        if t.weekday() < 5 and (step == 1440 or (9, 15) <= (t.hour, t.minute) < (15, 30)):
+            o = px; c = round(o * (1 + r.gauss(0, 0.001 * math.sqrt(step))), 2)
+            hi, lo = round(max(o, c) * (1 + abs(r.gauss(0, 0.0005))), 2), round(min(o, c) * (1 - abs(r.gauss(0, 0.0005))), 2)
+            out.append([t.strftime("%Y-%m-%dT%H:%M:00+05:30"), o, hi, lo, c, r.randint(1000, 100000)])
+            px = c
+        t += timedelta(minutes=step) if step < 1440 else timedelta(days=1)
+        if step < 1440 and (t.hour, t.minute) >= (15, 30): t = (t + timedelta(days=1)).replace(hour=9, minute=15)
+    return _ok(out)
+
+def h_search(st: _State, p: dict) -> dict:
+    try:
+        from core.symbol_search import search
+        rows = search(p.get("searchscrip") or "", [p.get("exchange") or "NSE"], limit=20)
+    except Exception:
+        rows = []
+    for r in rows: st.symbols.setdefault(str(r["token"]), (r["exchange"], r["symbol"]))
+    return _ok([{"exchange": r["exchange"], "tradingsymbol": r["symbol"], "symboltoken": str(r["token"])} for r in rows])
+
+def h_place(st: _State, p: dict) -> dict:
+    need = ("tradingsymbol", "symboltoken", "exchange", "transactiontype", "quantity", "ordertype")
+    miss = [k for k in need if not p.get(k)]
+    if miss: return _fail(f"Invalid {miss[0]}", "AB4008")
+    st.seq += 1
+    oid = datetime.now().strftime("%y%m%d") + f"{st.seq:08d}"
+    tok = str(p["symboltoken"]); st.symbols.setdefault(tok, (p["exchange"], p["tradingsymbol"]))
+    o = {"variety": p.get("variety") or "NORMAL", "ordertype": p["ordertype"], "producttype": p.get("producttype") or "INTRADAY",
+         "duration": p.get("duration") or "DAY", "price": float(p.get("price") or 0), "triggerprice": float(p.get("triggerprice") or 0),
+         "quantity": str(p["quantity"]), "tradingsymbol": p["tradingsymbol"], "symboltoken": tok, "exchange": p["exchange"],
+         "transactiontype": p["transactiontype"], "orderid": oid, "uniqueorderid": str(uuid.uuid4()),
+         "filledshares": "0", "unfilledshares": str(p["quantity"]), "averageprice": 0.0, "text": "",
+         "updatetime": datetime.now().strftime("%d-%b-%Y %H:%M:%S")}
+    if p["ordertype"] == "MARKET":
+        o.update(status="complete", orderstatus="complete", filledshares=str(p["quantity"]), unfilledshares="0",
+                 averageprice=st.price(tok))
+    else:
+        o.update(status="trigger pending" if "SL" in p["ordertype"] else "open")
+        o["orderstatus"] = o["status"]
+    st.orders[oid] = o
+    return _ok({"script": p["tradingsymbol"], "orderid": oid, "uniqueorderid": o["uniqueorderid"]})
+
+def h_modify(st: _State, p: dict) -> dict:
+    o = st.orders.get(str(p.get("orderid") or ""))
+    if o is None: return _fail("Order not found", "AB4006")
+    if o["status"] in ("complete", "cancelled", "rejected"): return _fail(f"Order is {o['status']}", "AB4007")
+    for k in ("price", "triggerprice"):
+        if p.get(k) is not None: o[k] = float(p[k])
+    for k in ("quantity", "ordertype", "duration"):
+        if p.get(k): o[k] = str(p[k])
+    o["updatetime"] = datetime.now().strftime("%d-%b-%Y %H:%M:%S")
+    return _ok({"orderid": o["orderid"], "uniqueorderid": o["uniqueorderid"]})
+
+def h_cancel(st: _State, p: dict) -> dict:
+    o = st.orders.get(str(p.get("orderid") or ""))
+    if o is None: return _fail("Order not found", "AB4006")
+    if o["status"] in ("complete", "cancelled", "rejected"): return _fail(f"Order is {o['status']}", "AB4007")
+    o.update(status="cancelled", orderstatus="cancelled", updatetime=datetime.now().strftime("%d-%b-%Y %H:%M:%S"))
+    return _ok({"orderid": o["orderid"], "uniqueorderid": o["uniqueorderid"]})
+
+def h_orders(st: _State, p: dict) -> dict:
+    return _ok([dict(o) for o in st.orders.values()] or None)
+
+def h_position(st: _State, p: dict) -> dict:
+    pos: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for o in st.orders.values():
+        if o["status"] != "complete": continue
+        k = (o["exchange"], o["symboltoken"], o["producttype"])
+        r = pos.setdefault(k, {"exchange": k[0], "symboltoken": k[1], "producttype": k[2], "tradingsymbol": o["tradingsymbol"],
+                               "buyqty": 0, "sellqty": 0, "buyamount": 0.0, "sellamount": 0.0})
+        q = int(o["filledshares"]); side = "buy" if o["transactiontype"] == "BUY" else "sell"
+        r[f"{side}qty"] += q; r[f"{side}amount"] += q * o["averageprice"]
+    out = []
+    for r in pos.values():
+        net, ltp = r["buyqty"] - r["sellqty"], st.price(r["symboltoken"])
+        pnl = r["sellamount"] - r["buyamount"] + net * ltp
+        out.append({**{k: v for k, v in r.items() if not k.endswith("amount")},
+                    "netqty": str(net), "buyqty": str(r["buyqty"]), "sellqty": str(r["sellqty"]),
+                    "buyavgprice": f"{r['buyamount'] / r['buyqty']:.2f}" if r["buyqty"] else "0.00",
+                    "sellavgprice": f"{r['sellamount'] / r['sellqty']:.2f}" if r["sellqty"] else "0.00",
+                    "ltp": f"{ltp:.2f}", "pnl": f"{pnl:.2f}", "unrealised": f"{pnl:.2f}" if net else "0.00"})
+    return _ok(out or None)
+
+HANDLERS: Dict[str, Callable[[_State, dict], dict]] = {
+    "generateSession": h_login, "generateToken": h_token, "getProfile": h_profile, "terminateSession": h_logout,
+    "ltpData": h_ltp, "getMarketData": h_quote, "getCandleData": h_candles, "searchScrip": h_search,
+    "orderBook": h_orders, "position": h_position, "placeOrder": h_place, "modifyOrder": h_modify, "cancelOrder": h_cancel,
+}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _send(self, code: int, body: bytes, ctype: str = "application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype); self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def _serve(self):
+        st: _State = self.server.state
+        url = urlsplit(self.path)
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else unquote(url.query).encode()
+        if url.path == "/__stats":
+            return self._send(200, json.dumps(st.stats, sort_keys=True).encode())
+        ep = next((e for suffix, e in ROUTES.items() if url.path.endswith(suffix)), None)
+        if ep is None:
+            return self._send(404, json.dumps(_fail(f"no route {url.path}", "AB404")).encode())
+        with st.lock:
+            st.count(ep, "calls")
+            lat = st.lat.get(ep) or st.lat.get("*")
+            delay = lat(st.rng) / 1e3 if lat else 0.0
+            roll = st.rng.random()
+            limited = roll < st.cfg.rate_limit_p or (st.cfg.enforce_limits and st.over_limit(ep))
+            malformed = not limited and st.rng.random() < st.cfg.malformed_p
+            broken = not (limited or malformed) and st.rng.random() < st.cfg.error_p
+        if delay: time.sleep(delay)
+        if limited:
+            st.count(ep, "rate_limited"); return self._send(403, RL_BODY, "text/plain")
+        if broken:
+            st.count(ep, "error_502"); return self._send(502, b"<html><body>502 Bad Gateway</body></html>", "text/html")
+        if ep not in PUBLIC and not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._send(403, json.dumps({"message": "Invalid Token", "errorcode": "AG8001", "status": False,
+                                               "data": None, "error_type": "TokenException"}).encode())
+        try: params = json.loads(raw) if raw else {}
+        except ValueError: params = {}
+        with st.lock:
+            body = json.dumps(HANDLERS[ep](st, params if isinstance(params, dict) else {})).encode()
+        if malformed:
+            st.count(ep, "malformed"); body = body[:max(1, len(body) // 2)]
+        self._send(200, body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+    def log_message(self, *a):
+        pass
+
+def _tls_context(tmp: Path) -> ssl.SSLContext:
+    key, crt = tmp / "key.pem", tmp / "cert.pem"
+    subprocess.run([shutil.which("openssl") or "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(crt)], check=True, capture_output=True)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER); ctx.load_cert_chain(crt, key)
+    return ctx
+
+def start(cfg: MockConfig = MockConfig()) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns (server, root URL for SmartConnect(root=...))."""
+    srv = ThreadingHTTPServer((cfg.host, cfg.port), _Handler); srv.daemon_threads = True
+    srv.state = _State(cfg, random.Random(cfg.seed), cfg.latencies())
+    scheme = "http"
+    if cfg.tls:
+        tmp = Path(tempfile.mkdtemp(prefix="mock_angel_"))
+        try: srv.socket = _tls_context(tmp).wrap_socket(srv.socket, server_side=True)
+        finally: shutil.rmtree(tmp, ignore_errors=True)
+        scheme = "https"
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    host = "localhost" if cfg.tls else cfg.host
+    return srv, f"{scheme}://{host}:{srv.server_address[1]}"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--tls", action="store_true", help="HTTPS with a throwaway self-signed cert")
+    ap.add_argument("--latency", default="", help='e.g. "lognormal:20,0.6" or "ltpData=uniform:5,15;*=const:10"')
+    ap.add_argument("--rate-limit-p", type=float, default=0.0)
+    ap.add_argument("--enforce-limits", action="store_true")
+    ap.add_argument("--malformed-p", type=float, default=0.0)
+    ap.add_argument("--error-p", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=7)
+    a = ap.parse_args()
+    cfg = MockConfig(a.host, a.port, a.tls, a.latency, a.rate_limit_p, a.enforce_limits, a.malformed_p, a.error_p, a.seed)
+    srv, root = start(cfg)
+    print(json.dumps({"event": "mock_angel_up", "root": root}), flush=True)
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+        print(json.dumps({"event": "mock_angel_down", "stats": srv.state.stats}), flush=True)
+
+if __name__ == "__main__":
+    main()
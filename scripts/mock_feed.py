@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Angel One SmartAPI streaming feed (SmartWebSocketV2), for
+offline tests of core.market_data.
+
+Plain ws://, stdlib only. Checks the four auth headers, accepts the V2
+subscribe/unsubscribe JSON and streams little-endian binary packets laid out
+as SmartWebSocketV2 parses them: LTP (51 bytes), QUOTE (123) and SNAP_QUOTE
+(379, with 5-level depth and OI). Prices are a seeded random walk per token,
+sent in paise.
+
+Faults, all optional:
+  --drop-every 5     close every connection this often (seconds): clients must reconnect and resubscribe
+  srv.kill_clients() the same on demand (in-process)
+
+  python scripts/mock_feed.py --port 8798 --tick-ms 50
+  MarketData(creds=lambda: ("Bearer x", "k", "C", "f"), url="ws://127.0.0.1:8798/smart-stream")
+
+Or in-process: srv, url = start(FeedConfig(...)); ...; srv.shutdown()
+"""
+from __future__ import annotations
+import argparse, base64, hashlib, json, random, socket, socketserver, struct, threading, time, zlib
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+AUTH = ("authorization", "x-api-key", "x-client-code", "x-feed-token")
+
+@dataclass
+class FeedConfig:
+    host: str = "127.0.0.1"
+    port: int = 0
+    tick_ms: float = 50.0
+    drop_every: float = 0.0
+    seed: int = 7
+
+class _State:
+    def __init__(self, cfg: FeedConfig):
+        self.cfg, self.rng, self.lock = cfg, random.Random(cfg.seed), threading.Lock()
+        self.px: Dict[str, float] = {}
+        self.conns: set = set()
+        self.stats = {"connections": 0, "rejected": 0, "subscribes": 0, "packets": 0}
+
+    def price(self, tok: str) -> float:
+        with self.lock:
+            p = self.px.get(tok) or 50.0 + zlib.crc32(tok.encode()) % 25000 / 10.0
+            p = self.px[tok] = round(max(0.05, p * (1 + self.rng.gauss(0, 0.0005))), 2)
+            return p
+
+def packet(mode: int, et: int, tok: str, seq: int, px: float) -> bytes:
+    paise, ts = int(round(px * 100)), int(time.time() * 1e3)
+    b = struct.pack("<BB25sqqq", mode, et, tok.encode(), seq, ts, paise)
+    if mode >= 2:
+        b += struct.pack("<qqqddqqqq", 25, paise, 1000 * seq, 5e5, 4.8e5, paise - 500, paise + 700, paise - 900, paise - 300)
+    if mode == 3:
+        b += struct.pack("<qqq", ts, 120000 + seq, 150)
+        # 10 depth packets: SmartWebSocketV2 reports flag!=0 rows as best_5_buy_data
+        b += b"".join(struct.pack("<HqqH", 1, 75 * (i + 1), paise - 5 * (i + 1), i + 1) for i in range(5))
+        b += b"".join(struct.pack("<HqqH", 0, 75 * (i + 1), paise + 5 * (i + 1), i + 1) for i in range(5))
+        b += struct.pack("<qqqq", int(paise * 1.2), int(paise * 0.8), int(paise * 1.5), int(paise * 0.5))
+    return b
+
+def _frame(op: int, data: bytes) -> bytes:
+    n = len(data)
+    head = bytes([0x80 | op]) + (bytes([n]) if n < 126 else struct.pack(">BH", 126, n) if n < 65536 else struct.pack(">BQ", 127, n))
+    return head + data
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.st: _State = self.server.state
+        self.send_lock, self.closed = threading.Lock(), threading.Event()
+        self.subs: Dict[Tuple[int, str], int] = {}      # (exchange type, token) -> mode
+
+    def _read(self, n: int) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            chunk = self.request.recv(n - len(buf))
+            if not chunk: raise ConnectionError("client went away")
+            buf += chunk
+        return buf
+
+    def _send(self, op: int, data: bytes):
+        with self.send_lock: self.request.sendall(_frame(op, data))
+
+    def _handshake(self) -> bool:
+        raw = b""
+        while b"\r\n\r\n" not in raw: raw += self._read(1)
+        lines = raw.decode("latin-1").split("\r\n")
+        hdr = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if ":" in l)}
+        if not all(hdr.get(h) for h in AUTH):
+            self.st.stats["rejected"] += 1
+            self.request.sendall(b"HTTP/1.1 401 Unauthorized\r\nContent-Length: 0\r\n\r\n")
+            return False
+        acc = base64.b64encode(hashlib.sha1(hdr["sec-websocket-key"].encode() + GUID).digest()).decode()
+        self.request.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                              f"Sec-WebSocket-Accept: {acc}\r\n\r\n").encode())
+        return True
+
+    def _pump(self):
+        seq, born = 0, time.monotonic()
+        while not self.closed.wait(self.st.cfg.tick_ms / 1e3):
+            if self.st.cfg.drop_every and time.monotonic() - born > self.st.cfg.drop_every:
+                return self.kill()
+            seq += 1
+            try:
+                for (et, tok), mode in list(self.subs.items()):
+                    self._send(0x2, packet(mode, et, tok, seq, self.st.price(tok)))
+                    self.st.stats["packets"] += 1
+            except OSError:
+                return self.kill()
+
+    def kill(self):
+        self.closed.set()
+        try: self.request.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+
+    def _control(self, msg: dict):
+        p = msg.get("params") or {}
+        for tl in p.get("tokenList") or []:
+            for tok in tl.get("tokens") or []:
+                k = (int(tl["exchangeType"]), str(tok))
+                if msg.get("action") == 1:
+                    self.subs[k] = max(self.subs.get(k, 0), int(p.get("mode") or 1)); self.st.stats["subscribes"] += 1
+                else:
+                    self.subs.pop(k, None)
+
+    def handle(self):
+        try:
+            if not self._handshake(): return
+        except ConnectionError:
+            return
+        self.st.stats["connections"] += 1; self.st.conns.add(self)
+        threading.Thread(target=self._pump, daemon=True).start()
+        try:
+            while not self.closed.is_set():
+                b0, b1 = self._read(2)
+                n = b1 & 0x7F
+                if n == 126: n = struct.unpack(">H", self._read(2))[0]
+                elif n == 127: n = struct.unpack(">Q", self._read(8))[0]
+                mask = self._read(4) if b1 & 0x80 else b"\0\0\0\0"
+                data = bytes(c ^ mask[i % 4] for i, c in enumerate(self._read(n)))
+                op = b0 & 0x0F
+                if op == 0x8: self._send(0x8, data[:2]); break
+                if op == 0x9: self._send(0xA, data)
+                elif op == 0x1:
+                    if data == b"ping": self._send(0x1, b"pong")
+                    else:
+                        try: self._control(json.loads(data))
+                        except ValueError: pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.closed.set(); self.st.conns.discard(self)
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = allow_reuse_address = True
+
+    def kill_clients(self):
+        for h in list(self.state.conns): h.kill()
+
+def start(cfg: FeedConfig = FeedConfig()) -> Tuple[_Server, str]:
+    """Serve in a daemon thread; returns (server, ws:// URL for MarketData(url=...))."""
+    srv = _Server((cfg.host, cfg.port), _Handler); srv.state = _State(cfg)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"ws://{cfg.host}:{srv.server_address[1]}/smart-stream"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8798)
+    ap.add_argument("--tick-ms", type=float, default=50.0)
+    ap.add_argument("--drop-every", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=7)
+    a = ap.parse_args()
+    srv, url = start(FeedConfig(a.host, a.port, a.tick_ms, a.drop_every, a.seed))
+    print(json.dumps({"event": "mock_feed_up", "url": url}), flush=True)
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+        print(json.dumps({"event": "mock_feed_down", "stats": srv.state.stats}), flush=True)
+
+if __name__ == "__main__":
+    main()
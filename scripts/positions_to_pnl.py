@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, json, time
+import os, sys, json, time
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 ROOT = Path.home() / "angel-one-smart-bot"
 DATA = ROOT / "data"
 DATA.mkdir(parents=True, exist_ok=True)
@@ -25,6 +27,13 @@ except Exception:
         def _send(*a, **k): return False
 send = _send
 
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
+from core.positions import book
 
 def smart_connect():
     try:
@@ -33,47 +42,29 @@ def smart_connect():
         from smartapi import SmartConnect
     return SmartConnect
 
+def login():
+    import pyotp
+    cid  = os.getenv("CLIENT_CODE")
+    akey = os.getenv("API_KEY")
+    mpin = os.getenv("MPIN")
+    tsec = os.getenv("TOTP_SECRET")
+    if not all([cid, akey, mpin, tsec]):
+        return None
+
+    otp = pyotp.TOTP(tsec).now()
+    api = smart_connect()(api_key=akey)
+    api.generateSession(cid, mpin, otp)
+    return api
+
 def fetch_positions_pnl() -> float | None:
-    SC = smart_connect()
     try:
-        import pyotp
-        cid  = os.getenv("CLIENT_CODE")
-        akey = os.getenv("API_KEY")
-        mpin = os.getenv("MPIN")
-        tsec = os.getenv("TOTP_SECRET")
-        if not all([cid, akey, mpin, tsec]):
+        api = shared_api() or login()
+        if api is None:
             return None
 
-        otp = pyotp.TOTP(tsec).now()
-        api = SC(api_key=akey)
-        api.generateSession(cid, mpin, otp)
-
-        # Try common method names for positions
-        for fn in ("getPositions", "getPosition", "positions", "position"):
-            f = getattr(api, fn, None)
-            if not callable(f):
-                continue
-            resp = f()
-            data = resp.get("data") if isinstance(resp, dict) else resp
-            total = 0.0
-            found = False
-            if isinstance(data, (list, tuple)):
-                for p in data:
-                    if not isinstance(p, dict):
-                        continue
-                    for k in ("pnl","netpnl","NetPnL","unrealized","unrealised","unrealizedPnL"):
-                        if k in p:
-                            try:
-                                total += float(p[k])
-                                found = True
-                                break
-                            except Exception:
-                                pass
-            if found:
-                return float(total)
+        return book(api).pnl()
     except Exception:
         return None
-    return None
 
 def main():
     pnl = fetch_positions_pnl()
@@ -1,25 +1,31 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import csv, json, re
+import csv, json, re, sys
 from pathlib import Path
 
-ROOT = Path.home()/ "angel-one-smart-bot"
-DATA = ROOT/ "data"
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+
+sys.path.insert(0, str(ROOT))
+from core.symbol_search import EXCH_PREF, search
+
+EXCHANGES = ("NSE", "NFO")   # the exchanges the baseline per-exchange CSVs covered
 
 def scan(files, patterns):
+    """Original CSV scan, kept for existing callers: patterns are (label, regex) pairs.
+    New code should use scan_index(), which reads the offline symbol index instead."""
     picks = []
     for fp in files:
-        if not fp.exists(): 
+        if not fp.exists():
             continue
         with fp.open() as f:
-            r = csv.DictReader(f)
-            for row in r:
+            for row in csv.DictReader(f):
                 name = (row.get("name") or row.get("symbol") or "").strip()
                 sym  = (row.get("symbol") or row.get("tradingsymbol") or "").strip()
                 exch = (row.get("exchange") or "").strip()
                 tok  = (row.get("symboltoken") or row.get("token") or "").strip()
                 text = f"{name} {sym}".lower()
-                if not tok: 
+                if not tok:
                     continue
                 for label, rx in patterns:
                     if rx.search(text):
@@ -32,18 +38,30 @@ def scan(files, patterns):
     picks.sort(key=lambda x: (-x["score"], x["exchange"], x["name"]))
     return picks[:10]
 
+def scan_index(patterns):
+    """patterns are (label, search seed, regex): seed each label from the offline
+    symbol index (core.symbol_search), then keep the regex as the final filter."""
+    picks = []
+    for label, seed, rx in patterns:
+        for r in search(seed, EXCHANGES, limit=50):
+            text = f"{r['name']} {r['symbol']}".lower()
+            if not rx.search(text):
+                continue
+            score = 0
+            if "index" in text or r["instrumenttype"] in ("INDEX", "AMXIDX"): score += 2
+            if "nifty" in text: score += 1
+            if "bank"  in text: score += 1
+            if r["exchange"] in ("NSE_INDICES","INDICES"): score += 1
+            picks.append({"label":label,"exchange":r["exchange"],"token":r["token"],"symbol":r["symbol"],"name":r["name"],"score":score,"file":"index"})
+    picks.sort(key=lambda x: (-x["score"], EXCH_PREF.get(x["exchange"], 99), x["name"]))
+    return picks[:10]
+
 def main():
-    files = [
-        DATA/"instruments_NSE_INDICES.csv",
-        DATA/"instruments_INDICES.csv",
-        DATA/"instruments_NSE.csv",
-        DATA/"instruments_NFO.csv",
-    ]
     patterns = [
-        ("NIFTY_50", re.compile(r"\bnifty\b.*\b50\b|\bnifty50\b")),
-        ("NIFTY_BANK", re.compile(r"\bnifty\b.*\bbank\b|\bbanknifty\b")),
+        ("NIFTY_50", "nifty 50", re.compile(r"\bnifty\b.*\b50\b|\bnifty50\b")),
+        ("NIFTY_BANK", "nifty bank", re.compile(r"\bnifty\b.*\bbank\b|\bbanknifty\b")),
     ]
-    out = scan(files, patterns)
+    out = scan_index(patterns)
     print(json.dumps({"candidates": out}, ensure_ascii=False))
 
 if __name__ == "__main__":
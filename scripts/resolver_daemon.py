@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Long-lived token resolver on a local Unix socket (data/resolver.sock).
+
+One JSON object per line in, one per line out, connections may be reused:
+  {"queries": [{"ts": "NIFTY..CE"}, {"symbol": "NIFTY", "expiry": "W", "strike": 24500, "opt": "CE", "nearest": true}]}
+    -> {"results": [...], "latency_us": [...], "total_us": N}
+  {"cmd": "stats"} -> query count and per-query latency percentiles since start
+
+auto_token_resolver.py (and bin/resolve_token) use it automatically when the socket exists.
+"""
+from __future__ import annotations
+import argparse, json, os, signal, socketserver, sys, threading, time
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from scripts.auto_token_resolver import SOCK, ensure_csv, resolve
+from core.token_map import TM
+from core.symbol_search import SI
+
+LAT = deque(maxlen=10000)
+COUNT = [0]
+# one thread per connection (clients keep theirs open), but TM/SI load and
+# overlay lazily and aren't thread-safe: requests are answered one at a time
+LOCK = threading.Lock()
+
+def stats() -> dict:
+    xs = sorted(LAT)
+    pct = lambda p: xs[min(len(xs)-1, int(p*len(xs)))] if xs else None
+    return {"queries": COUNT[0], "p50_us": pct(0.50), "p90_us": pct(0.90), "p99_us": pct(0.99), "max_us": xs[-1] if xs else None}
+
+def handle(req: dict) -> dict:
+    if not isinstance(req, dict):
+        return {"error": f"bad request: expected a JSON object, got {type(req).__name__}"}
+    if req.get("cmd") == "stats":
+        return stats()
+    qs = req.get("queries") or []
+    if not isinstance(qs, list):
+        return {"error": f"bad request: queries must be a list, got {type(qs).__name__}"}
+    t0 = time.perf_counter_ns()
+    results, lat = [], []
+    for q in qs:
+        t = time.perf_counter_ns()
+        try:
+            results.append(resolve(q))
+        except Exception as e:
+            results.append({"error": f"{type(e).__name__}: {e}"})
+        us = (time.perf_counter_ns() - t) // 1000
+        lat.append(us); LAT.append(us); COUNT[0] += 1
+    return {"results": results, "latency_us": lat, "total_us": (time.perf_counter_ns() - t0) // 1000}
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                with LOCK: out = handle(req)
+            except ValueError as e:
+                out = {"error": f"bad request: {e}"}
+            self.wfile.write((json.dumps(out, ensure_ascii=False) + "\n").encode()); self.wfile.flush()
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def _term(*a):
+    raise KeyboardInterrupt
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sock", type=Path, default=SOCK)
+    ap.add_argument("--max-age-hours", type=int, default=18)
+    args = ap.parse_args()
+
+    ensure_csv(args.max_age_hours)
+    TM.ensure_loaded(); SI.ensure_built()   # warm before accepting queries
+    args.sock.unlink(missing_ok=True)
+    srv = Server(str(args.sock), Handler)
+    signal.signal(signal.SIGTERM, _term)
+    print(json.dumps({"event": "resolver_up", "sock": str(args.sock), "pid": os.getpid()}), flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close(); args.sock.unlink(missing_ok=True)
+        print(json.dumps({"event": "resolver_down", **stats()}), flush=True)
+
+if __name__ == "__main__":
+    main()
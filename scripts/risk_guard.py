@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, json, time, traceback
+import os, sys, json, time, traceback
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 # env
 try:
     from dotenv import load_dotenv
@@ -20,6 +22,13 @@ except Exception:
         def _send(*a, **k): return False
 send = _send
 
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
+from core.positions import book
 
 ROOT = Path.home()/ "angel-one-smart-bot"
 ENVF = ROOT/".env"
@@ -55,7 +64,8 @@ def get_pnl() -> float | None:
         except Exception:
             return None
 
-    # 1) try SmartAPI positions
+    # 1) try SmartAPI positions (shared session first, own login otherwise)
+    api = shared_api()
     SmartConnect = None
     try:
         from SmartApi import SmartConnect as _S
@@ -67,34 +77,19 @@ def get_pnl() -> float | None:
         except Exception:
             SmartConnect = None
 
-    if SmartConnect:
+    if api or SmartConnect:
         try:
-            import pyotp
             cid=os.getenv("CLIENT_CODE"); akey=os.getenv("API_KEY")
             mpin=os.getenv("MPIN"); tsec=os.getenv("TOTP_SECRET")
-            if all([cid, akey, mpin, tsec]):
+            if api is None and all([cid, akey, mpin, tsec]):
+                import pyotp
                 otp = pyotp.TOTP(tsec).now()
                 api = SmartConnect(api_key=akey)
                 api.generateSession(cid, mpin, otp)
-                # positions endpoint name varies; try common ones:
-                for fn in ("position", "positions", "getPosition", "getPositions"):
-                    f = getattr(api, fn, None)
-                    if callable(f):
-                        resp = f()
-                        data = resp.get("data") if isinstance(resp, dict) else resp
-                        total = 0.0; found=False
-                        if isinstance(data, (list, tuple)):
-                            for p in data:
-                                if not isinstance(p, dict): continue
-                                for k in ("pnl","unrealized","unrealised","unrealizedPnL","netPnL","netpnl","NetPnL"):
-                                    if k in p:
-                                        try:
-                                            total += float(p[k]); found=True
-                                            break
-                                        except Exception:
-                                            pass
-                        if found:
-                            return float(total)
+            if api is not None:
+                pnl = book(api).pnl()     # normalized rows; None when no row carries a pnl
+                if pnl is not None:
+                    return pnl
         except Exception:
             pass
 
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, json
+import os, sys, json
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from core.positions import book
+
 ROOT = Path.home() / "angel-one-smart-bot"
 
 # --- env ---
@@ -67,19 +70,10 @@ def main() -> int:
         print(json.dumps({"event":"square_off_fail","stage":"login","err":str(e)}), flush=True)
         return 1
 
-    # Pull positions
-    positions = None
+    # Pull positions (normalized rows, fetched fresh: we're about to trade on them)
     try:
-        for fn in ("getPositions","getPosition","positions","position"):
-            f = getattr(api, fn, None)
-            if callable(f):
-                resp = f()
-                positions = resp.get("data") if isinstance(resp, dict) else resp
-                break
+        positions = book(api).open(fresh=True)
     except Exception:
-        positions = None
-
-    if not isinstance(positions, (list, tuple)):
         send("⚠️ Square-Off: positions fetch failed.")
         print(json.dumps({"event":"square_off_fail","reason":"no_positions"}), flush=True)
         return 1
@@ -87,23 +81,9 @@ def main() -> int:
     # Attempt exit for any open qty
     exits = 0
     for p in positions:
-        if not isinstance(p, dict):
-            continue
-
-        # net quantity detection
-        qty = None
-        for qk in ("netqty","netQty","net_quantity","netQuantity"):
-            if qk in p:
-                try:
-                    qty = int(float(p[qk]))
-                    break
-                except Exception:
-                    pass
-        if not qty:
-            continue
-
-        tradingsymbol = p.get("tradingsymbol") or p.get("tsym") or p.get("symbol")
-        exch = p.get("exchange") or p.get("exch") or "NFO"
+        qty = p.netqty
+        tradingsymbol = p.tradingsymbol
+        exch = p.exchange or "NFO"
 
         try:
             # Try built-ins first
@@ -130,11 +110,11 @@ def main() -> int:
                         placevar = {
                             "variety": "NORMAL",
                             "tradingsymbol": tradingsymbol,
-                            "symboltoken": p.get("symboltoken") or p.get("token"),
+                            "symboltoken": p.token or None,
                             "transactiontype": side,
                             "exchange": exch,
                             "ordertype": "MARKET",
-                            "producttype": p.get("producttype") or p.get("product") or "INTRADAY",
+                            "producttype": p.product or "INTRADAY",
                             "duration": "DAY",
                             "price": "0",
                             "squareoff": "0",
@@ -1,4 +1,15 @@
-import os, sys
+import os, sys, asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
+from core.positions import Pos, book
 
 def env(k, d=""):
     v = os.getenv(k, "").strip()
@@ -11,6 +22,13 @@ def need(k):
     return v
 
 def login():
+    if env("PAPER", "0") == "1":
+        # squares off the DRY paper book (core.paper_broker); no order reaches the exchange
+        from core.paper_broker import paper_broker, STATE
+        return paper_broker(md=shared_api(), state=STATE)
+    api = shared_api()
+    if api is not None:
+        return api
     from SmartApi import SmartConnect
     import pyotp
     sc = SmartConnect(api_key=need("SMARTAPI_API_KEY"))
@@ -18,40 +36,15 @@ def login():
     sc.generateSession(need("SMARTAPI_CLIENT_CODE"), need("SMARTAPI_PASSWORD"), otp)
     return sc
 
-def fetch_positions(sc):
-    for fn in ("position", "getPosition"):
-        if hasattr(sc, fn):
-            try:
-                out = getattr(sc, fn)()
-                data = (out or {}).get("data") or []
-                if isinstance(data, dict):
-                    data = data.get("net") or data.get("positiondata") or []
-                return data or []
-            except Exception:
-                pass
-    return []
-
-def qty_of(row):
-    for k in ("netqty", "netQty", "net_quantity", "netquantity"):
-        if k in row:
-            try:
-                return int(float(str(row[k]).strip()))
-            except:
-                pass
-    return 0
-
-def squareoff_one(sc, row):
-    q = qty_of(row)
+async def squareoff_one(api, row: Pos):
+    q = row.netqty
     if q == 0:
         return "skip: flat"
 
-    prod = (row.get("producttype") or row.get("product") or "").upper()
-    if prod != "INTRADAY":
-        return "skip: product=%s" % (row.get("producttype") or row.get("product") or "")
+    if row.product != "INTRADAY":
+        return "skip: product=%s" % row.product
 
-    ts = row.get("tradingsymbol") or row.get("symbolname") or ""
-    ex = row.get("exchange") or "NSE"
-    tok = str(row.get("symboltoken") or row.get("symbol_token") or "").strip()
+    ts, ex, tok = row.tradingsymbol, row.exchange or "NSE", row.token.strip()
 
     side = "SELL" if q > 0 else "BUY"
     qty = str(abs(q))
@@ -69,12 +62,18 @@ def squareoff_one(sc, row):
         "quantity": qty,
     }
     try:
-        resp = sc.placeOrder(order)
-        oid = (resp or {}).get("data", {}).get("orderid") if isinstance(resp, dict) else None
+        resp = await api.placeOrder(order)
+        oid = (resp or {}).get("data", {}).get("orderid") if isinstance(resp, dict) else resp   # SmartConnect returns the id
         return "ok: %s %s x%s -> %s" % (order["transactiontype"], ts, qty, oid)
     except Exception as e:
         return "err: %s %s x%s -> %s" % (order["transactiontype"], ts, qty, e)
 
+async def squareoff_rows(sc, rows):
+    """All exits at once (bounded, rate-limited) instead of one order after another."""
+    from core.async_client import AsyncSmart
+    async with AsyncSmart(sc) as api:
+        return await asyncio.gather(*(squareoff_one(api, r) for r in rows))
+
 def main():
     if env("SQUAREOFF_ON_KILL", "0") != "1":
         print("[i] SQUAREOFF_ON_KILL=0; exit")
@@ -84,13 +83,16 @@ def main():
         return 0
 
     sc = login()
-    rows = fetch_positions(sc)
+    try:
+        rows = book(sc).positions(fresh=True)   # about to trade on it: no TTL-old book
+    except Exception:
+        rows = []
     any_act = False
-    for r in rows:
-        msg = squareoff_one(sc, r)
+    for msg in asyncio.run(squareoff_rows(sc, rows)):
         if not msg.startswith("skip"):
             any_act = True
         print(msg)
+    if hasattr(sc, "save"): sc.save()
 
     try:
         if hasattr(sc, "logout"):
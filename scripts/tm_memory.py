@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+RSS of a typical cron-spawned process (resolve the ATM weekly option and the
+spot index token) with the full instrument map vs a TM_UNIVERSE subset.
+Each mode runs in a fresh interpreter; snapshots are prebuilt first so only
+steady-state cost is measured.
+
+  python scripts/tm_memory.py ["NIFTY,BANKNIFTY@2"]
+"""
+from __future__ import annotations
+import json, os, subprocess, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = r"""
+import json, resource, sys
+def rss():
+    for ln in open("/proc/self/status"):
+        if ln.startswith("VmRSS"): return round(int(ln.split()[1]) / 1024, 1)
+out = {"start_mb": rss()}
+from core.token_map import TM
+from core.symbol_search import index_token
+from scripts.auto_token_resolver import resolve
+from scripts.expiry_calc import compute_weekly_expiry
+out["import_mb"] = rss()
+TM.ensure_loaded(); out["load_mb"] = rss()
+exp = compute_weekly_expiry("NIFTY", 0).isoformat()
+out["atm"] = resolve({"symbol": "NIFTY", "expiry": exp, "strike": 24500, "opt": "CE", "nearest": True}).get("tradingsymbol")
+out["spot"] = index_token("NIFTY 50", ("NSE",))
+out["work_mb"] = rss()
+out["peak_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+out["snap_bytes"] = TM.snap_path.stat().st_size
+out["full_opened"] = TM._full is not None and TM._full.snap is not None
+print(json.dumps(out))
+"""
+
+def run(universe: str) -> dict:
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "TM_UNIVERSE": universe}
+    p = subprocess.run([sys.executable, "-c", PROBE], env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(p.stdout)
+
+def main():
+    spec = sys.argv[1] if len(sys.argv) > 1 else "NIFTY,BANKNIFTY@2"
+    for u in ("", spec):   # warm: build both snapshots outside the measured runs
+        subprocess.run([sys.executable, "-m", "core.token_map"], env={**os.environ, "TM_UNIVERSE": u}, cwd=ROOT, check=True,
+                       capture_output=True)
+    full, lite = run(""), run(spec)
+    print(json.dumps({"full": full, "universe": {"spec": spec, **lite},
+                      "saved_mb": round(full["peak_mb"] - lite["peak_mb"], 1)}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,14 @@ import os
 import sys
 import time
 import json
-import random
 import signal
 import argparse
 from datetime import datetime, time as dtime, timedelta, timezone
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 import pyotp
 from SmartApi.smartConnect import SmartConnect
-from SmartApi.smartExceptions import DataException
 
 ap = argparse.ArgumentParser(description="Target + BE + Trailing SL watcher (Angel One SmartAPI).")
 ap.add_argument("--ex", default="NFO")
@@ -26,6 +26,10 @@ ap.add_argument("--breakeven", type=float, required=True)
 ap.add_argument("--entry", type=float, required=True)
 ap.add_argument("--poll", type=float, default=0.8, help="LTP poll seconds")
 ap.add_argument("--eod", default="15:18", help="EOD cutoff IST, e.g. 15:18")
+ap.add_argument("--paper", action="store_true", default=os.getenv("PAPER") == "1",
+                help="orders go to core.paper_broker (prices still live); PAPER=1 in env does the same")
+ap.add_argument("--no-feed", dest="feed", action="store_false", default=os.getenv("AO_FEED", "1") != "0",
+                help="poll LTP over REST instead of the streaming feed (core.market_data); AO_FEED=0 does the same")
 args = ap.parse_args()
 
 # --- IST timezone (Angel One market hours) ---
@@ -35,45 +39,42 @@ try:
 except Exception:
     IST = timezone(timedelta(hours=5, minutes=30))
 
-# --- Rate-limit tolerant helpers (Angel One API) ---
-RL = (
-    "Access denied because of exceeding access rate",
-    "Too many requests",
-    "Request rate limit exceeded",
-)
-def _rl(msg: str) -> bool:
-    m = (msg or "").lower()
-    return any(e.lower() in m for e in RL) or "couldn't parse the json" in m
+# --- Retry / circuit-breaker / hedged-read policy shared with every SmartAPI caller ---
+from core.retry import call as backoff
 
-def backoff(fn, tries=6, base=0.6, cap=5.0):
-    last = None
-    for i in range(tries):
-        try:
-            return fn()
-        except DataException as e:
-            last = e
-            if not _rl(str(e)):
-                raise
-        except Exception as e:
-            last = e
-        time.sleep(min(cap, base*(2**i)) + random.uniform(0, 0.35))
-    raise last or RuntimeError("retry exhausted")
+# --- SmartAPI login (Angel One guideline); shared broker session if it's up ---
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
 
-# --- SmartAPI login (Angel One guideline) ---
 API = os.environ.get("SMARTAPI_API_KEY")
 CID = os.environ.get("SMARTAPI_CLIENT_CODE")
 PWD = os.environ.get("SMARTAPI_PASSWORD")
 TOTP = os.environ.get("TOTP_SECRET")
-if not all([API, CID, PWD, TOTP]):
-    print(json.dumps({"error":"Missing env SMARTAPI_API_KEY/SMARTAPI_CLIENT_CODE/SMARTAPI_PASSWORD/TOTP_SECRET"}))
-    sys.exit(2)
+sc = shared_api()
+raw = None     # own SmartConnect login, if any (its tokens also open the feed)
+if sc is None:
+    if not all([API, CID, PWD, TOTP]):
+        print(json.dumps({"error":"Missing env SMARTAPI_API_KEY/SMARTAPI_CLIENT_CODE/SMARTAPI_PASSWORD/TOTP_SECRET"}))
+        sys.exit(2)
 
-sc = SmartConnect(API)
-otp = pyotp.TOTP(TOTP).now()
-login = sc.generateSession(CID, PWD, otp)
-if not login or not login.get("status"):
-    print(json.dumps({"error":"SmartAPI login failed","resp":login}, ensure_ascii=False))
-    sys.exit(2)
+    try:
+        from core.transport import install   # keep-alive pool: no TCP/TLS handshake per LTP poll
+        install()
+    except Exception:
+        pass
+    sc = raw = SmartConnect(API)
+    otp = pyotp.TOTP(TOTP).now()
+    login = sc.generateSession(CID, PWD, otp)
+    if not login or not login.get("status"):
+        print(json.dumps({"error":"SmartAPI login failed","resp":login}, ensure_ascii=False))
+        sys.exit(2)
+    try:
+        from core.ratelimit import limited   # LTP polling yields to order calls account-wide
+        sc = limited(sc)
+    except Exception:
+        pass
 
 # --- Args → locals ---
 EX, TS, TOK, QTY = args.ex, args.ts, args.tok, int(args.qty)
@@ -82,16 +83,40 @@ TRAIL_ABOVE   = float(args.trail_above)
 TRAIL_GAP     = float(args.trail_gap)
 BREAK_EVEN_AT = float(args.breakeven)
 ENTRY_PRICE   = float(args.entry)
+
+if args.paper:
+    from core.paper_broker import paper_broker, STATE
+    sc = paper_broker(md=sc, state=STATE)
+    if not any(p["symboltoken"] == str(TOK) and int(p["netqty"]) for p in sc.position()["data"] or []):
+        sc.seed(EX, TS, TOK, QTY, ENTRY_PRICE)   # the position this watcher manages, if the book doesn't have it
+
 POLL_S        = float(args.poll)
 hh, mm = map(int, args.eod.split(":"))
 EOD_CUTOFF = dtime(hh, mm)
 
+# --- Streaming LTP: the loop wakes on each tick instead of polling ltpData ---
+# (not opened when a core.quote_table publisher runs on the box: ltp() reads its table through quotes())
+try:
+    from core.quote_table import reader
+    QT = reader()
+    if QT is not None: QT.want(EX, TOK)
+except Exception:
+    QT = None
+MD = None
+if args.feed and QT is None:
+    try:
+        from core.market_data import market_data, creds_of, default_creds
+        MD = market_data(creds=creds_of(raw) if raw is not None else default_creds).watch(EX, [TOK]).start()
+    except Exception as e:
+        print("feed off, polling:", e)
+        MD = None
+
 # --- Thin wrappers (Angel One-compliant fields) ---
 def order_book():
-    return backoff(lambda: sc.orderBook()).get("data", [])
+    return backoff("orderBook", sc.orderBook).get("data", [])
 
 def cancel_sl(oid: str):
-    return backoff(lambda: sc.cancelOrder("STOPLOSS", oid))
+    return backoff("cancelOrder", sc.cancelOrder, oid, "STOPLOSS")
 
 def modify_sl(oid: str, price: float, trigger: float):
     params = {
@@ -108,7 +133,7 @@ def modify_sl(oid: str, price: float, trigger: float):
         "duration": "DAY",
         "transactiontype": "SELL",
     }
-    return backoff(lambda: sc.modifyOrder("STOPLOSS", oid, params))
+    return backoff("modifyOrder", sc.modifyOrder, params)
 
 def place_sl(price: float, trigger: float):
     order = {
@@ -124,7 +149,7 @@ def place_sl(price: float, trigger: float):
         "price": round(price, 2),
         "triggerprice": round(trigger, 2),
     }
-    return backoff(lambda: sc.placeOrder(order))
+    return backoff("placeOrder", sc.placeOrder, order)
 
 def sell_mkt():
     order = {
@@ -138,7 +163,7 @@ def sell_mkt():
         "duration":"DAY",
         "quantity":QTY,
     }
-    return backoff(lambda: sc.placeOrder(order))
+    return backoff("placeOrder", sc.placeOrder, order)
 
 def current_sl():
     for o in order_book():
@@ -147,8 +172,16 @@ def current_sl():
     return None
 
 def ltp():
+    px = MD.ltp(EX, TOK, max_age=5.0) if MD is not None else None
+    if px is not None:
+        return px
+    try:
+        from core.quotes import quotes   # coalesced getMarketData shared with other in-process pollers
+        return quotes(sc).ltp(EX, TOK)
+    except Exception:
+        pass
     try:
-        q = sc.ltpData(EX, TS, TOK)
+        q = backoff("ltpData", sc.ltpData, EX, TS, TOK, tries=2)
         if q and q.get("status"):
             return float(q["data"]["ltp"])
     except Exception:
@@ -180,6 +213,7 @@ while running:
         now_ist = datetime.now(IST).time()
         px = ltp()
         print("LTP:", px)
+        if args.paper: sc.on_tick(EX, TOK, px)   # feed/table prices bypass the paper broker's own reads
 
         # EOD square-off
         if now_ist >= EOD_CUTOFF:
@@ -248,9 +282,15 @@ while running:
                 place_sl(want_lim, want_trig)
                 sl = current_sl()
 
+        if args.paper: sc.save()
     except Exception as e:
         print("loop warn:", e)
 
-    time.sleep(POLL_S)
+    if MD is not None and MD.connected():
+        MD.wait(EX, TOK, POLL_S)     # next tick, or POLL_S at the latest
+    else:
+        time.sleep(POLL_S)
 
+if MD is not None: MD.stop()
+if args.paper: sc.save()
 print("Watcher stopped.")
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, json
+import os, sys, json, asyncio
 from pathlib import Path
-from datetime import datetime, timedelta, time as _t
+from datetime import datetime, timedelta
 
 # --- load .env ---
 try:
@@ -11,6 +11,16 @@ try:
 except Exception:
     pass
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# shared SmartAPI session (core.session_broker) when it's running
+try:
+    from core.session_broker import shared_api
+except Exception:
+    def shared_api(): return None
+
+from core.mode import market_window_ist
+
 def smart_connect():
     try:
         from SmartApi import SmartConnect
@@ -22,28 +32,44 @@ def ist_now() -> datetime:
     # Termux is already IST per your setup; if not, adjust here.
     return datetime.now()
 
-def market_window_ist(now: datetime, minutes_back: int):
+async def candles_by_exchange(api, exchanges: list, params: dict) -> list:
+    from core.async_client import AsyncSmart
+    async with AsyncSmart(api) as aio:
+        return await aio.gather([aio.getCandleData({"exchange": ex, **params}) for ex in exchanges])
+
+def local_candles(exch: str, token: str, interval: str, start_s: str, end_s: str) -> list:
     """
-    Clamp from/to to the latest valid market window:
-    09:15 to 15:30 IST for cash/indices.
+    Candles already on disk (core.candle_store: earlier fetches, or bars core.bars
+    built from the feed) when their coverage spans the window -- all but its last
+    interval, which the feed may not have closed yet -- else [].
     """
-    d = now.date()
-    start_day = datetime.combine(d, _t(9, 15))
-    end_day   = datetime.combine(d, _t(15, 30))
-    if now < start_day:
-        # before open -> use previous session (simple: previous calendar day)
-        prev = now - timedelta(days=1)
-        d = prev.date()
-        start_day = datetime.combine(d, _t(9, 15))
-        end_day   = datetime.combine(d, _t(15, 30))
-    elif now > end_day:
-        # after close -> cap to 15:30
-        pass
-    # default: within session; cap end to min(now, 15:30)
-    end_ts = min(now, end_day)
-    start_ts = max(start_day, end_ts - timedelta(minutes=minutes_back))
-    # SmartAPI expects "YYYY-mm-dd HH:MM"
-    return start_ts.strftime("%Y-%m-%d %H:%M"), end_ts.strftime("%Y-%m-%d %H:%M")
+    from core.candle_store import SECS, STORE
+    if interval not in SECS:
+        return []
+    upto = datetime.strptime(end_s, "%Y-%m-%d %H:%M") - timedelta(seconds=SECS[interval])
+    if STORE.plan(exch, token, interval, start_s, max(upto, datetime.strptime(start_s, "%Y-%m-%d %H:%M")), now=ist_now()):
+        return []
+    key = lambda r: str(r[0])[:16].replace("T", " ")
+    rows = [r for r in STORE.read(exch, token, interval, start_s, end_s) if start_s <= key(r) < end_s]
+    return rows if len(rows) >= int(os.getenv("TREND_MIN_BARS", "15")) else []
+
+def login():
+    # shared broker session if it's up
+    api = shared_api()
+    if api is None:
+        cid  = os.getenv("CLIENT_CODE")
+        akey = os.getenv("API_KEY")
+        mpin = os.getenv("MPIN")
+        tsec = os.getenv("TOTP_SECRET")
+        if not all([cid, akey, mpin, tsec]):
+            raise SystemExit("SmartAPI creds missing in .env")
+
+        SC = smart_connect()
+        import pyotp
+        otp = pyotp.TOTP(tsec).now()
+        api = SC(api_key=akey)
+        api.generateSession(cid, mpin, otp)
+    return api
 
 def fetch_candles():
     # env
@@ -55,43 +81,32 @@ def fetch_candles():
     if not token:
         raise SystemExit("TREND_SYMBOLTOKEN missing in .env")
 
-    cid  = os.getenv("CLIENT_CODE")
-    akey = os.getenv("API_KEY")
-    mpin = os.getenv("MPIN")
-    tsec = os.getenv("TOTP_SECRET")
-    if not all([cid, akey, mpin, tsec]):
-        raise SystemExit("SmartAPI creds missing in .env")
-
-    # login
-    SC = smart_connect()
-    import pyotp
-    otp = pyotp.TOTP(tsec).now()
-    api = SC(api_key=akey)
-    api.generateSession(cid, mpin, otp)
-
     # window
     start_s, end_s = market_window_ist(ist_now(), look_min)
 
-    # try multiple exchanges (helps for indices)
+    # candles on disk first: no login, no API call
+    data = local_candles(exch_env, token, interval, start_s, end_s)
+    if data:
+        return data, {"exchange": exch_env, "from": start_s, "to": end_s, "interval": interval, "source": "local"}
+
+    # candle store: only the part of the window not already on disk is fetched (no login if none)
+    from core.candle_store import STORE
+    api = login() if STORE.plan(exch_env, token, interval, start_s, end_s, now=ist_now()) else None
+    data = STORE.fetch(api, exch_env, token, interval, start_s, end_s, now=ist_now())
+    if len(data) >= int(os.getenv("TREND_MIN_BARS", "15")):
+        return data, {"exchange": exch_env, "from": start_s, "to": end_s, "interval": interval, "source": "store"}
+    api = api or login()
+
+    # try multiple exchanges (helps for indices) -- concurrently, first in this order with data wins
     exchanges = [exch_env, "NSE", "NSE_INDICES", "INDICES", "CDS"]
-    seen = []
-    for ex in exchanges:
-        if not ex or ex in seen: 
+    seen = [ex for ex in dict.fromkeys(exchanges) if ex]
+    for ex, resp in zip(seen, asyncio.run(candles_by_exchange(api, seen, {
+            "symboltoken": token, "interval": interval, "fromdate": start_s, "todate": end_s}))):
+        if isinstance(resp, Exception):
             continue
-        seen.append(ex)
-        try:
-            resp = api.getCandleData({
-                "exchange": ex,
-                "symboltoken": token,
-                "interval": interval,
-                "fromdate": start_s,
-                "todate":   end_s,
-            })
-            data = resp.get("data") if isinstance(resp, dict) else resp
-            if data:
-                return data, {"exchange": ex, "from": start_s, "to": end_s, "interval": interval}
-        except Exception as e:
-            last_err = f"{type(e).__name__}: {e}"
+        data = resp.get("data") if isinstance(resp, dict) else resp
+        if data:
+            return data, {"exchange": ex, "from": start_s, "to": end_s, "interval": interval}
 
     # no data
     meta = {"exchange_tried": seen, "from": start_s, "to": end_s, "interval": interval}
@@ -100,7 +115,7 @@ def fetch_candles():
 def compute_adx(candles, period: int = 14) -> float:
     """
     candles rows from SmartAPI are usually:
-    [time, open, high, low, close, volume]
+    [time, open, high, low, close, volume]  (local bars add oi)
     """
     if len(candles) < period + 1:
         return 0.0
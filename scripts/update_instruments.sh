@@ -13,6 +13,9 @@ else
   PYTHON="$(command -v python3)"
 fi
 
+# project root on sys.path so the refresher can import core.*
+export PYTHONPATH="$ROOT${PYTHONPATH:+:$PYTHONPATH}"
+
 ts() { date "+%Y-%m-%d %H:%M:%S"; }
 
 {
@@ -1,6 +1,8 @@
 """
 Strategy: ATR Breakout
 Desc: Previous high/low + k * ATR breakout with basic volume confirm.
+Inputs: market_data may carry just exchange/token (+ interval); atr, prev_high,
+prev_low, price, volume and avg_volume then come from local bars (core.bars).
 """
 
 # --- compatibility shims for risk API ---
@@ -35,8 +37,21 @@ from core.risk_adapter import load_risk_config, calc_lots
 def _price(md: Dict[str, Any]) -> float:
     return float(md.get("price", 150.0))
 
+def with_bar_inputs(market_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill missing indicator inputs from local bars; explicit keys win."""
+    if "atr" in market_data or not market_data.get("token"):
+        return market_data
+    try:
+        from core.bars import breakout_inputs
+        local = breakout_inputs(market_data.get("exchange", "NSE"), market_data["token"],
+                                market_data.get("interval", "FIVE_MINUTE"))
+    except Exception:
+        return market_data
+    return {**local, **market_data}
+
 def run_strategy(market_data: Dict[str, Any], dry_run: bool = True) -> List[Dict[str, Any]]:
     cfg = load_risk_config()
+    market_data = with_bar_inputs(market_data)
     signals: List[Dict[str, Any]] = []
 
     atr = float(market_data.get("atr", 0.0))
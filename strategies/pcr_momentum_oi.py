@@ -1,5 +1,10 @@
 import os, time
 from scripts.notify import send
+from scripts.expiry_calc import compute_weekly_expiry
+from core.token_map import TM
+from core.symbol_search import index_token
+from core.atm_templates import templates
+from core.quotes import quotes
 from typing import Optional, Tuple
 
 # --- env helpers ---
@@ -13,11 +18,19 @@ EXCH  = env("DERIV_EXCHANGE", "NFO")        # NFO for options
 LOT   = int(env("LOT_NIFTY", "75"))         # adjust if using BANKNIFTY etc.
 MOMENTUM_PCT = float(env("MOMENTUM_PCT", "0.12"))  # 0.12% 1s move
 QTY_LOTS = int(env("QTY_LOTS", "1"))
+ARMED = templates(INDEX, EXCH, lots=QTY_LOTS)  # ATM±2 CE/PE payloads, re-armed per strike bucket
 
 def round_to_50(x: float) -> int:
     return int(round(x/50.0)*50)
 
 def get_index_token(sc, index_symbol: str) -> Optional[str]:
+    # local symbol index first (no API call); searchScrip only if instruments data is missing
+    try:
+        tok = index_token(index_symbol, ("NSE",))
+        if tok:
+            return tok
+    except Exception:
+        pass
     try:
         if hasattr(sc, "searchScrip"):
             r = sc.searchScrip("NSE", index_symbol)
@@ -33,6 +46,12 @@ def get_index_token(sc, index_symbol: str) -> Optional[str]:
     return None
 
 def ltp(sc, exchange: str, tradingsymbol: str, token: Optional[str]) -> Optional[float]:
+    # batched with any concurrent quote requests; per-symbol ltpData if that fails
+    if token and hasattr(sc, "getMarketData"):
+        try:
+            return quotes(sc).ltp(exchange, token)
+        except Exception:
+            pass
     try:
         if hasattr(sc, "ltpData"):
             r = sc.ltpData(exchange=exchange, tradingsymbol=tradingsymbol, symboltoken=(token or ""))
@@ -42,9 +61,26 @@ def ltp(sc, exchange: str, tradingsymbol: str, token: Optional[str]) -> Optional
         return None
     return None
 
+def feed(index_token: Optional[str]):
+    """Process-wide streaming feed watching the index (None when AO_FEED=0 or it can't start)."""
+    if not index_token or env("AO_FEED", "1") == "0":
+        return None
+    try:
+        from core.market_data import market_data
+        return market_data().watch("NSE", [index_token]).start()
+    except Exception:
+        return None
+
 def resolve_atm_option(sc, index_symbol: str, spot: float, opt_type: str) -> Tuple[str, str]:
     strike = round_to_50(spot)
     chosen_ts, chosen_tok = "", ""
+    try:
+        exp = compute_weekly_expiry(index_symbol, 0).strftime("%Y-%m-%d")
+        c = TM.nearest(index_symbol, exp, spot, opt_type, EXCH)
+        if c:
+            return c.tradingsymbol, str(c.token)
+    except Exception:
+        pass
     try:
         if hasattr(sc, "searchScrip"):
             r = sc.searchScrip(EXCH, index_symbol)
@@ -70,9 +106,17 @@ def get_signal(sc):
     Returns an AngelOne placeOrder dict or None.
     """
     idx_tok = get_index_token(sc, INDEX)
-    p1 = ltp(sc, "NSE", INDEX, idx_tok)
-    time.sleep(1.0)
-    p2 = ltp(sc, "NSE", INDEX, idx_tok)
+    md = feed(idx_tok)
+    # streaming: the print ~1s back and the latest one, no wait; REST polling until the feed has history
+    p1 = md.ltp_at("NSE", idx_tok, 1.0) if md else None
+    p2 = md.ltp("NSE", idx_tok, max_age=5.0) if md else None
+    if not (p1 and p2):
+        p1 = ltp(sc, "NSE", INDEX, idx_tok)
+        if p1:
+            try: ARMED.arm(p1)   # pre-arm while waiting for the second print
+            except Exception: pass
+        time.sleep(1.0)
+        p2 = ltp(sc, "NSE", INDEX, idx_tok)
     if not p1 or not p2:
         return None
     chg = (p2 - p1) / p1 * 100.0
@@ -80,6 +124,16 @@ def get_signal(sc):
         return None
 
     opt = "CE" if chg > 0 else "PE"
+    try:
+        ARMED.arm(p2)        # no-op unless p2 crossed into another strike bucket
+        order = ARMED.get(opt)
+    except Exception:
+        order = None
+    if order:
+        order["_meta"] = {"reason": f"momentum {chg:.2f}% on {INDEX}, ATM {opt}", "under": INDEX, "spot": p2}
+        return order
+
+    # not armed (no listed ladder): build it the slow way
     ts_opt, tok_opt = resolve_atm_option(sc, INDEX, p2, opt)
     qty = str(max(1, LOT * QTY_LOTS))
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the repo root is itself a package dir; import core/ and scripts/ the way the scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
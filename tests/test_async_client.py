@@ -0,0 +1,65 @@
+import asyncio, threading, time
+
+import pytest
+
+import core.ratelimit as ratelimit
+import core.retry as retry
+from core.async_client import AsyncSmart
+from core.paper_broker import PaperBroker
+from core.ratelimit import limited
+from core.retry import resilient
+
+class SlowSmart:
+    def __init__(self, delay=0.1):
+        self.delay, self.lock, self.calls, self.live, self.peak = delay, threading.Lock(), [], 0, 0
+
+    def _run(self, ep, out):
+        with self.lock: self.calls.append(ep); self.live += 1; self.peak = max(self.peak, self.live)
+        time.sleep(self.delay)
+        with self.lock: self.live -= 1
+        if isinstance(out, Exception): raise out
+        return out
+
+    def ltpData(self, exchange, tradingsymbol, symboltoken):
+        return self._run("ltpData", {"status": True, "data": {"ltp": float(symboltoken)}})
+
+    def orderBook(self):
+        return self._run("orderBook", ValueError("Invalid token"))
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(retry, "_breakers", {}); monkeypatch.setattr(retry, "_lat", {})
+    tokens = []
+    monkeypatch.setattr(ratelimit, "acquire", lambda ep, **kw: tokens.append(ep) or 0.0)
+    return tokens
+
+def test_calls_run_concurrently_with_one_token_each(_isolated):
+    fake = SlowSmart()
+    async def go():
+        async with AsyncSmart(resilient(limited(fake)), concurrency=4) as api:
+            t0 = time.perf_counter()
+            got = await api.gather([api.ltpData("NFO", "X", str(i)) for i in range(8)])
+            return got, time.perf_counter() - t0
+    got, secs = asyncio.run(go())
+    assert [r["data"]["ltp"] for r in got] == [float(i) for i in range(8)]
+    assert fake.peak == 4 and secs < 0.5                  # two waves of four, not eight in a row
+    assert _isolated == ["ltpData"] * 8 and len(fake.calls) == 8
+
+def test_gather_hands_back_exceptions_in_place():
+    fake = SlowSmart(delay=0)
+    async def go():
+        async with AsyncSmart(fake) as api:
+            return await api.gather([api.ltpData("NFO", "X", "1"), api.orderBook()])
+    ok, err = asyncio.run(go())
+    assert ok["data"]["ltp"] == 1.0 and isinstance(err, ValueError)
+    assert fake.calls.count("orderBook") == 1             # fatal: not retried
+
+def test_paper_broker_is_not_rate_limited(_isolated):
+    pb = PaperBroker()
+    pb.on_tick("NFO", "1", 100.0)
+    async def go():
+        async with AsyncSmart(pb) as api:
+            return await api.placeOrder({"tradingsymbol": "X", "symboltoken": "1", "exchange": "NFO",
+                                         "transactiontype": "BUY", "ordertype": "MARKET", "quantity": 75})
+    oid = asyncio.run(go())
+    assert pb.orders[oid]["status"] == "complete" and _isolated == []
@@ -0,0 +1,53 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from core.atm_templates import AtmTemplates
+from core.instruments import ingest
+from core.token_map import TokenMap
+
+STRIKES = (24400, 24500, 24600, 24700, 24800)
+
+def _exp(days: int) -> str:
+    return (date.today() + timedelta(days=days)).strftime("%d%b%Y").upper()
+
+@pytest.fixture
+def tm(tmp_path, monkeypatch):
+    monkeypatch.delenv("TM_UNIVERSE", raising=False)
+    rows, tok = [], 100
+    for exp in (_exp(3), _exp(10)):
+        for kind in ("CE", "PE"):
+            for s in STRIKES:
+                tok += 1
+                rows.append({"token": str(tok), "symbol": f"NIFTY{exp[:5]}{s}{kind}", "name": "NIFTY", "expiry": exp,
+                             "strike": f"{s * 100}.000000", "lotsize": "75", "instrumenttype": "OPTIDX", "exch_seg": "NFO"})
+    (tmp_path / "master.json").write_text(json.dumps(rows))
+    ingest(str(tmp_path / "master.json"), tmp_path / "instruments.csv", splits=False)
+    return TokenMap(tmp_path / "instruments.csv")
+
+def test_arm_builds_the_window_on_the_next_expiry(tm):
+    t = AtmTemplates("nifty", width=2, lots=2, tm=tm)
+    assert t.arm(24560)
+    assert (t.atm, t.step, t.lo, t.hi) == (24600, 100, 24550, 24650)
+    assert t.expiry.strftime("%d%b%Y").upper() == _exp(3)
+    ce, pe = t.get("CE"), t.get("PE", -2)
+    assert ce["tradingsymbol"].endswith("24600CE") and ce["quantity"] == 150
+    assert pe["tradingsymbol"].endswith("24400PE") and pe["transactiontype"] == "BUY"
+    assert t.get("CE", 3) is None and len(t.orders) == 10
+
+def test_rearms_only_when_spot_leaves_the_bucket(tm):
+    t = AtmTemplates("NIFTY", tm=tm)
+    t.arm(24560)
+    assert not t.arm(24640) and t.rearms == 1
+    assert t.arm(24660) and t.atm == 24700 and t.rearms == 2
+    t.get("CE")["quantity"] = 1
+    assert t.get("CE")["quantity"] == 75             # callers get copies
+
+def test_edge_of_the_ladder_and_zero_width(tm):
+    t = AtmTemplates("NIFTY", width=1, tm=tm)
+    assert t.arm(30000)
+    assert t.atm == 24800 and t.hi == float("inf") and t.lo == 24750
+    assert t.get("CE", 1) is None and t.get("CE", -1)["tradingsymbol"].endswith("24700CE")
+    z = AtmTemplates("NIFTY", width=0, tm=tm)
+    assert z.arm(24500) and (z.lo, z.hi, z.step) == (24450, 24550, 100) and set(z.orders) == {("CE", 0), ("PE", 0)}
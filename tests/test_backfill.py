@@ -0,0 +1,52 @@
+import json
+from datetime import date
+
+import pytest
+
+import core.ratelimit as ratelimit
+import core.retry as retry
+from core.backfill import Backfill, chunks
+from core.candle_store import CandleStore, epoch, stamp
+
+class CandleSmart:
+    def __init__(self, fail=()):
+        self.fail, self.calls = set(fail), []
+
+    def getCandleData(self, p):
+        self.calls.append((p["symboltoken"], p["fromdate"]))
+        if (p["symboltoken"], p["fromdate"]) in self.fail:
+            return {"status": False, "message": "Something Went Wrong", "data": None}
+        t = epoch(p["fromdate"])
+        return {"status": True, "data": [[stamp(t), 1.0, 2.0, 0.5, 1.5, 100], [stamp(t + 60), 1.5, 2.0, 1.0, 1.0, 50]]}
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(retry, "_breakers", {}); monkeypatch.setattr(retry, "_lat", {})
+    monkeypatch.setattr(ratelimit, "acquire", lambda ep, **kw: 0.0)
+
+def test_chunks_are_broker_legal():
+    cs = chunks([("nse", 1)], "ONE_MINUTE", date(2026, 6, 1), date(2026, 7, 31))
+    assert [(c.start, c.end) for c in cs] == [(date(2026, 6, 1), date(2026, 6, 30)), (date(2026, 7, 1), date(2026, 7, 30)),
+                                             (date(2026, 7, 31), date(2026, 7, 31))]
+    assert cs[0].exchange == "NSE" and cs[0].token == "1"
+
+def test_interrupted_run_resumes_with_only_the_failed_chunks(tmp_path):
+    store, state = CandleStore(tmp_path / "candles"), tmp_path / "backfill.state.json"
+    work = chunks([("NSE", "1"), ("NSE", "2")], "ONE_MINUTE", date(2026, 6, 1), date(2026, 7, 31))
+    first = CandleSmart(fail={("2", "2026-07-01 09:15")})
+    out = Backfill(first, store, state, concurrency=3).run(work)
+    assert (out["chunks"], out["calls"], out["failed"], out["candles"]) == (6, 6, 1, 10)
+    st = json.loads(state.read_text())
+    assert len(st["done"]) == 5 and list(st["failed"]) == ["NSE:2:ONE_MINUTE:2026-07-01:2026-07-30"]
+    assert "Something Went Wrong" in st["failed"]["NSE:2:ONE_MINUTE:2026-07-01:2026-07-30"]
+
+    again = CandleSmart()
+    out = Backfill(again, store, state, concurrency=3).run(work)
+    assert again.calls == [("2", "2026-07-01 09:15")]
+    assert (out["skipped"], out["failed"], out["candles"]) == (5, 0, 2)
+    assert json.loads(state.read_text())["failed"] == {}
+    assert len(store.read("NSE", "2", "ONE_MINUTE", "2026-06-01", "2026-07-31")) == 6
+    assert store.gaps("NSE", "2", "ONE_MINUTE", "2026-07-01 09:15", "2026-07-30 15:30") == []
+
+    done = CandleSmart()
+    assert Backfill(done, store, state).run(work)["skipped"] == 6 and done.calls == []
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from core.bars import BarBuilder
+from core.candle_store import CandleStore, epoch
+
+T0 = epoch("2026-07-01 09:15")
+
+def _tick(ts, ltp, volume=0, oi=0, token="1"):
+    return SimpleNamespace(exchange="NSE", token=token, ltp=ltp, ts=ts, volume=volume, oi=oi)
+
+def test_ohlcv_and_close_on_next_bar():
+    out = []
+    bb = BarBuilder(["ONE_MINUTE", "FIVE_MINUTE"], store=None, on_bar=out.append)
+    for i, (px, vol) in enumerate([(10, 100), (12, 130), (9, 150), (11, 160)]):
+        bb.on_tick(_tick(T0 + 10 * i, px, vol, oi=7))
+    bb.on_tick(_tick(T0 + 60, 13, 170))
+    assert [(b.interval, b.open, b.high, b.low, b.close, b.volume, b.oi, b.ticks) for b in out] == \
+           [("ONE_MINUTE", 10, 12, 9, 11, 60, 7, 4)]    # first tick only sets the volume base
+    assert bb.bars("NSE", "1", "FIVE_MINUTE", partial=True)[0].close == 13
+
+def test_flush_closes_quiet_bars_and_late_tick_does_not_reopen():
+    out = []
+    bb = BarBuilder(["ONE_MINUTE"], store=None, on_bar=out.append, grace=2)
+    bb.on_tick(_tick(T0 + 5, 10)); bb.on_tick(_tick(T0 + 30, 11))
+    assert bb.flush(T0 + 61) == 0
+    assert bb.flush(T0 + 62) == 1
+    bb.on_tick(_tick(T0 + 50, 99))                  # belongs to the bar flush() just closed
+    assert bb.stats["late"] == 1 and not bb.bars("NSE", "1", "ONE_MINUTE", partial=True)[1:]
+    bb.on_tick(_tick(T0 + 65, 12))
+    bb.flush(T0 + 200)
+    assert [(b.start, b.close) for b in out] == [(T0, 11), (T0 + 60, 12)]
+
+def test_closed_bars_land_in_the_store(tmp_path):
+    st = CandleStore(tmp_path)
+    bb = BarBuilder(["ONE_MINUTE"], store=st)
+    for m in range(5): bb.on_tick(_tick(T0 + 60 * m + 1, 100 + m))
+    bb.flush(T0 + 400)
+    rows = st.read("NSE", "1", "ONE_MINUTE", "2026-07-01", "2026-07-01")
+    assert [r[4] for r in rows] == [100, 101, 102, 103, 104]
+    assert st.gaps("NSE", "1", "ONE_MINUTE", "2026-07-01 09:15", "2026-07-01 09:20", now="2026-07-02 09:00") == []
@@ -0,0 +1,37 @@
+import multiprocessing as mp
+
+from core.candle_store import APPEND_COMPACT, CandleStore, epoch, stamp
+
+T0 = epoch("2026-07-01 09:15")
+
+def _row(i, px=1.0):
+    return [stamp(T0 + 60 * i), px, px + 1, px - 1, px, 10, 0]
+
+def test_append_side_file_compacts(tmp_path):
+    st = CandleStore(tmp_path)
+    for i in range(APPEND_COMPACT + 3): st.append("NSE", "1", "ONE_MINUTE", _row(i))
+    p = st.path("NSE", "1", "ONE_MINUTE", "2026-07-01")
+    assert p.exists() and p.with_suffix(".app").stat().st_size > 0
+    assert len(st.read("NSE", "1", "ONE_MINUTE", "2026-07-01", "2026-07-01")) == APPEND_COMPACT + 3
+    cols = st.columns("NSE", "1", "ONE_MINUTE", "2026-07-01")      # maps only after folding the side file in
+    assert cols.rows == APPEND_COMPACT + 3 and not p.with_suffix(".app").exists()
+    assert cols.coverage == [(T0, T0 + 60 * (APPEND_COMPACT + 3))]
+
+def test_newer_row_wins(tmp_path):
+    st = CandleStore(tmp_path)
+    st.write("NSE", "1", "ONE_MINUTE", [_row(0, 5.0)])
+    st.append("NSE", "1", "ONE_MINUTE", _row(0, 6.0))
+    assert st.read("NSE", "1", "ONE_MINUTE", "2026-07-01", "2026-07-01")[0][4] == 6.0
+
+def _writer(root, w):
+    st = CandleStore(root)
+    for i in range(w, 120, 4):
+        if i % 10 == 3: st.write("NSE", "1", "ONE_MINUTE", [_row(i)])
+        else: st.append("NSE", "1", "ONE_MINUTE", _row(i))
+
+def test_concurrent_processes_lose_nothing(tmp_path):
+    ps = [mp.Process(target=_writer, args=(tmp_path, w)) for w in range(4)]
+    for p in ps: p.start()
+    for p in ps: p.join()
+    rows = CandleStore(tmp_path).read("NSE", "1", "ONE_MINUTE", "2026-07-01", "2026-07-01")
+    assert [r[0] for r in rows] == [stamp(T0 + 60 * i) for i in range(120)]
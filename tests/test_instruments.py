@@ -0,0 +1,50 @@
+import csv, json
+from datetime import date, timedelta
+
+import pytest
+
+from core.instruments import ingest
+from core.token_map import TokenMap, Universe
+
+def _exp(days: int) -> str:
+    return (date.today() + timedelta(days=days)).strftime("%d%b%Y").upper()
+
+def _opt(tok, strike, exp, lot=75, kind="CE", name="NIFTY"):
+    return {"token": str(tok), "symbol": f"{name}{exp[:5]}{strike}{kind}", "name": name, "expiry": exp,
+            "strike": f"{strike * 100}.000000", "lotsize": str(lot), "instrumenttype": "OPTIDX", "exch_seg": "NFO"}
+
+@pytest.fixture(autouse=True)
+def _no_universe(monkeypatch):
+    monkeypatch.delenv("TM_UNIVERSE", raising=False)
+
+def _ingest(tmp_path, rows, wrap=False):
+    src = tmp_path / "master.json"
+    src.write_text(json.dumps({"data": rows} if wrap else rows))
+    return ingest(str(src), tmp_path / "instruments.csv", splits=False)
+
+def test_ingest_prunes_expired_and_dupes(tmp_path):
+    live, old = _exp(30), _exp(-10)
+    rows = [_opt(1, 24500, live), _opt(1, 24500, live), _opt(2, 24000, old), {"token": "", "symbol": "JUNK"},
+            {"token": "99926000", "symbol": "Nifty 50", "name": "NIFTY", "expiry": "", "strike": "-1.000000",
+             "lotsize": "1", "instrumenttype": "AMXIDX", "exch_seg": "NSE"}]
+    st = _ingest(tmp_path, rows, wrap=True)
+    assert (st["rows_in"], st["rows_out"], st["dupes"], st["expired"]) == (5, 2, 1, 1)
+    with open(tmp_path / "instruments.csv", newline="") as f:
+        toks = [r["token"] for r in csv.DictReader(f)]
+    assert toks == ["1", "99926000"]
+    assert not (tmp_path / "instruments.delta.json").exists()
+
+def test_universe_refresh_still_ships_a_delta(tmp_path, monkeypatch):
+    monkeypatch.setenv("TM_UNIVERSE", "NIFTY@1")
+    near, far = _exp(3), _exp(10)
+    _ingest(tmp_path, [_opt(1, 24500, near), _opt(2, 24600, near), _opt(3, 24500, far), _opt(4, 50000, near, name="BANKNIFTY")])
+    assert not (tmp_path / "instruments.snap").exists()              # only the subset is compiled
+    tm = TokenMap(tmp_path / "instruments.csv", universe=Universe.from_env())
+    assert tm.get_token("NIFTY", near, 24600, "CE") == 2
+    snap = tm.snap
+
+    st = _ingest(tmp_path, [_opt(1, 24500, near), _opt(5, 24700, near), _opt(3, 24500, far), _opt(6, 24600, far),
+                            _opt(4, 50000, near, name="BANKNIFTY"), _opt(7, 50100, near, name="BANKNIFTY")])
+    assert st["delta"] == {"added": 1, "removed": 1, "lot": 0}       # outside the subset is not news
+    assert tm.get_token("NIFTY", near, 24700, "CE") == 5 and tm.snap is snap
+    assert tm.get_token("NIFTY", near, 24600, "CE") is None
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+import threading
+
+from core.market_data import MarketData, Tick
+from scripts.mock_feed import FeedConfig, start
+
+def _until(cond, timeout=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(0.05)
+    return False
+
+def test_tick_of_converts_paise():
+    t = Tick.of({"exchange_type": 2, "token": "43854", "last_traded_price": 12345, "exchange_timestamp": 1782877500000,
+                 "subscription_mode": 2, "volume_trade_for_the_day": 10, "open_price_of_the_day": 12000})
+    assert (t.exchange, t.ltp, t.ts, t.mode, t.volume, t.open) == ("NFO", 123.45, 1782877500.0, 2, 10, 120.0)
+
+def test_push_cache_history_and_wait():
+    md, seen = MarketData(creds=lambda: ("Bearer x", "k", "C", "f")), []
+    md.subscribe(seen.append)
+    md.subscribe(lambda t: 1 / 0)                   # a failing subscriber doesn't stop the others
+    for i, px in enumerate((100.0, 101.0, 102.0)):
+        md.push(Tick("NFO", "1", px, 1000.0 + 10 * i, recv=time.time()))
+    assert [t.ltp for t in seen] == [100.0, 101.0, 102.0] and md.stats["subscriber_errors"] == 3
+    assert md.ltp("nfo", "1", max_age=5) == 102.0 and md.ltp("NFO", "2") is None
+    assert md.ltp_at("NFO", "1", 15) == 100.0 and md.ltp_at("NFO", "1", 60) is None
+    threading.Timer(0.05, md.push, (Tick("NFO", "1", 103.0, 1030.0, recv=time.time()),)).start()
+    assert md.wait("NFO", "1", 2.0).ltp == 103.0
+    assert md.wait("NFO", "1", 0.05) is None
+
+def test_reconnect_resubscribes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)                     # the SDK logs to ./logs/<date>/app.log on import
+    pytest.importorskip("SmartApi")
+    srv, url = start(FeedConfig(tick_ms=20))
+    md = MarketData(creds=lambda: ("Bearer x", "k", "C", "f"), url=url)
+    got = []
+    md.subscribe(got.append)
+    md.watch("NSE", ["99926000"]).watch("NFO", ["43854"], mode="QUOTE")
+    md.start()
+    try:
+        assert _until(lambda: md.ltp("NFO", "43854") is not None and md.ltp("NSE", "99926000") is not None)
+        srv.kill_clients()
+        assert _until(lambda: md.stats["connects"] >= 2)
+        n = len(got)
+        assert _until(lambda: {(t.exchange, t.token) for t in got[n:]} == {("NSE", "99926000"), ("NFO", "43854")})
+        assert md.stats["disconnects"] >= 1 and srv.state.stats["subscribes"] >= 4
+        assert md.tick("NFO", "43854").mode == 2
+    finally:
+        md.stop(); srv.shutdown()
@@ -0,0 +1,72 @@
+from core.paper_broker import PaperBroker
+
+def _order(typ="MARKET", side="BUY", price=0, trigger=0, qty=50, token="101"):
+    return {"tradingsymbol": f"X{token}", "symboltoken": token, "exchange": "NFO", "transactiontype": side,
+            "ordertype": typ, "price": price, "triggerprice": trigger, "quantity": qty, "producttype": "INTRADAY"}
+
+def _status(pb, oid):
+    return pb.orders[oid]["status"]
+
+def test_market_fills_at_last_price_with_slippage():
+    pb = PaperBroker(slippage_bps=10)
+    pb.on_tick("NFO", "101", 100.0)
+    buy, sell = pb.placeOrder(_order()), pb.placeOrder(_order(side="SELL"))
+    assert pb.orders[buy]["averageprice"] == 100.1 and pb.orders[sell]["averageprice"] == 99.9
+    pos = pb.position()["data"][0]
+    assert pos["netqty"] == "0" and pos["buyqty"] == pos["sellqty"] == "50"
+
+def test_limit_rests_until_crossed_and_fills_at_the_better_price():
+    pb = PaperBroker()
+    pb.on_tick("NFO", "101", 100.0)
+    oid = pb.placeOrder(_order("LIMIT", price=98.0))
+    assert _status(pb, oid) == "open"
+    pb.on_tick("NFO", "101", 98.5)
+    assert _status(pb, oid) == "open"
+    pb.on_tick("NFO", "101", 97.0)
+    assert _status(pb, oid) == "complete" and pb.orders[oid]["averageprice"] == 97.0
+
+def test_stoploss_waits_for_trigger_then_fills():
+    pb = PaperBroker(slippage_bps=0)
+    pb.on_tick("NFO", "101", 100.0)
+    sl = pb.placeOrder(_order("STOPLOSS_LIMIT", side="SELL", price=94.0, trigger=95.0))
+    slm = pb.placeOrder(_order("STOPLOSS_MARKET", side="SELL", trigger=95.0))
+    assert _status(pb, sl) == _status(pb, slm) == "trigger pending"
+    pb.on_tick("NFO", "101", 95.0)
+    assert _status(pb, sl) == "complete" and pb.orders[sl]["averageprice"] == 95.0
+    assert _status(pb, slm) == "complete" and pb.orders[slm]["averageprice"] == 95.0
+
+def test_modify_refills_and_cancel_is_final():
+    pb = PaperBroker()
+    pb.on_tick("NFO", "101", 100.0)
+    oid = pb.placeOrder(_order("LIMIT", price=90.0))
+    assert pb.modifyOrder({"orderid": oid, "price": 100.0})["status"]
+    assert _status(pb, oid) == "complete"
+    assert pb.modifyOrder({"orderid": oid, "price": 99.0})["errorcode"] == "AB4007"
+    other = pb.placeOrder(_order("LIMIT", price=90.0))
+    assert pb.cancelOrder(other)["status"] and _status(pb, other) == "cancelled"
+    pb.on_tick("NFO", "101", 80.0)
+    assert _status(pb, other) == "cancelled" and pb.cancelOrder(other)["errorcode"] == "AB4007"
+    assert pb.cancelOrder("nope")["errorcode"] == "AB4006"
+
+def test_invalid_orders_are_rejected():
+    pb = PaperBroker()
+    assert _status(pb, pb.placeOrder(_order(qty=0))) == "rejected"
+    assert _status(pb, pb.placeOrder(_order("LIMIT"))) == "rejected"
+    assert _status(pb, pb.placeOrder(_order("STOPLOSS_MARKET"))) == "rejected"
+
+def test_save_merges_books_of_two_processes(tmp_path):
+    state = tmp_path / "paper_state.json"
+    a, b = PaperBroker(state=state), PaperBroker(state=state)
+    b._pfx = f"{a._pfx[:6]}{int(a._pfx[6:]) + 1:07d}"  # a second process: different pid in the order ids
+    for pb in (a, b): pb.on_tick("NFO", "101", 100.0)
+    filled = a.placeOrder(_order())
+    resting = b.placeOrder(_order("LIMIT", side="SELL", price=120.0))
+    a.save(); b.save()
+    assert set(b.orders) == {filled, resting} and len(b.trades) == 1
+    a.save()
+    assert set(a.orders) == {filled, resting}
+    a.cancelOrder(resting); a.save()
+    b.on_tick("NFO", "101", 125.0)                 # b still holds it open, but the disk says cancelled
+    b.save()
+    assert _status(b, resting) == "cancelled"
+    assert PaperBroker(state=state).position()["data"][0]["netqty"] == "50"
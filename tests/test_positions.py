@@ -0,0 +1,64 @@
+import pytest
+
+from core import positions
+from core.paper_broker import PaperBroker
+from core.positions import Book, book
+from core.risk_adapter import calc_lots
+
+class FakeSmart:
+    def __init__(self):
+        self.calls = {"position": 0, "rmsLimit": 0}
+        self.rows = [{"exchange": "NFO", "symboltoken": "1", "tradingsymbol": "X", "producttype": "INTRADAY",
+                      "netqty": "75", "buyavgprice": "100", "ltp": "110", "pnl": "750"}]
+
+    def position(self):
+        self.calls["position"] += 1
+        return {"status": True, "data": list(self.rows)}
+
+    def rmsLimit(self):
+        self.calls["rmsLimit"] += 1
+        return {"status": True, "data": {"net": "250000.00", "availablecash": "240000"}}
+
+def test_cached_until_ttl_or_invalidation():
+    sc = FakeSmart()
+    b = Book(sc, pos_ttl=60)
+    assert [p.netqty for p in b.open()] == [75] and b.pnl() == 750.0
+    assert sc.calls["position"] == 1
+    b.invalidate()
+    sc.rows[0]["netqty"] = "0"
+    assert b.open() == [] and sc.calls["position"] == 2
+    assert b.balance() == 250000.0 and b.balance() == 250000.0 and sc.calls["rmsLimit"] == 1
+
+def test_fetch_racing_an_invalidation_is_not_cached():
+    sc, b = FakeSmart(), None
+    def fetch(ep):
+        r = getattr(sc, ep)()
+        if ep == "position" and sc.calls["position"] == 1: b.invalidate()   # an order lands mid-fetch
+        return r
+    b = Book(fetch=fetch, pos_ttl=60)
+    b.positions(); b.positions()
+    assert sc.calls["position"] == 2
+
+def test_paper_fill_drops_the_book():
+    pb = PaperBroker()
+    b = Book(pb, pos_ttl=60)
+    assert b.open() == []
+    pb.on_tick("NFO", "1", 100.0)
+    pb.placeOrder({"tradingsymbol": "X", "symboltoken": "1", "exchange": "NFO", "transactiontype": "BUY",
+                   "ordertype": "MARKET", "quantity": 75})
+    assert [p.netqty for p in b.open()] == [75]
+
+def test_invalidate_by_client_never_creates_a_book():
+    sc = FakeSmart()
+    book(sc).positions()
+    positions.invalidate(sc); positions.invalidate(object())
+    book(sc).positions()
+    assert sc.calls["position"] == 2
+
+def test_calc_lots_needs_a_client_for_account_funds(monkeypatch):
+    monkeypatch.setenv("SESSION_BROKER", "0")
+    with pytest.raises(ValueError):
+        calc_lots(None, option_price=100, lot_size=75)
+    with pytest.raises(ValueError):
+        Book(None)
+    assert calc_lots(None, option_price=100, lot_size=75, sc=FakeSmart()) == calc_lots(250000.0, 100, 75)
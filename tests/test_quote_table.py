@@ -0,0 +1,58 @@
+import multiprocessing as mp
+import time
+
+from core.quote_table import QuoteTable
+
+def _reader(path, out):
+    rd, bad, reads, end = QuoteTable(path), 0, 0, time.time() + 0.5
+    while time.time() < end:
+        for t in ("1", "2", "3"):
+            q = rd.get("NFO", t); reads += 1
+            if q and (abs(q.bid - (q.ltp - 0.05)) > 1e-9 or q.volume != q.oi): bad += 1
+    out.put((reads, bad))
+
+def test_seqlock_no_torn_reads(tmp_path):
+    path = tmp_path / "quotes"
+    w = QuoteTable(path, slots=64, writer=True)
+    for t in ("1", "2", "3"): w.put("NFO", t, 100.0, 99.95)
+    out = mp.Queue(); p = mp.Process(target=_reader, args=(path, out)); p.start()
+    i, end = 0, time.time() + 0.5
+    while time.time() < end:
+        px = 100.0 + i % 100 * 0.05
+        w.put("NFO", str(i % 3 + 1), px, px - 0.05, px + 0.05, i, i); i += 1
+    reads, bad = out.get(); p.join()
+    assert reads > 0 and bad == 0
+    w.close()
+
+def test_one_writer(tmp_path):
+    w = QuoteTable(tmp_path / "quotes", slots=64, writer=True)
+    try:
+        QuoteTable(tmp_path / "quotes", slots=64, writer=True)
+        raise AssertionError("second writer accepted")
+    except RuntimeError:
+        pass
+    w.close()
+
+def test_reader_remaps_after_publisher_restart(tmp_path):
+    path = tmp_path / "quotes"
+    w = QuoteTable(path, slots=64, writer=True)
+    w.put("NFO", "1", 10.0); w.put("NFO", "2", 20.0)
+    r = QuoteTable(path)
+    assert r.get("NFO", "2").ltp == 20.0
+    w.close()
+    w = QuoteTable(path, slots=32, writer=True)            # resized: a new file replaces the mapped one
+    w.put("NFO", "3", 30.0); w.put("NFO", "2", 21.0)
+    assert r.get("NFO", "1") is None
+    assert (r.get("NFO", "2").ltp, r.get("NFO", "3").ltp, r.slots) == (21.0, 30.0, 32)
+    w.close()
+
+def test_stale_slot_is_reprobed(tmp_path):
+    path = tmp_path / "quotes"
+    w = QuoteTable(path, slots=64, writer=True)
+    w.put("NFO", "1", 10.0); w.put("NFO", "2", 20.0)
+    r = QuoteTable(path)
+    r.get("NFO", "1"); r.get("NFO", "2")
+    k1, k2 = sorted(r.index)
+    r.index[k1], r.index[k2] = r.index[k2], r.index[k1]   # cache pointing at each other's slots
+    assert (r.get("NFO", "1").ltp, r.get("NFO", "2").ltp) == (10.0, 20.0)
+    w.close()
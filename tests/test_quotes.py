@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+import core.ratelimit as ratelimit
+import core.retry as retry
+from core import quotes as q
+from core.ratelimit import limited
+from core.retry import FAIL_MAX, CircuitOpen, resilient
+
+class FakeSmart:
+    def __init__(self, fail=None):
+        self.calls, self.fail = [], fail
+
+    def getMarketData(self, mode, exchangeTokens):
+        self.calls.append((mode, {k: sorted(v) for k, v in exchangeTokens.items()}))
+        if self.fail: raise self.fail
+        rows = [{"exchange": ex, "symbolToken": t, "ltp": 100.0 + int(t)} for ex, toks in exchangeTokens.items() for t in toks]
+        return {"status": True, "data": {"fetched": rows, "unfetched": []}}
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(q, "reader", lambda: None)               # no shared-memory table
+    monkeypatch.setattr(retry, "_breakers", {}); monkeypatch.setattr(retry, "_lat", {})
+    tokens = []
+    monkeypatch.setattr(ratelimit, "acquire", lambda ep, **kw: tokens.append(ep) or 0.0)
+    return tokens
+
+def test_one_token_per_call_through_an_already_wrapped_client(_isolated):
+    fake = FakeSmart()
+    svc = q.QuoteService(resilient(limited(fake)), window_ms=1)      # as autopilot hands it over
+    assert svc.get("NFO", "7")["ltp"] == 107.0
+    assert _isolated == ["getMarketData"] and len(fake.calls) == 1
+
+def test_wrapping_is_idempotent():
+    fake = FakeSmart()
+    once = resilient(limited(fake))
+    assert resilient(limited(once)) is once and limited(resilient(once)) is once
+
+def test_failures_are_retried_once_per_attempt(_isolated, monkeypatch):
+    monkeypatch.setattr(retry.time, "sleep", lambda s: None)     # backoff (also the 1 ms window here)
+    fake = FakeSmart(fail=ConnectionError("reset"))
+    svc = q.QuoteService(resilient(limited(fake)), window_ms=1)
+    with pytest.raises((ConnectionError, CircuitOpen)): svc.get("NFO", "7")
+    assert len(fake.calls) == FAIL_MAX and len(_isolated) == FAIL_MAX
+    assert retry.breaker("getMarketData").fails == FAIL_MAX
+
+def test_concurrent_requests_share_one_call():
+    fake = FakeSmart()
+    svc = q.QuoteService(fake, window_ms=50)
+    out, start = {}, threading.Barrier(8)
+    def ask(t):
+        start.wait(); out[t] = svc.ltp("NFO", str(t % 4))
+    ths = [threading.Thread(target=ask, args=(i,)) for i in range(8)]
+    for t in ths: t.start()
+    for t in ths: t.join()
+    assert out == {i: 100.0 + i % 4 for i in range(8)}
+    assert fake.calls == [("LTP", {"NFO": ["0", "1", "2", "3"]})]
+    assert svc.stats()["calls_saved"] == 7
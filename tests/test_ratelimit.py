@@ -0,0 +1,55 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from core import ratelimit
+from core.ratelimit import Limited, RateLimitTimeout, acquire, limited, stats
+
+ROOT = Path(__file__).resolve().parents[1]
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.delenv("AO_RL", raising=False)
+    return tmp_path / "ratelimit.state"
+
+def test_per_endpoint_bucket_then_timeout(state):
+    assert acquire("orderBook", state=state) < 0.01            # new buckets start full
+    with pytest.raises(RateLimitTimeout): acquire("orderBook", timeout=0.2, state=state)
+    assert acquire("ltpData", state=state) < 0.01              # other endpoints keep their own bucket
+    assert stats(state)["orderBook"]["calls"] == 1
+
+def test_low_lane_leaves_the_reserve_to_orders(state, monkeypatch):
+    monkeypatch.setattr(ratelimit, "GLOBAL", 5.0)
+    monkeypatch.setattr(ratelimit, "RESERVE", 3.0)
+    acquire("getProfile", state=state); acquire("getProfile", state=state)
+    with pytest.raises(RateLimitTimeout): acquire("getProfile", timeout=0.05, state=state)
+    assert acquire("placeOrder", timeout=0.05, state=state) < 0.01
+
+def test_processes_share_one_bucket(state):
+    code = ("import sys; from pathlib import Path; from core.ratelimit import acquire\n"
+            "for _ in range(3): acquire('getCandleData', state=Path(sys.argv[1]))")
+    t0 = time.monotonic()
+    ps = [subprocess.Popen([sys.executable, "-c", code, str(state)], cwd=ROOT) for _ in range(2)]
+    assert all(p.wait(20) == 0 for p in ps)
+    # 3/s with a burst of 3: six calls across both processes need ~1 s of refill
+    assert time.monotonic() - t0 >= 0.9
+    st = stats(state)["getCandleData"]
+    assert st["calls"] == 6 and st["queued"] >= 2
+
+def test_limited_wraps_once_and_only_limits_known_endpoints(state, monkeypatch):
+    seen = []
+    monkeypatch.setattr(ratelimit, "acquire", lambda ep, **kw: seen.append((ep, kw["state"])) or 0.0)
+    class Fake:
+        def ltpData(self): return "ltp"
+        def getProfile(self): return "me"
+    sc = Limited(Fake(), state=state)
+    assert limited(sc) is sc and limited(None) is None
+    assert sc.ltpData() == "ltp" and sc.getProfile() == "me"
+    assert seen == [("ltpData", state)]
+
+def test_disabled(state, monkeypatch):
+    monkeypatch.setenv("AO_RL", "0")
+    for _ in range(5): assert acquire("orderBook", timeout=0.01, state=state) == 0.0
@@ -0,0 +1,30 @@
+import re
+
+import pytest
+
+from core.symbol_search import SymbolIndex
+from core.token_map import HEAD, TokenMap
+from scripts import resolve_index_token as rit
+
+ROWS = [("99926000", "Nifty 50", "NIFTY", "NSE", "AMXIDX"), ("2", "NIFTY50", "NIFTY50", "CDS", "AMXIDX"),
+        ("99926009", "Nifty Bank", "BANKNIFTY", "NSE", "AMXIDX"), ("1", "BANKNIFTY50", "BANKNIFTY", "BSE", "AMXIDX")]
+PATTERNS = [("NIFTY_50", "nifty 50", re.compile(r"\bnifty\b.*\b50\b|\bnifty50\b"))]
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.delenv("TM_UNIVERSE", raising=False)
+    csv = tmp_path / "instruments.csv"
+    csv.write_text(",".join(HEAD) + "\n" + "".join(f"{t},{s},{n},{e},{i},,,1\n" for t, s, n, e, i in ROWS))
+    si = SymbolIndex(TokenMap(csv))
+    monkeypatch.setattr(rit, "search", si.search)
+    return tmp_path
+
+def test_scan_index_prefers_the_nse_index(index):
+    picks = rit.scan_index(PATTERNS)
+    assert picks[0]["token"] == "99926000" and {p["exchange"] for p in picks} <= {"NSE", "NFO"}
+
+def test_scan_keeps_the_csv_signature(index):
+    f = index / "instruments_NSE_INDICES.csv"
+    f.write_text("exchange,instrumenttype,name,segment,symbol,symboltoken\nNSE,AMXIDX,Nifty 50,NSE,Nifty 50,99926000\n")
+    picks = rit.scan([f, index / "missing.csv"], [(label, rx) for label, _, rx in PATTERNS])
+    assert [(p["label"], p["token"], p["file"]) for p in picks] == [("NIFTY_50", "99926000", f.name)]
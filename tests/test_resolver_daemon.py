@@ -0,0 +1,26 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from scripts import resolver_daemon as rd
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    monkeypatch.setattr(rd, "resolve", lambda q: {"token": 7, **q} if q.get("ts") else {"error": "not found"})
+    srv = rd.Server(str(tmp_path / "r.sock"), rd.Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    s = socket.socket(socket.AF_UNIX); s.connect(str(tmp_path / "r.sock")); f = s.makefile("rb")
+    def ask(line):
+        s.sendall(line.encode() + b"\n")
+        return json.loads(f.readline())
+    yield ask
+    f.close(); s.close(); srv.shutdown(); srv.server_close()
+
+def test_bad_requests_get_an_error_and_keep_the_connection(served):
+    for line in ("[]", '"x"', "3", "null", "{nope", '{"queries": "NIFTY"}'):
+        assert served(line)["error"].startswith("bad request")
+    out = served('{"queries": [{"ts": "NIFTY24600CE"}, "oops"]}')
+    assert out["results"][0]["token"] == 7 and out["results"][1]["error"].startswith("AttributeError")
+    assert served('{"cmd": "stats"}')["queries"] >= 2
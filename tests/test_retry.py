@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from core import retry
+from core.retry import FATAL, RATE, TRANSIENT, Breaker, CircuitOpen, call, classify
+
+class DataException(Exception):
+    def __init__(self, msg, code=None):
+        super().__init__(msg); self.code = code
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+class Flaky:
+    """Raises the given errors in turn, then returns "ok"."""
+    def __init__(self, *errors):
+        self.errors, self.calls = list(errors), 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors: raise self.errors.pop(0)
+        return "ok"
+
+@pytest.fixture(autouse=True)
+def _fresh(monkeypatch):
+    monkeypatch.setattr(retry, "_breakers", {})
+    monkeypatch.setattr(retry, "_lat", {})
+    monkeypatch.setattr(retry, "_counts", {})
+    monkeypatch.setattr(retry.time, "sleep", lambda s: None)
+
+def test_classify():
+    assert classify(DataException("Access denied because of exceeding access rate")) == RATE
+    assert classify(RateLimitTimeout("no token")) == RATE
+    assert classify(ConnectionError("reset")) == classify(TimeoutError()) == TRANSIENT
+    assert classify(DataException("Couldn't parse the JSON")) == TRANSIENT
+    assert classify(DataException("bad gateway", 502)) == TRANSIENT
+    assert classify(DataException("invalid token", 400)) == FATAL
+    assert classify(ValueError("qty")) == FATAL
+
+def test_rate_errors_are_retried_everywhere_transient_only_for_reads():
+    rl = lambda: DataException("Too many requests")
+    f = Flaky(rl(), rl())
+    assert call("placeOrder", f) == "ok" and f.calls == 3
+    f = Flaky(ConnectionError("reset"))
+    assert call("orderBook", f) == "ok" and f.calls == 2
+    f = Flaky(ConnectionError("reset"))
+    with pytest.raises(ConnectionError): call("placeOrder", f)
+    assert f.calls == 1                                     # the order may have gone through
+    f = Flaky(ValueError("bad"))
+    with pytest.raises(ValueError): call("orderBook", f)
+    assert f.calls == 1
+
+def test_breaker_opens_fails_fast_and_probes(monkeypatch):
+    retry._breakers["position"] = cb = Breaker(fail_max=3, reset=0.05)
+    f = Flaky(*[ConnectionError("down")] * 3)
+    with pytest.raises(ConnectionError): call("position", f, tries=3)
+    assert cb.state == "open"
+    with pytest.raises(CircuitOpen): call("position", f)
+    assert f.calls == 3 and retry.stats()["position"]["fast_fail"] == 1
+    t = time.monotonic() + 0.05
+    monkeypatch.setattr(retry.time, "monotonic", lambda: t)
+    assert cb.state == "half-open" and cb.allow() and not cb.allow()   # one probe at a time
+    cb.probing = False
+    assert call("position", f) == "ok" and cb.state == "closed"
+
+def test_slow_read_is_hedged_past_p95(monkeypatch):
+    monkeypatch.setattr(retry, "HEDGE_MIN", 0.01)
+    retry._lat["ltpData"] = retry.deque([0.001] * retry.SAMPLES, maxlen=200)
+    release, n = threading.Event(), []
+    def fn():
+        n.append(1)
+        if len(n) == 1: release.wait(2); return "slow"
+        return "fast"
+    assert call("ltpData", fn) == "fast"
+    release.set()
+    st = retry.stats()["ltpData"]
+    assert st["hedged"] == st["hedge_won"] == 1
+    n.clear()
+    assert call("placeOrder", fn, hedge=True) == "slow" and len(n) == 1   # writes are never duplicated
+
+def test_with_retry_keeps_retrying_unknown_endpoints():
+    ao_safe = pytest.importorskip("scripts.ao_safe")
+    f = Flaky(ConnectionError("reset"))
+    assert ao_safe.with_retry(lambda: f()) == "ok" and f.calls == 2
+    f = Flaky(ConnectionError("reset"))
+    with pytest.raises(ConnectionError): ao_safe.with_retry(lambda: f(), ep="placeOrder")
+    f = Flaky(ConnectionError("reset"))
+    with pytest.raises(ConnectionError): ao_safe.with_retry(lambda: f(), idempotent=False)
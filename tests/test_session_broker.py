@@ -0,0 +1,79 @@
+import base64, json, stat, threading, time
+
+import pytest
+
+pytest.importorskip("SmartApi")
+from core import retry, session_broker, smart_session
+from core.session_broker import DENY, BrokerClient, BrokerError, SessionBroker
+
+def _jwt(exp):
+    body = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"h.{body}.s"
+
+class FakeSmart:
+    def __init__(self, *a):
+        self.calls = {"position": 0, "placeOrder": 0}
+
+    def generateSession(self, client, pwd, otp):
+        return {"status": True, "data": {"jwtToken": "Bearer " + _jwt(time.time() + 3600), "refreshToken": "r1"}}
+
+    def generateToken(self, refresh):
+        return {"status": True, "data": {"jwtToken": _jwt(time.time() + 7200), "feedToken": "f2", "refreshToken": "r2"}}
+
+    def getfeedToken(self):
+        return "f1"
+
+    def position(self):
+        self.calls["position"] += 1
+        return {"status": True, "data": [{"symboltoken": "101", "netqty": "50"}]}
+
+    def placeOrder(self, params):
+        self.calls["placeOrder"] += 1
+        if not params.get("quantity"): raise ValueError("invalid quantity")
+        return "oid1"
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(smart_session, "SmartConnect", FakeSmart)
+    for k, v in (("API_KEY", "k"), ("CLIENT_ID", "C1"), ("PWD", "p"), ("TOTP_SEC", "JBSWY3DPEHPK3PXP")):
+        monkeypatch.setattr(smart_session, k, v)
+    monkeypatch.setattr("core.transport.install", lambda: None)
+    monkeypatch.setattr(retry, "_breakers", {})
+    monkeypatch.setattr(session_broker, "acquire", lambda ep, **kw: 0.0)
+    return smart_session.SmartSession()
+
+def test_jwt_is_bearer_prefixed_after_login_and_renew(session):
+    session.login()
+    assert session.jwt.startswith("Bearer ") and session.jwt.count("Bearer") == 1
+    exp = session.expires_at
+    session.renew()
+    assert session.jwt.startswith("Bearer ") and session.feed == "f2" and session.refresh == "r2"
+    assert session.expires_at > exp
+
+def test_socket_is_owner_only_from_bind(tmp_path):
+    srv = session_broker._bind(tmp_path / "s.sock")
+    try:
+        assert stat.S_IMODE((tmp_path / "s.sock").stat().st_mode) & 0o077 == 0
+    finally:
+        srv.server_close()
+
+def test_clients_share_one_session(session, tmp_path):
+    sock = tmp_path / "s.sock"
+    broker = SessionBroker(); broker.sess = session
+    srv = session_broker._bind(sock); srv.broker = broker
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    a, b = BrokerClient(sock), BrokerClient(sock)
+    try:
+        assert a.tokens()["jwt"] == session.jwt and a.tokens()["client"] == broker.client
+        assert not DENY & set(a._methods) and "placeOrder" in a._methods
+        with pytest.raises(AttributeError): a.generateSession
+        a.position(); b.position()
+        assert session.sc.calls["position"] == 1              # one cached book for both clients
+        assert b.placeOrder({"quantity": 50}) == "oid1"
+        a.position()
+        assert session.sc.calls["position"] == 2              # the order dropped it
+        with pytest.raises(BrokerError, match="invalid quantity"): a.placeOrder({})
+        st = b.stats()
+        assert st["logins"] == 1 and st["errors"] == 1
+    finally:
+        a.close(); b.close(); srv.shutdown(); srv.server_close()
@@ -0,0 +1,59 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from core.instruments import ingest
+from core import token_map
+from core.token_map import TokenMap
+
+def _exp(days: int) -> str:
+    return (date.today() + timedelta(days=days)).strftime("%d%b%Y").upper()
+
+def _opt(tok, strike, exp, lot=75, kind="CE"):
+    return {"token": str(tok), "symbol": f"NIFTY{exp[:5]}{strike}{kind}", "name": "NIFTY", "expiry": exp,
+            "strike": f"{strike * 100}.000000", "lotsize": str(lot), "instrumenttype": "OPTIDX", "exch_seg": "NFO"}
+
+@pytest.fixture(autouse=True)
+def _no_universe(monkeypatch):
+    monkeypatch.delenv("TM_UNIVERSE", raising=False)
+
+def _ingest(tmp_path, rows, wrap=False):
+    src = tmp_path / "master.json"
+    src.write_text(json.dumps({"data": rows} if wrap else rows))
+    return ingest(str(src), tmp_path / "instruments.csv", splits=False)
+
+def test_refresh_delta_applies_in_place(tmp_path):
+    exp = _exp(30)
+    _ingest(tmp_path, [_opt(1, 24500, exp), _opt(2, 24600, exp), _opt(3, 24700, exp)])
+    tm = TokenMap(tmp_path / "instruments.csv")
+    assert tm.get_token("NIFTY", exp, 24600, "CE") == 2
+    snap = tm.snap
+
+    st = _ingest(tmp_path, [_opt(1, 24500, exp, lot=50), _opt(3, 24700, exp), _opt(4, 24800, exp)])
+    assert st["delta"] == {"added": 1, "removed": 1, "lot": 1}
+    assert tm.get_token("NIFTY", exp, 24800, "CE") == 4           # added
+    assert tm.snap is snap                                         # overlaid, not reopened
+    assert tm.get_token("NIFTY", exp, 24600, "CE") is None         # removed
+    assert tm.get_contract("NIFTY", exp, 24500, "CE").lotsize == 50
+    assert [c.token for c in tm.strike_range("NIFTY", exp, "CE", 24000, 25000)] == [1, 3, 4]
+
+    # a later delta removes the contract the earlier one added
+    ts4 = tm.get_contract("NIFTY", exp, 24800, "CE").tradingsymbol
+    tm.apply_delta({"removed": [ts4]})
+    assert tm.get_by_ts(ts4) is None and tm.get_token("NIFTY", exp, 24800, "CE") is None
+    assert tm.nearest("NIFTY", exp, 24800, "CE").token == 3
+
+def test_strike_units_are_explicit(tmp_path, monkeypatch):
+    exp = _exp(30)
+    _ingest(tmp_path, [_opt(1, 24500, exp), _opt(2, 24600, exp)])
+    tm = TokenMap(tmp_path / "instruments.csv")
+    assert tm.get_token("NIFTY", exp, 24600, "CE") == 2
+    assert tm.get_token("NIFTY", exp, 2460000, "CE") is None
+    assert tm.get_token("NIFTY", exp, 2460000, "CE", scale=1) == 2
+    assert tm.nearest("NIFTY", exp, 24560, "CE").token == 2
+    assert tm.nearest("NIFTY", exp, 100, "CE").token == 1
+    monkeypatch.setattr(token_map, "TM", tm)
+    assert token_map.get_token("NIFTY", exp, 24600, "CE") == 2      # the module-level API takes either unit
+    assert token_map.get_token("NIFTY", exp, 2460000, "CE") == 2
+    assert token_map.get_token("NIFTY", exp, 24700, "CE") is None
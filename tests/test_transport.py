@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("requests")
+from core import transport
+from core.transport import Transport
+
+class Resp:
+    elapsed = timedelta(milliseconds=5)
+
+def _captured(t):
+    seen = []
+    t.session.request = lambda method, url, **kw: seen.append(kw) or Resp()
+    return seen
+
+def test_default_timeout_only_when_the_caller_gives_none():
+    t = Transport(connect_timeout=1.5, read_timeout=4)
+    seen = _captured(t)
+    t.request("GET", "https://example.invalid/rest/x")
+    t.request("POST", "https://example.invalid/rest/y", timeout=30)
+    assert [kw["timeout"] for kw in seen] == [(1.5, 4), 30]
+    assert set(t.stats()) == {"/rest/x", "/rest/y"}
+
+def test_install_makes_the_pair_smartconnects_default(monkeypatch):
+    m = pytest.importorskip("SmartApi.smartConnect")
+    monkeypatch.setattr(m, "requests", m.requests)
+    monkeypatch.setattr(m.SmartConnect, "_default_timeout", m.SmartConnect._default_timeout)
+    monkeypatch.setattr(transport, "_installed", None)
+    t = transport.install(Transport(connect_timeout=2, read_timeout=6))
+    assert m.requests is t and m.SmartConnect._default_timeout == (2, 6)
+    assert transport.install() is t
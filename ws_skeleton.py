@@ -1 +1,47 @@
-print("Hello from Python — this ran via Python, not bash!")
+#!/usr/bin/env python3
+"""
+Market-data feed launcher (core.market_data): logs in once, watches the given
+tokens and prints every tick as a JSON line; feed stats go to stderr on exit.
+
+  python ws_skeleton.py --watch NSE:99926000,NFO:43854 [--mode QUOTE] [--secs 60]
+  python ws_skeleton.py --watch NFO:43854 --mock        # against scripts/mock_feed.py, no login
+"""
+from __future__ import annotations
+import argparse, json, sys, time
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from core.market_data import MODES, MarketData, default_creds
+
+def main():
+    ap = argparse.ArgumentParser(description="SmartAPI streaming feed -> JSON lines")
+    ap.add_argument("--watch", required=True, help="EXCH:TOKEN,...")
+    ap.add_argument("--mode", default="LTP", choices=sorted(MODES))
+    ap.add_argument("--secs", type=float, default=0.0, help="stop after this long (0 = until Ctrl-C)")
+    ap.add_argument("--mock", action="store_true", help="serve the feed from scripts/mock_feed.py in-process")
+    a = ap.parse_args()
+
+    creds, kw = default_creds, {}
+    if a.mock:
+        from scripts.mock_feed import start
+        _, kw["url"] = start()
+        creds = lambda: ("Bearer mock", "mock", "MOCK", "mock")
+    md = MarketData(creds=creds, **kw)
+    md.subscribe(lambda t: print(json.dumps(asdict(t)), flush=True))
+    for spec in filter(None, (s.strip() for s in a.watch.split(","))):
+        ex, _, tok = spec.partition(":")
+        md.watch(ex, [tok], a.mode)
+    md.start()
+    try:
+        t_end = time.time() + a.secs if a.secs else float("inf")
+        while time.time() < t_end: time.sleep(min(1.0, max(0.0, t_end - time.time())))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        md.stop()
+        print(json.dumps({"event": "feed_stats", **md.stats}), file=sys.stderr, flush=True)
+
+if __name__ == "__main__":
+    main()